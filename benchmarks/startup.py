@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+""" CLI startup benchmark
+
+Times `sharp-darwin --help`, a tab completion and a playlist ID completion
+from an index of 5000 playlists against a bare interpreter start, and checks
+none of them import the heavy modules (spotipy, requests, dotenv, the
+SharpDarwin client). Exits non-zero on a regression, or when a run exits
+non-zero or prints a traceback:
+
+    python benchmarks/startup.py [--runs 10] [--budget 60]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules which only a running command may import
+HEAVY = ["spotipy", "requests", "dotenv", "sqlite3",
+         "sharp_darwin.SharpDarwin", "sharp_darwin.frontend"]
+
+
+
+def run(argv, env):
+    """ Seconds to run argv, and why it failed (None if it didn't) """
+    start = time.perf_counter()
+    proc = subprocess.run(argv, env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, check=False,
+                          universal_newlines=True)
+    return time.perf_counter() - start, failure(proc)
+
+
+def failure(proc):
+    """ Why a run failed: a traceback on stderr, or a non-zero exit """
+    if "Traceback (most recent call last)" in proc.stderr:
+        return proc.stderr.strip().splitlines()[-1]
+    if proc.returncode:
+        return f"exit status {proc.returncode}"
+    return None
+
+
+def heavyImports(argv, env):
+    """ The HEAVY modules argv imports, and why it failed (None if it
+    didn't) """
+    # -X importtime lists every import on stderr, even when argcomplete
+    # leaves with os._exit
+    proc = subprocess.run(
+        argv[:1] + ["-X", "importtime"] + argv[1:], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False,
+        universal_newlines=True)
+
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:"):
+            imported.add(line.rsplit("|", 1)[-1].strip())
+    return [module for module in HEAVY if module in imported], failure(proc)
+
+
+def bench(name, argv, env, runs):
+    runs = [run(argv, env) for _ in range(runs)]
+    times = [seconds for seconds, _ in runs]
+    heavy, error = heavyImports(argv, env)
+    errors = [error for _, error in runs if error] + ([error] if error else [])
+    return {"name": name, "median_ms": statistics.median(times) * 1000,
+            "min_ms": min(times) * 1000, "heavy": heavy,
+            "error": errors[0] if errors else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--budget", type=float, default=60,
+        help="Allowed ms over a bare interpreter start (default: 60)")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    # Never forward to a running daemon
+    env["SHARP_DARWIN_SOCKET"] = os.path.join(root, "no-such-daemon.sock")
+    cli = [sys.executable, "-c",
+           "from sharp_darwin.sharp_darwin_cli import main; main()"]
+
+    def completing(line, output=os.devnull):
+        return dict(env, _ARGCOMPLETE="1", _ARGCOMPLETE_IFS="\n",
+                    COMP_LINE=line, COMP_POINT=str(len(line)),
+                    _ARGCOMPLETE_STDOUT_FILENAME=output)
+
+    # A playlist completion index of a large library, in a cache directory
+    # only a .env file names, as the completer must find it
+    cacheDir = tempfile.mkdtemp()
+    envFile = os.path.join(cacheDir, ".env")
+    with open(envFile, "w") as f:
+        f.write(f"SHARP_DARWIN_CACHE_DIR={cacheDir}\n")
+    sys.path.insert(0, root)
+    from sharp_darwin.completion import writeIndex, indexPath
+    os.environ["SHARP_DARWIN_CACHE_DIR"] = cacheDir
+    writeIndex({"id": f"{i:022d}",
+                "playlistName": f"{2000 + i % 20}-{i % 12 + 1:02d}"}
+               for i in range(5000))
+    playlistLine = f"sharp-darwin --env {envFile} tracks-list --id 2019-0"
+
+    baseline = bench("python -c pass", [sys.executable, "-c", "pass"], env,
+                     args.runs)
+    try:
+        results = [
+            bench("--help", cli + ["--help"], env, args.runs),
+            bench("completion", cli,
+                  completing("sharp-darwin tracks-l"), args.runs),
+            bench("playlist ids", cli, completing(playlistLine), args.runs),
+        ]
+
+        # The playlist completion must actually offer the indexed IDs
+        completed = os.path.join(cacheDir, "completed")
+        subprocess.run(cli, env=completing(playlistLine, completed),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=False)
+        with open(completed) as f:
+            if not f.read().strip():
+                results[-1]["error"] = "no playlist IDs completed"
+        os.unlink(completed)
+    finally:
+        os.unlink(indexPath())
+        os.unlink(envFile)
+        os.rmdir(cacheDir)
+
+    failed = False
+    print(f"{'case':16s} {'median ms':>10s} {'over ms':>8s}  heavy imports")
+    print(f"{baseline['name']:16s} {baseline['median_ms']:10.1f}")
+    for result in results:
+        over = result["median_ms"] - baseline["median_ms"]
+        print(f"{result['name']:16s} {result['median_ms']:10.1f} "
+              f"{over:8.1f}  {', '.join(result['heavy']) or '-'}")
+        if result["error"]:
+            print(f"  failed: {result['error']}")
+        if result["heavy"] or result["error"] or over > args.budget:
+            failed = True
+
+    if failed:
+        print(f"\nFAIL: a run failed, heavy imports, or more than "
+              f"{args.budget} ms over a bare interpreter")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
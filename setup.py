@@ -15,9 +15,15 @@ setuptools.setup(
     packages=["sharp_darwin"],
     install_requires=[
         "spotipy>=2.10",
+        "requests>=2.20",
         "python-dotenv>=0.12",
         "argcomplete>=1.11"
     ],
+    extras_require={
+        "analytics": ["numpy>=1.16"],
+        "async": ["aiohttp>=3.6"],
+        "fast": ["orjson>=3.0"]
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
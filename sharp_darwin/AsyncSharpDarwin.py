@@ -0,0 +1,392 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from fnmatch import fnmatch
+import aiohttp
+import spotipy.util as util
+from sharp_darwin.exceptions import (
+    noTokenForUsername, CreatePlaylistFailure, PlaylistNotFound,
+    FailedToAddToPlaylist, RequestFailed)
+from sharp_darwin.ratelimit import RateLimiter
+from sharp_darwin.SharpDarwin import (
+    parsePlaylist, parsePlaylistItem, parseAlbum, parseFollowedArtist,
+    parseTopArtist, parseTopTrack, parsePlayback, countGenres, GENRE_WEIGHTS)
+from sharp_darwin.records import PLAYLIST_TRACK_FIELDS, TRACK_ID_FIELDS
+
+# asyncio flavour of SharpDarwin. Requires aiohttp:
+#   pip install sharp_darwin[async]
+
+
+class AsyncSharpDarwin:
+    def __init__(self, username=None, scope=None, credCache=None,
+                 concurrency=4, timeout=None, rateLimiter=None,
+                 token=None, prefix="https://api.spotify.com/v1/"):
+        self.scope = "user-follow-read user-read-playback-state user-top-read playlist-read-private playlist-modify-private playlist-modify-public playlist-read-collaborative"
+        if scope:
+            self.scope = scope
+        self.username = username
+        self.token = token
+        self.credCache = credCache
+        # Max number of requests in flight, also the connection pool size
+        self.concurrency = concurrency
+        # Request timeout in seconds
+        self.timeout = timeout
+        # May be shared with a SharpDarwin running in other threads
+        self.rateLimiter = rateLimiter or RateLimiter()
+        # Base URL of the Web API; point it at a stub server for testing
+        self.prefix = prefix
+        self.session = None
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def timestamp(self):
+        dt = datetime.now()
+        return dt.isoformat()
+
+    async def login(self):
+        if not self.token:
+            # Token lookup reads (and may refresh) the credential cache;
+            # keep it off the event loop
+            loop = asyncio.get_running_loop()
+            self.token = await loop.run_in_executor(
+                None, lambda: util.prompt_for_user_token(
+                    username=self.username, scope=self.scope,
+                    cache_path=self.credCache))
+        if not self.token:
+            raise noTokenForUsername(self.username)
+
+        if not self.session:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return True
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, path, params=None, payload=None,
+                      retries=5):
+        # Every request waits on the shared rate limiter. A 429 is retried
+        # after its Retry-After
+        url = path if path.startswith("http") else self.prefix + path
+        headers = {"Authorization": f"Bearer {self.token}"}
+
+        for attempt in range(retries + 1):
+            await asyncio.sleep(self.rateLimiter.reserve())
+            async with self.session.request(
+                    method, url, params=params, json=payload,
+                    headers=headers) as res:
+                if res.status == 429 and attempt < retries:
+                    try:
+                        retryAfter = float(res.headers.get("Retry-After", 1))
+                    except ValueError:
+                        retryAfter = 1.0
+                    self.rateLimiter.throttled(retryAfter)
+                    continue
+
+                if res.status >= 400:
+                    raise RequestFailed(res.status, await res.text())
+
+                self.rateLimiter.succeeded()
+                if res.status == 204:
+                    return None
+                return await res.json(content_type=None)
+
+    async def get(self, path, **params):
+        return await self.request("GET", path, params=params)
+
+    async def pages(self, path, params, key=None):
+        # Async version of sharp_darwin.pagination.pages: yield every page
+        # in offset order with up to concurrency requests in flight
+        first = await self.get(path, offset=0, **params)
+        yield first
+
+        paging = key(first) if key else first
+        if not paging["next"]:
+            return
+
+        step = paging["limit"]
+        pending = deque()
+        try:
+            for offset in range(paging["offset"] + step, paging["total"],
+                                step):
+                pending.append(asyncio.ensure_future(
+                    self.get(path, offset=offset, **params)))
+                if len(pending) >= self.concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # Abandoned part way through
+            for task in pending:
+                task.cancel()
+
+    async def artistsFollowed(self, limit=None, weight=None):
+        # Cursor paginated: each page gives the next one's URL
+        artists = []
+        res = await self.get("me/following", type="artist", limit=50)
+        while True:
+            paging = res["artists"]
+            artists.extend(parseFollowedArtist(artist)
+                           for artist in paging["items"])
+            if not paging["next"] or \
+                    (limit is not None and len(artists) >= limit):
+                break
+            res = await self.get(paging["next"])
+        if limit is not None:
+            artists = artists[:limit]
+
+        return {
+            "timestamp": self.timestamp(),
+            "artists": artists,
+            "genres": countGenres(artists, GENRE_WEIGHTS.get(weight))
+        }
+
+    async def audioAnalysis(self, trackID):
+        return await self.get(f"audio-analysis/{trackID}")
+
+    async def deviceList(self):
+        return await self.get("me/player/devices")
+
+    async def currentPlayback(self):
+        res = await self.get("me/player")
+
+        if res is None:
+            return None
+
+        output = parsePlayback(res)
+        output["timestamp"] = self.timestamp()
+        if output["context"]:
+            output["context"]["name"] = await self.getPlaylistName(
+                output["context"]["id"])
+
+        return output
+
+    async def getPlaylistName(self, playlist_id):
+        try:
+            res = await self.get(f"playlists/{playlist_id}", fields="name")
+            return res["name"]
+        except RequestFailed:
+            raise PlaylistNotFound(playlist_id)
+
+    async def me(self):
+        return await self.get("me")
+
+    async def addTrackToPlaylist(self, playlist_id, tracks):
+        # Add up to 100 tracks to a playlist
+        res = await self.request(
+            "POST", f"playlists/{playlist_id}/tracks",
+            payload={"uris": [f"spotify:track:{track}" for track in tracks]})
+        # Retun of a snapshot ID == Success
+        if res and "snapshot_id" in res:
+            return True
+        else:
+            raise FailedToAddToPlaylist(res)
+
+    async def tracksAdd(self, playlist_id, trackID):
+        # Add track to playlist
+        if trackID is True:
+            trackInfo = await self.currentPlayback()
+            trackID = trackInfo["track"]["id"]
+
+        await self.addTrackToPlaylist(playlist_id, [trackID])
+        return True
+
+    async def iterTrackIDs(self, playlist_id):
+        async for res in self.pages(
+                f"playlists/{playlist_id}/tracks",
+                {"limit": 100, "fields": TRACK_ID_FIELDS}):
+            for item in res["items"]:
+                if item["track"] and item["track"]["id"]:
+                    yield item["track"]["id"]
+
+    async def playlistCopy(self, source, target):
+        # Counter for total tracks copied
+        count = 0
+
+        async for res in self.pages(
+                f"playlists/{source}/tracks",
+                {"limit": 100, "fields": TRACK_ID_FIELDS}):
+            # Local files and unavailable items have no ID to add
+            tracks = [item["track"]["id"] for item in res["items"]
+                      if item["track"] and item["track"]["id"]]
+            if not tracks:
+                continue
+
+            await self.addTrackToPlaylist(target, tracks)
+            count = count + len(tracks)
+
+        return {
+            "timestamp": self.timestamp(),
+            "source": source,
+            "target": target,
+            "count": count
+        }
+
+    async def playlistConsolidate(self, target, sources=None, pattern=None):
+        # See SharpDarwin.playlistConsolidate
+        if pattern:
+            matches = [playlist async for playlist in self.iterPlaylists()
+                       if fnmatch(playlist["playlistName"], pattern)]
+            matches.sort(key=lambda playlist: playlist["playlistName"])
+            sources = [playlist["id"] for playlist in matches]
+
+        sources = [source for source in sources or [] if source != target]
+
+        count = 0
+        duplicates = 0
+        requests = 0
+        seen = set()
+        batch = []
+
+        async def read(source):
+            return [trackID async for trackID in self.iterTrackIDs(source)]
+
+        # Read every source at once; write in source order as each arrives
+        reads = [asyncio.ensure_future(read(source)) for source in sources]
+        try:
+            for task in reads:
+                for trackID in await task:
+                    if trackID in seen:
+                        duplicates = duplicates + 1
+                        continue
+                    seen.add(trackID)
+                    batch.append(trackID)
+                    if len(batch) >= 100:
+                        await self.addTrackToPlaylist(target, batch[:100])
+                        count = count + 100
+                        requests = requests + 1
+                        del batch[:100]
+        finally:
+            for task in reads:
+                task.cancel()
+
+        if batch:
+            await self.addTrackToPlaylist(target, batch)
+            count = count + len(batch)
+            requests = requests + 1
+
+        return {
+            "timestamp": self.timestamp(),
+            "sources": sources,
+            "target": target,
+            "count": count,
+            "duplicates": duplicates,
+            "requests": requests
+        }
+
+    async def playlistCreate(self, playlistName, public, descr=None):
+        res = await self.request(
+            "POST", f"users/{self.username}/playlists",
+            payload={"name": playlistName, "public": public})
+
+        # Check for success
+        if res and "id" in res:
+            return {
+                "timestamp": self.timestamp(),
+                "Success": True,
+                "playlist-id": res["id"],
+                "playlist-name": res["name"],
+                "description": res["description"],
+                "public": res["public"],
+                "collaborative": res["collaborative"]}
+        else:
+            raise CreatePlaylistFailure(res)
+
+    async def playlistDelete(self, playlist_id):
+        # Failures raise RequestFailed
+        await self.request("DELETE", f"playlists/{playlist_id}/followers")
+        return True
+
+    async def iterPlaylists(self, mine=False):
+        async for playlists in self.pages(
+                f"users/{self.username}/playlists", {"limit": 50}):
+            for playlist in playlists["items"]:
+                # Skip playlists not created by the user
+                if mine and playlist["owner"]["id"] != self.username:
+                    continue
+                yield parsePlaylist(playlist)
+
+    async def playlistList(self, mine=False):
+        output = [playlist async for playlist in self.iterPlaylists(mine)]
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(output),
+            "data": output
+        }
+
+    async def topArtists(self, limit, time_range):
+        res = await self.get(
+            "me/top/artists", limit=limit, time_range=time_range)
+
+        artists = [parseTopArtist(artist) for artist in res["items"]]
+
+        genresDict = countGenres(artists)
+        genres = [{"genre": x, "count": genresDict[x]} for x in genresDict]
+
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(artists),
+            "time_range": time_range,
+            "data": {"artists": artists, "genres": genres}}
+
+    async def topTracks(self, limit, time_range):
+        res = await self.get(
+            "me/top/tracks", limit=limit, time_range=time_range)
+
+        tracks = [parseTopTrack(track) for track in res["items"]]
+
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(tracks),
+            "time_range": time_range,
+            "data": {"tracks": tracks}}
+
+    async def iterPlaylistTracks(self, playlist_id):
+        async for res in self.pages(
+                f"playlists/{playlist_id}/tracks",
+                {"limit": 100, "fields": PLAYLIST_TRACK_FIELDS}):
+            for item in res["items"]:
+                yield parsePlaylistItem(item)
+
+    async def trackList(self, playlist_id):
+        # The name and the track pages are fetched at the same time
+        name = asyncio.ensure_future(self.getPlaylistName(playlist_id))
+        try:
+            trackData = [track async for track
+                         in self.iterPlaylistTracks(playlist_id)]
+        except BaseException:
+            name.cancel()
+            raise
+
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(trackData),
+            "playlistName": await name,
+            "playlist_id": playlist_id,
+            "tracks": trackData}
+
+    async def iterNewReleases(self, country, limit=50):
+        async for res in self.pages(
+                "browse/new-releases",
+                {"country": country, "limit": limit},
+                key=lambda res: res["albums"]):
+            for album in res["albums"]["items"]:
+                yield parseAlbum(album)
+
+    async def newReleases(self, country, limit=50):
+        albums = [album async for album
+                  in self.iterNewReleases(country, limit=limit)]
+        return {
+            "timestamp": self.timestamp(),
+            "country": country,
+            "count": len(albums),
+            "data": albums
+        }
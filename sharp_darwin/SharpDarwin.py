@@ -1,12 +1,39 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import (
+    ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED)
+from fnmatch import fnmatch
+from itertools import islice
+from operator import itemgetter
 import spotipy
 import spotipy.util as util
-import sharp_darwin.exceptions
-from collections import defaultdict
+from sharp_darwin.exceptions import (
+    LoginFailure, noTokenForUsername, CreatePlaylistFailure,
+    PlaylistDeleteFailed, FailedToCopyPlaylist, PlaylistNotFound,
+    FailedToAddToPlaylist, FailedToRemoveFromPlaylist, NoCache,
+    NoAudioFeatures, RequestFailed, LocalFilesInPlaylist,
+    MarketsUnavailable)
+from collections import Counter, defaultdict
+from sharp_darwin.pagination import pages, cursorPages
+from sharp_darwin.memo import LRUCache
+from sharp_darwin.transport import buildSession, poolStats
+from sharp_darwin.ratelimit import RateLimiter
+from sharp_darwin.index import TrackIndex, TRACK_ID
+from sharp_darwin.diff import setDiff, mirrorDiff, batchCount, writeRequests
+from sharp_darwin.records import (
+    parsePlaylist, parsePlaylistItem, parseAlbum, parseFollowedArtist,
+    parseTopArtist, parseTopTrack, Album, FollowedArtist, Track,
+    TrackColumns, PLAYLIST_TRACK_FIELDS, TRACK_ID_FIELDS)
+
+# Seconds a stored list of followed artists is reused for. Its check
+# against the first page misses changes further down the list which leave
+# the total unchanged (eg: one artist followed, another unfollowed)
+ARTISTS_FOLLOWED_TTL = 24 * 60 * 60
 
 
 class SharpDarwin:
-    def __init__(self, username=None, scope=None, credCache=None):
+    def __init__(self, username=None, scope=None, credCache=None,
+                 concurrency=4, cache=None, poolSize=None, timeout=None,
+                 rateLimiter=None, blobs=None, analyses=None):
         self.scope = "user-follow-read user-read-playback-state user-top-read playlist-read-private playlist-modify-private playlist-modify-public playlist-read-collaborative"
         if scope:
             self.scope = scope
@@ -15,122 +42,386 @@ class SharpDarwin:
         self.client = None
         self.args = None
         self.credCache = credCache
+        # Max number of concurrent requests used for pagination
+        self.concurrency = concurrency
+        # Optional MetadataCache of playlists and snapshot keyed tracks
+        self.cache = cache
+        # Memoized small lookups by ID, eg: ("playlist-name", playlist_id)
+        self.lookups = LRUCache(maxsize=256, ttl=300)
+        # Pooled HTTP connections, sized to match the worker concurrency
+        self.poolSize = poolSize or concurrency
+        # Request timeout in seconds, or a (connect, read) tuple
+        self.timeout = timeout
+        self.session = None
+        # Every API request waits on this shared token bucket
+        self.rateLimiter = rateLimiter or RateLimiter()
+        # Optional BlobCache of audio features and analyses by track ID
+        self.blobs = blobs
+        # Optional AnalysisStore of audio analyses parsed into arrays
+        self.analyses = analyses
 
     def timestamp(self):
         dt = datetime.now()
         return dt.isoformat()
 
-    def artistsFollowed(self, limit=20):
-        res = self.client.current_user_followed_artists(limit)
+    def artistsFollowed(self, limit=None, weight=None, refresh=False):
+        # Every followed artist (or the first limit) and their genres,
+        # counted, or weighted by "popularity" or "followers"
+        artists = self.iterArtistsFollowed(refresh)
+        if limit is not None:
+            artists = islice(artists, limit)
+        artists = list(artists)
 
-        artists = []
+        return {
+                "timestamp": self.timestamp(),
+                "artists": artists,
+                "genres": countGenres(artists, GENRE_WEIGHTS.get(weight))
+        }
 
-        # defaultdict(int) provides a value of 0 for all new members
-        genres = defaultdict(int)
+    def iterArtistsFollowed(self, refresh=False):
+        # Every followed artist, a page of 50 at a time. The pages are
+        # cursor paginated, so they're fetched one after another.
+        #
+        # With the cache, the first page revalidates the stored list:
+        # unless the total or the first page changed (or refresh) the rest
+        # is read from the cache rather than fetched. That's an
+        # approximation: a follow and an unfollow past the first page go
+        # unseen, so the stored list is only reused for
+        # ARTISTS_FOLLOWED_TTL after every page was last fetched
+        stored = None
+        if self.cache and not refresh:
+            stored = self.cache.getDocument("artists-followed")
+        if stored and datetime.now() - datetime.fromisoformat(
+                stored["timestamp"]) > timedelta(seconds=ARTISTS_FOLLOWED_TTL):
+            stored = None
+
+        def fetch(after):
+            return self.client.current_user_followed_artists(
+                limit=50, after=after)
 
-        for artist in res["artists"]["items"]:
-            artists.append({
-                "name": artist["name"],
-                "totalFollowers": artist["followers"]["total"],
-                "id": artist["id"],
-                "genres": artist["genres"],
-                "popularity": artist["popularity"]
+        artists = []
+        for page in cursorPages(fetch, key=itemgetter("artists")):
+            paging = page["artists"]
+            fetched = [parseFollowedArtist(artist)
+                       for artist in paging["items"]]
+
+            if not artists and stored and \
+                    stored.get("total") == paging["total"] and \
+                    [artist["id"] for artist in fetched] == \
+                    [artist["id"] for artist in
+                     stored["artists"][:len(fetched)]]:
+                yield from fetched
+                for artist in stored["artists"][len(fetched):]:
+                    yield FollowedArtist(**artist)
+                return
+
+            artists.extend(fetched)
+            yield from fetched
+
+        if self.cache:
+            self.cache.putDocument("artists-followed", {
+                "timestamp": self.timestamp(),
+                "total": len(artists),
+                "artists": artists
             })
 
-            for genre in artist["genres"]:
-                genres[genre] += 1
+    def audioAnalysis(self, trackID):
+        res = self.cached("audio-analysis", [trackID], self.fetchAnalyses)
+        return res[trackID]
+
+    def audioAnalyses(self, trackIDs):
+        # Audio analysis of each track. Spotify has no batch endpoint, so
+        # the uncached tracks are fetched one per request, concurrently
+        trackIDs = list(trackIDs)
+        res = self.cached("audio-analysis", trackIDs, self.fetchAnalyses)
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(trackIDs),
+            "data": [{"trackID": trackID, "analysis": res.get(trackID)}
+                     for trackID in trackIDs]
+        }
 
+    def audioFeatures(self, trackIDs):
+        # Audio features of each track, None for unknown tracks. Uncached
+        # tracks are fetched 100 per request, concurrently
+        trackIDs = list(trackIDs)
+        res = self.cached("audio-features", trackIDs, self.fetchFeatures)
         return {
-                "timestamp": self.timestamp(),
-                "artists": artists, 
-                "genres": genres
+            "timestamp": self.timestamp(),
+            "count": len(trackIDs),
+            "data": [res.get(trackID) for trackID in trackIDs]
         }
 
-    def audioAnalysis(self, trackID):
-        res = self.client.audio_analysis(trackID)
-        return res
+    def cached(self, kind, trackIDs, fetch):
+        # {trackID: document} from the blob cache, fetching (and storing)
+        # the documents it doesn't have with fetch(trackIDs)
+        wanted = list(dict.fromkeys(trackIDs))
+        found = self.blobs.getMany(kind, wanted) if self.blobs else {}
+        missing = [trackID for trackID in wanted if trackID not in found]
+        if missing:
+            fetched = fetch(missing)
+            if self.blobs:
+                self.blobs.putMany(kind, fetched)
+            found.update(fetched)
+        return found
+
+    def fetchFeatures(self, trackIDs):
+        def fetch(batch):
+            return self.client.audio_features(batch)
+
+        batches = [trackIDs[i:i + 100] for i in range(0, len(trackIDs), 100)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Features come back in the order asked for, None for unknown
+            # tracks. The Nones are cached too, so they aren't asked again
+            return {trackID: features
+                    for batch, res in zip(batches, pool.map(fetch, batches))
+                    for trackID, features in zip(batch, res)}
+
+    def storeAnalyses(self, trackIDs):
+        # Parse the audio analysis of each track into the AnalysisStore as
+        # it downloads, and summarize what's stored. Uncached tracks are
+        # fetched concurrently
+        if not self.analyses:
+            raise NoCache("audio-analysis --store")
+        trackIDs = list(trackIDs)
+        missing = [trackID for trackID in dict.fromkeys(trackIDs)
+                   if not self.analyses.has(trackID)]
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                list(pool.map(self.streamAnalysis, missing))
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(trackIDs),
+            "data": [self.analyses.summary(trackID) for trackID in trackIDs]
+        }
 
-    def deviceList(self):
-        res = self.client.devices()
-        return res
+    def streamAnalysis(self, trackID):
+        # spotipy would load the whole document; stream it instead
+        res = self.session.get(
+            f"{self.client.prefix}audio-analysis/{trackID}",
+            headers={"Authorization": f"Bearer {self.token}"},
+            stream=True, timeout=self.timeout)
+        with res:
+            if res.status_code != 200:
+                raise RequestFailed(res.status_code, res.text)
+            res.encoding = "utf-8"
+            self.analyses.write(
+                trackID, res.iter_content(65536, decode_unicode=True))
+
+    def fetchAnalyses(self, trackIDs):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return dict(zip(trackIDs, pool.map(
+                self.client.audio_analysis, trackIDs)))
+
+    def playlistProfile(self, playlist_ids, snapshots=None):
+        # Audio feature distribution and outliers of each playlist
+        from sharp_darwin.analytics import FeatureMatrix, FEATURES
+
+        states = self.playlistStates(playlist_ids, snapshots)
+
+        trackIDs = [track["trackID"] for _, _, tracks in states.values()
+                    for track in tracks if track["trackID"]]
+        features = FeatureMatrix.fromFeatures(
+            self.audioFeatures(dict.fromkeys(trackIDs))["data"])
 
-    def currentPlayback(self):
-        res = self.client.current_playback()
+        data = []
+        for playlist_id, (playlistName, _, tracks) in states.items():
+            rows = features.select(track["trackID"] for track in tracks)
+            profile = {
+                "playlist_id": playlist_id,
+                "playlistName": playlistName,
+                "tracks": len(tracks)
+            }
+            # count is the number of tracks with features
+            profile.update(features.profile(rows))
+            data.append(profile)
 
-        if res is None:
-            return None
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(data),
+            "features": list(FEATURES),
+            "data": data
+        }
 
-        if res["context"]:
-            context = {"type": res["context"]["type"],
-                       "id": res["context"]["uri"].split(":")[-1]}
-            context["name"] = self.getPlaylistName(context["id"])
+    def similarTracks(self, trackID, playlist_ids, limit=10, snapshots=None):
+        # The tracks in the playlists which sound most like trackID (an
+        # ID, URI or URL), by cosine similarity of their audio features
+        from sharp_darwin.analytics import FeatureMatrix
 
-        else:
-            context = None
+        match = TRACK_ID.search(trackID.strip())
+        if match:
+            trackID = match.group(1)
 
-        device = res["device"]
+        index = self.trackIndex(playlist_ids, snapshots)
+        candidates = list(index.tracks)
+        features = FeatureMatrix.fromFeatures(self.audioFeatures(
+            candidates + ([] if trackID in index.tracks else [trackID])
+        )["data"])
+        if trackID not in features.rows:
+            raise NoAudioFeatures(trackID)
 
-        artists = []
-        for artist in res["item"]["album"]["artists"]:
-            artists.append({"name": artist["name"], "id": artist["id"]})
-
-        album = {
-            "type": res["item"]["album"]["album_type"],
-            "id": res["item"]["album"]["id"],
-            "name": res["item"]["album"]["name"],
-            "release_date": res["item"]["album"]["release_date"],
-            "total_tracks": res["item"]["album"]["total_tracks"]
-        }
+        data = []
+        for similarID, similarity in features.similar(
+                trackID, limit=limit, rows=features.select(candidates)):
+            trackName, artists = index.tracks[similarID]
+            data.append({
+                "trackID": similarID,
+                "trackName": trackName,
+                "artists": artists,
+                "similarity": similarity,
+                "playlists": sorted({
+                    index.names[playlist_id] for playlist_id, _, _
+                    in index.byID[similarID]})
+            })
 
-        track = {
-            "name": res["item"]["name"],
-            "id": res["item"]["id"],
-            "popularity": res["item"]["popularity"],
+        return {
+            "timestamp": self.timestamp(),
+            "trackID": trackID,
+            "count": len(data),
+            "data": data
         }
 
-        state = {
-            "progress_ms": res["progress_ms"],
-            "repeat_state": res["repeat_state"],
-            "shuffle_state": res["shuffle_state"],
-            "timestamp": res["timestamp"]
-        }
+    def playlistTrackIDs(self, playlist_id):
+        # IDs of the playlist's tracks, from the cache while it's current
+        if self.cache:
+            _, tracks = self.snapshotTracks(playlist_id)
+            return [track["trackID"] for track in tracks if track["trackID"]]
+        return list(self.iterTrackIDs(playlist_id))
 
-        output = {
-            "timestamp": self.timestamp(),
-            "context": context,
-            "device": device,
-            "artists": artists,
-            "album": album,
-            "track": track,
-            "state": state
-        }
+    def deviceList(self):
+        res = self.client.devices()
+        return res
+
+    def currentPlayback(self):
+        res = self.client.current_playback()
+
+        if res is None:
+            return None
+
+        output = parsePlayback(res)
+        output["timestamp"] = self.timestamp()
+        if output["context"]:
+            output["context"]["name"] = self.getPlaylistName(
+                output["context"]["id"])
 
         return output
 
     def getPlaylistName(self, playlist_id):
         # Get playlist name
-        playlistName = None
+        def load():
+            try:
+                res = self.client.user_playlist(
+                    user=self.username, playlist_id=playlist_id,
+                    fields="name")
+                return res["name"]
+            except BaseException:
+                raise PlaylistNotFound(playlist_id)
+
+        return self.lookups.get(("playlist-name", playlist_id), load)
+
+    def getPlaylistSnapshot(self, playlist_id):
+        # Get playlist name and current snapshot ID. Only a bad or unknown
+        # ID is PlaylistNotFound; other failures (eg: rate limits) go
+        # through as they are
         try:
             res = self.client.user_playlist(
-                user=self.username, playlist_id=playlist_id, fields="name")
-            return res["name"]
-        except BaseException:
-            raise PlaylistNotFound(playlist_id)
+                user=self.username, playlist_id=playlist_id,
+                fields="name,snapshot_id")
+        except spotipy.client.SpotifyException as e:
+            if e.http_status in (400, 404):
+                raise PlaylistNotFound(playlist_id)
+            raise
 
-    def login(self):
-        if not self.token:
+        # Save a later getPlaylistName call the trip
+        self.lookups.put(("playlist-name", playlist_id), res["name"])
+        return res["name"], res["snapshot_id"]
+
+    def snapshotTracks(self, playlist_id, concurrency=None, known=None):
+        # Track records for the playlist, read from the local cache while
+        # the playlist snapshot is unchanged
+        playlistName, _, tracks = self.playlistState(
+            playlist_id, concurrency=concurrency, known=known)
+        return playlistName, tracks
+
+    def playlistState(self, playlist_id, concurrency=None, known=None):
+        # Name, snapshot ID and track records of the playlist. The tracks
+        # come from the local cache, if any, while the snapshot is
+        # unchanged. known is the (name, snapshot ID) a listing just gave,
+        # which saves asking for them again
+        playlistName, snapshot = known or \
+            self.getPlaylistSnapshot(playlist_id)
+
+        tracks = None
+        if self.cache:
+            tracks = self.cache.getTracks(playlist_id, snapshot)
+        if tracks is None:
+            tracks = list(self.iterPlaylistTracks(
+                playlist_id, concurrency=concurrency))
+            if self.cache:
+                self.cache.putTracks(playlist_id, snapshot, tracks)
+
+        return playlistName, snapshot, tracks
+
+    def iterSnapshotTracks(self, playlist_id, concurrency=None):
+        # Yield the playlist's track records: from the local cache while
+        # the snapshot is unchanged, else as each page arrives, caching
+        # them once the whole playlist has been read
+        if not self.cache:
+            yield from self.iterPlaylistTracks(
+                playlist_id, concurrency=concurrency)
+            return
+
+        _, snapshot = self.getPlaylistSnapshot(playlist_id)
+        tracks = self.cache.getTracks(playlist_id, snapshot)
+        if tracks is not None:
+            yield from tracks
+            return
+
+        tracks = []
+        for track in self.iterPlaylistTracks(
+                playlist_id, concurrency=concurrency):
+            tracks.append(track)
+            yield track
+        self.cache.putTracks(playlist_id, snapshot, tracks)
+
+    def login(self, refresh=False):
+        # refresh=True rereads the token from the credential cache, which
+        # renews it once expired. The session and caches are kept
+        if not self.token or refresh:
             self.token = util.prompt_for_user_token(
                 username=self.username, scope=self.scope, 
                 cache_path=self.credCache)
         try: 
             if self.token:
-                self.client = spotipy.Spotify(auth=self.token)
+                if not self.session:
+                    self.session = buildSession(
+                        poolSize=self.poolSize, limiter=self.rateLimiter)
+                self.client = spotipy.Spotify(
+                    auth=self.token, requests_session=self.session,
+                    requests_timeout=self.timeout)
             else:
                 raise noTokenForUsername(self.username)
         except spotipy.client.SpotifyException as e:
-            raise exceptions.LoginFailure(e)
+            raise LoginFailure(e)
         return True
 
+    def poolStats(self):
+        return poolStats(self.session)
+
+    def rateStats(self):
+        return self.rateLimiter.stats()
+
+    def stats(self):
+        # Counters of the rate limiter, connection pool, memoized lookups
+        # and (once opened) audio cache, for --stats
+        return {
+            "rate": self.rateStats(),
+            "pool": self.poolStats() if self.session else None,
+            "lookups": self.lookups.stats(),
+            "audioCache": self.blobs.stats()
+            if self.blobs and self.blobs.connection else None
+        }
+
     def me(self):
         return self.client.me()
 
@@ -149,42 +440,34 @@ class SharpDarwin:
             else:
                 raise FailedToCopyPlaylist(res)
 
-        # Get a track list of the source playlist
-        tracks = []
-        # Limit to 100... user_playlist_add_tracks can only add 100 tracks at a
-        # time
-        res = self.client.user_playlist_tracks(
-            user=self.username, playlist_id=source, limit=100)
-        for track in res["items"]:
-            # Add tracks to list
-            tracks.append(track["track"]["id"])
+        # Page through the source playlist. Limit to 100...
+        # user_playlist_add_tracks can only add 100 tracks at a time
+        def fetch(offset):
+            return self.client.user_playlist_tracks(
+                user=self.username, playlist_id=source, limit=100,
+                offset=offset, fields=TRACK_ID_FIELDS)
+
+        # Local files and unavailable items have no ID to add
+        if self.cache:
+            # Read the source from the local cache if it hasn't changed
+            _, cached = self.snapshotTracks(source)
+            cached = [track["trackID"] for track in cached
+                      if track["trackID"]]
+            batches = (cached[i:i + 100] for i in range(0, len(cached), 100))
+        else:
+            batches = (
+                [item["track"]["id"] for item in res["items"]
+                 if item["track"] and item["track"]["id"]]
+                for res in pages(fetch, concurrency=self.concurrency))
+
+        for tracks in batches:
+            if not tracks:
+                continue
 
-        try:
             # Actually add the track list to the target playlist
             addTracks(target, tracks)
             # incr the counter
             count = count + len(tracks)
-            # reset the tracks list
-            tracks = []
-        except BaseException:
-            raise
-
-        # Pagination, if needed
-        while res["next"]:
-            res = self.client.next(res)
-            for track in res["items"]:
-                # Add tracks to list
-                tracks.append(track["track"]["id"])
-
-            try:
-                # Actually add the track list to the target playlist
-                addTracks(target, tracks)
-                # incr the counter
-                count = count + len(tracks)
-                # reset the tracks list
-                tracks = []
-            except BaseException:
-                raise
 
         # Return results
         return {
@@ -194,6 +477,163 @@ class SharpDarwin:
             "count": count
         }
 
+    def playlistSync(self, source, target, mirror=False, dryRun=False):
+        # Make target hold the tracks of source, or with mirror the same
+        # tracks in the same order. Only the difference is written:
+        # removals, then additions, 100 tracks per request. Unchanged
+        # playlists are read from the local cache, and the target is
+        # stored under the snapshot the writes leave it at, so a sync with
+        # nothing to do costs two snapshot lookups
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            (_, _, sourceTracks), (targetName, snapshot, targetTracks) = \
+                pool.map(self.playlistState, [source, target])
+        sourceIDs = [track["trackID"] for track in sourceTracks]
+        targetIDs = [track["trackID"] for track in targetTracks]
+
+        rewrite = False
+        if mirror:
+            removals, insertions = mirrorDiff(sourceIDs, targetIDs)
+            # Replacing every track costs a request per 100 of them. A
+            # target out of order can only be rewritten
+            written = [trackID for trackID in sourceIDs if trackID]
+            rewrite = insertions is None or \
+                writeRequests(removals, insertions) > \
+                max(1, batchCount(len(written)))
+            if rewrite and None in targetIDs:
+                if insertions is None:
+                    # Tracks can't be added back as local files
+                    raise LocalFilesInPlaylist(target)
+                rewrite = False
+            added = sum((Counter(written) - Counter(targetIDs)).values())
+        else:
+            removals, additions = setDiff(sourceIDs, targetIDs)
+            insertions = [(None, additions)] if additions else []
+            added = len(additions)
+
+        requests = 0
+        if dryRun:
+            pass
+        elif rewrite:
+            requests, snapshot = self.replaceTracks(target, written)
+            removals = list(zip(targetIDs, range(len(targetIDs))))
+            insertions = [(0, written)]
+        else:
+            if removals:
+                requests, snapshot = self.removeOccurrences(
+                    target, snapshot, removals)
+            for position, trackIDs in insertions:
+                count, snapshot = self.addTracks(target, trackIDs, position)
+                requests = requests + count
+
+        if requests and self.cache:
+            self.cache.putTracks(target, snapshot, syncedTracks(
+                sourceTracks, targetTracks, removals, insertions))
+
+        return {
+            "timestamp": self.timestamp(),
+            "source": source,
+            "target": target,
+            "targetName": targetName,
+            "mirror": mirror,
+            "dryRun": dryRun,
+            "rewritten": rewrite,
+            "added": added,
+            "removed": len(removals) if not rewrite else
+            sum((Counter(targetIDs) - Counter(written)).values()),
+            "requests": requests
+        }
+
+    def addTracks(self, playlist_id, trackIDs, position=None):
+        # Add tracks 100 per request, at position (default: the end).
+        # Returns the number of requests and the new snapshot ID
+        requests = 0
+        snapshot = None
+        for i in range(0, len(trackIDs), 100):
+            snapshot = self.addTrackToPlaylist(
+                playlist_id, trackIDs[i:i + 100],
+                position=None if position is None else position + i)
+            requests = requests + 1
+        return requests, snapshot
+
+    def replaceTracks(self, playlist_id, trackIDs):
+        # Replace every track of the playlist. Replacing takes 100 tracks
+        # at most, the rest are added after them. Returns the number of
+        # requests and the new snapshot ID
+        res = self.client.user_playlist_replace_tracks(
+            user=self.username, playlist_id=playlist_id,
+            tracks=trackIDs[:100])
+        if "snapshot_id" not in res:
+            raise FailedToAddToPlaylist
+        requests, snapshot = self.addTracks(playlist_id, trackIDs[100:])
+        return 1 + requests, snapshot or res["snapshot_id"]
+
+    def playlistConsolidate(self, target, sources=None, pattern=None):
+        # Roll many source playlists into one target playlist. Sources are
+        # given as IDs, or as a name pattern such as "2019-*"
+        if pattern:
+            matches = [playlist for playlist in self.iterPlaylists()
+                       if fnmatch(playlist["playlistName"], pattern)]
+            # Oldest first for date named playlists
+            matches.sort(key=lambda playlist: playlist["playlistName"])
+            sources = [playlist["id"] for playlist in matches]
+
+        # Never read the target into itself
+        sources = [source for source in sources or [] if source != target]
+
+        def read(source):
+            if self.cache:
+                _, tracks = self.snapshotTracks(source)
+                return [track["trackID"] for track in tracks
+                        if track["trackID"]]
+            # Each source pages sequentially; the pool provides the
+            # parallelism
+            return list(self.iterTrackIDs(source, concurrency=1))
+
+        # Counters for tracks written, duplicates skipped and write calls
+        count = 0
+        duplicates = 0
+        requests = 0
+
+        seen = set()
+        batch = []
+
+        def flush():
+            nonlocal count, requests
+            # user_playlist_add_tracks can only add 100 tracks at a time
+            self.addTrackToPlaylist(target, batch[:100])
+            count = count + len(batch[:100])
+            requests = requests + 1
+            del batch[:100]
+
+        # Read every source concurrently. The results are consumed in source
+        # order, so writes start as soon as the first source is read while
+        # the rest are still being fetched
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            reads = [pool.submit(read, source) for source in sources]
+
+            for read in reads:
+                for trackID in read.result():
+                    if trackID in seen:
+                        duplicates = duplicates + 1
+                        continue
+                    seen.add(trackID)
+                    batch.append(trackID)
+                    # Only write full batches until the end
+                    if len(batch) >= 100:
+                        flush()
+
+        while batch:
+            flush()
+
+        return {
+            "timestamp": self.timestamp(),
+            "sources": sources,
+            "target": target,
+            "count": count,
+            "duplicates": duplicates,
+            "requests": requests
+        }
+
     def playlistCreate(self, playlistName, public, descr=None):
         # Create the playlist
         res = self.client.user_playlist_create(
@@ -226,43 +666,38 @@ class SharpDarwin:
             raise PlaylistDeleteFailed(res)
 
 
-    def playlistList(self, mine=False):
-        # Array of paginated playlist returns
-        lists = []
-        # Consolidation of pagination
-        items = []
-        # Final output
-        output = []
+    def iterPlaylists(self, mine=False, snapshots=None):
+        # Yield one record per playlist, a page at a time. Pages after the
+        # first are fetched concurrently. snapshots, if given, collects
+        # {playlist ID: (name, snapshot ID)} of the playlists yielded, so
+        # their tracks can be read without asking for them again
+        def fetch(offset):
+            return self.client.user_playlists(
+                self.username, limit=50, offset=offset)
+
+        for playlists in pages(fetch, concurrency=self.concurrency):
+            if self.cache:
+                # Remember each playlist's snapshot
+                self.cache.putPlaylists([{
+                    "id": playlist["id"],
+                    "snapshot_id": playlist["snapshot_id"],
+                    "name": playlist["name"],
+                    "owner": playlist["owner"]["id"],
+                    "total": playlist["tracks"]["total"]
+                } for playlist in playlists["items"]])
+
+            for playlist in playlists["items"]:
+                # Skip playlists not created by the user
+                if mine:
+                    if playlist["owner"]["id"] != self.username:
+                        continue
+                if snapshots is not None:
+                    snapshots[playlist["id"]] = (
+                        playlist["name"], playlist["snapshot_id"])
+                yield parsePlaylist(playlist)
 
-        # Make initial requet for user's playlists
-        playlists = self.client.user_playlists(self.username)
-        lists.append(playlists)
-
-        # Pagination
-        while playlists["next"]:
-            playlists = self.client.next(playlists)
-            lists.append(playlists)
-
-        # Consolidate pagination
-        for lst in lists:
-            for item in lst["items"]:
-                items.append(item)
-
-        # Loop though playlists
-        for playlist in items:
-            # Skip playlists not created by the user
-            if mine:
-                if playlist["owner"]["id"] != self.username:
-                    continue
-            # Get the total numer of tracks
-            total = int(playlist["tracks"]["total"])
-            # Create an object for each playlist
-            output.append({
-                "owner": playlist["owner"]["id"],
-                "id": playlist["id"],
-                "total": total,
-                "playlistName": playlist["name"]
-            })
+    def playlistList(self, mine=False):
+        output = list(self.iterPlaylists(mine=mine))
         # Done!
         return {
             "timestamp": self.timestamp(),
@@ -270,6 +705,54 @@ class SharpDarwin:
             "data": output
         }
 
+    def sync(self):
+        # Mirror the library into the local cache for --offline use. Only
+        # playlists whose snapshot changed since the last sync are fetched
+        if not self.cache:
+            raise NoCache("sync")
+
+        # One listing refreshes every playlist's current snapshot
+        playlists = list(self.iterPlaylists())
+        listed = {playlist["id"] for playlist in playlists}
+        current = self.cache.playlistSnapshots()
+        stored = self.cache.trackSnapshots()
+
+        # Playlists deleted since the last sync
+        removed = [playlist_id for playlist_id in current
+                   if playlist_id not in listed]
+        self.cache.removePlaylists(removed)
+
+        changed = [playlist["id"] for playlist in playlists
+                   if stored.get(playlist["id"]) != current[playlist["id"]]]
+
+        def fetch(playlist_id):
+            tracks = list(self.iterPlaylistTracks(playlist_id, concurrency=1))
+            self.cache.putTracks(playlist_id, current[playlist_id], tracks)
+            return len(tracks)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            tracks = sum(pool.map(fetch, changed))
+
+        # Refreshes the stored followed artists if they changed
+        for _ in self.iterArtistsFollowed():
+            pass
+        for time_range in ("short_term", "medium_term", "long_term"):
+            self.cache.putDocument(
+                f"top-artists/{time_range}",
+                self.topArtists(limit=50, time_range=time_range))
+            self.cache.putDocument(
+                f"top-tracks/{time_range}",
+                self.topTracks(limit=50, time_range=time_range))
+
+        return {
+            "timestamp": self.timestamp(),
+            "playlists": len(playlists),
+            "fetched": changed,
+            "tracks": tracks,
+            "unchanged": len(playlists) - len(changed),
+            "removed": removed
+        }
+
     def topArtists(self, limit, time_range):
         try:
             res = self.client.current_user_top_artists(
@@ -277,23 +760,9 @@ class SharpDarwin:
         except BaseException:
             raise
 
-        artists = []
-
-        # defaultdict(int) provides a value of 0 for all new members
-        genresDict = defaultdict(int)
-
-        for artist in res["items"]:
-            artists.append({
-                "name": artist["name"],
-                "genres": artist["genres"], 
-                "popularity": artist["popularity"],
-                "url": artist["external_urls"]["spotify"]
-            })
-
-            for genre in artist["genres"]:
-                genresDict[genre] += 1
-
+        artists = [parseTopArtist(artist) for artist in res["items"]]
 
+        genresDict = countGenres(artists)
         genres = [ {"genre": x, "count": genresDict[x]} for x in genresDict ]
 
         output = {"artists": artists, "genres": genres}
@@ -310,23 +779,7 @@ class SharpDarwin:
         except BaseException:
             raise
 
-        tracks = []
-
-        for track in res["items"]:
-            artists = []
-            for artist in track["artists"]:
-                artists.append(artist["name"])
-            tracks.append({
-                "uri":  track["uri"],
-                "url": track["external_urls"]["spotify"],
-                "trackName": track["name"],
-                "popularity": track["popularity"],
-                "artists": artists,
-                "trackID": track["id"],
-                "releaseDate": track["album"]["release_date"],
-                "albumName": track["album"]["name"]
-            }
-            )
+        tracks = [parseTopTrack(track) for track in res["items"]]
 
         output = {"tracks": tracks}
         return {
@@ -335,60 +788,211 @@ class SharpDarwin:
             "time_range": time_range,
             "data": output}
 
-    def trackList(self, playlist_id):
-        # Get playlist name
-        playlistName = self.getPlaylistName(playlist_id)
-
-        tracks = []
+    def iterPlaylistTracks(self, playlist_id, concurrency=None):
+        # Yield one record per track in the playlist, a page at a time.
+        # Only the fields the records use are requested
+        def fetch(offset):
+            return self.client.user_playlist_tracks(
+                user=self.username, playlist_id=playlist_id, limit=100,
+                offset=offset, fields=PLAYLIST_TRACK_FIELDS)
+
+        if concurrency is None:
+            concurrency = self.concurrency
+
+        for res in pages(fetch, concurrency=concurrency):
+            for item in res["items"]:
+                yield parsePlaylistItem(item)
+
+    def iterTrackIDs(self, playlist_id, concurrency=None):
+        # Yield the ID of every track in the playlist. Local files and
+        # unavailable items have no ID and are skipped
+        def fetch(offset):
+            return self.client.user_playlist_tracks(
+                user=self.username, playlist_id=playlist_id, limit=100,
+                offset=offset, fields=TRACK_ID_FIELDS)
+
+        if concurrency is None:
+            concurrency = self.concurrency
+
+        for res in pages(fetch, concurrency=concurrency):
+            for item in res["items"]:
+                if item["track"] and item["track"]["id"]:
+                    yield item["track"]["id"]
+
+    def trackList(self, playlist_id, columnar=False, concurrency=None,
+                  known=None):
+        # columnar keeps the tracks in a compact TrackColumns. known is as
+        # for playlistState
+        if self.cache:
+            # Tracks are only fetched if the playlist changed
+            playlistName, trackData = self.snapshotTracks(
+                playlist_id, concurrency=concurrency, known=known)
+        else:
+            # Get playlist name
+            playlistName = known[0] if known else \
+                self.getPlaylistName(playlist_id)
 
-        # Get initial track list
-        res = self.client.user_playlist_tracks(
-            user=self.username, playlist_id=playlist_id)
-        for track in res["items"]:
-            tracks.append(track["track"]["id"])
+            # Parse the track data
+            trackData = self.iterPlaylistTracks(
+                playlist_id, concurrency=concurrency)
 
-        # Paginate
-        while res["next"]:
-            res = self.client.next(res)
-            for track in res["items"]:
-                tracks.append(track["track"]["id"])
+        if columnar:
+            trackData = TrackColumns(trackData)
+        else:
+            trackData = list(trackData)
 
         # object containing final count and data
-        output = {
+        return {
             "timestamp": self.timestamp(),
-            "count": len(tracks),
+            "count": len(trackData),
             "playlistName": playlistName,
             "playlist_id": playlist_id,
-            "tracks": []}
+            "tracks": trackData}
 
-        # Parse the track data
-        trackData = []
-        for item in res["items"]:
-            track = item["track"]
-            artists = []
+    def iterTrackLists(self, playlist_ids, columnar=False, snapshots=None):
+        # Yield the trackList of each playlist as soon as it has been read.
+        # Playlists are read concurrently, each paging sequentially. A
+        # playlist which can't be read yields its error instead. snapshots
+        # are those collected by iterPlaylists
+        snapshots = snapshots or {}
 
-            href = track["href"]
-            albumName = track["name"]
-            trackName = track["name"]
-            trackID = track["id"]
-            popularity = track["popularity"]
-            addedAt = item["added_at"]
+        def read(playlist_id):
+            try:
+                return self.trackList(
+                    playlist_id, columnar=columnar, concurrency=1,
+                    known=snapshots.get(playlist_id))
+            except Exception as e:
+                return {
+                    "timestamp": self.timestamp(),
+                    "playlist_id": playlist_id,
+                    "error": repr(e)}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            reads = [pool.submit(read, playlist_id)
+                     for playlist_id in playlist_ids]
+            try:
+                for done in as_completed(reads):
+                    yield done.result()
+            finally:
+                # Abandoned part way through
+                for future in reads:
+                    future.cancel()
+
+    def trackLists(self, playlist_ids, columnar=False, snapshots=None):
+        # trackList of many playlists, in the order given
+        playlist_ids = list(playlist_ids)
+        results = {result["playlist_id"]: result for result
+                   in self.iterTrackLists(playlist_ids, columnar=columnar,
+                                          snapshots=snapshots)}
+        playlists = [results[playlist_id] for playlist_id in playlist_ids]
+        return dict(self.trackListSummary(playlists), playlists=playlists)
+
+    def trackListSummary(self, results):
+        # Totals over trackList results
+        return {
+            "timestamp": self.timestamp(),
+            "count": len(results),
+            "tracks": sum(result.get("count", 0) for result in results),
+            "failed": [result["playlist_id"] for result in results
+                       if "error" in result]
+        }
 
-            for a in track["artists"]:
-                artists.append(a["name"])
+    def playlistStates(self, playlist_ids, snapshots=None):
+        # {playlist ID: playlistState} of the playlists, read concurrently.
+        # snapshots are those collected by iterPlaylists. The first
+        # playlist which can't be read raises its error
+        playlist_ids = list(playlist_ids)
+        snapshots = snapshots or {}
+
+        def read(playlist_id):
+            return self.playlistState(
+                playlist_id, concurrency=1, known=snapshots.get(playlist_id))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return dict(zip(playlist_ids, pool.map(read, playlist_ids)))
+
+    def trackIndex(self, playlist_ids, snapshots=None):
+        # TrackIndex of the playlists, in the order given
+        states = self.playlistStates(playlist_ids, snapshots)
+        index = TrackIndex()
+        for playlist_id, (playlistName, _, tracks) in states.items():
+            index.add(playlist_id, playlistName, tracks)
+        return index
+
+    def whereIs(self, query, playlist_ids, snapshots=None):
+        # Every place a track (ID, URI, URL or "artist - title") appears
+        data = self.trackIndex(playlist_ids, snapshots).where(query)
+        return {
+            "timestamp": self.timestamp(),
+            "query": query,
+            "count": len(data),
+            "data": data
+        }
 
-            trackData.append({
-                "artists": artists,
-                "albumName": albumName,
-                "trackName": trackName,
-                "popularity": popularity,
-                "trackID": trackID,
-                "addedAt": addedAt,
-                "href": href
+    def dedupe(self, playlist_ids, across=False, fuzzy=False, dryRun=False,
+               snapshots=None):
+        # Remove repeated tracks, keeping each one's first occurrence in
+        # every playlist, or with across only in the first playlist given
+        # which has it
+        states = self.playlistStates(playlist_ids, snapshots)
+
+        index = TrackIndex()
+        for playlist_id, (playlistName, _, tracks) in states.items():
+            index.add(playlist_id, playlistName, tracks)
+
+        output = []
+        for playlist_id, occurrences in index.duplicates(
+                across=across, fuzzy=fuzzy).items():
+            playlistName, snapshot, _ = states[playlist_id]
+            requests = 0
+            if not dryRun:
+                requests, _ = self.removeOccurrences(
+                    playlist_id, snapshot, occurrences)
+            output.append({
+                "playlist_id": playlist_id,
+                "playlistName": playlistName,
+                "removed": len(occurrences),
+                "requests": requests,
+                "tracks": [{"trackID": trackID, "position": position}
+                           for trackID, position in occurrences]
             })
-        # Add track data to the final results
-        output["tracks"] = trackData
-        return output
+
+        return {
+            "timestamp": self.timestamp(),
+            "dryRun": dryRun,
+            "removed": sum(result["removed"] for result in output),
+            "requests": sum(result["requests"] for result in output),
+            "data": output
+        }
+
+    def removeOccurrences(self, playlist_id, snapshot, occurrences):
+        # Remove (trackID, position) occurrences from the playlist, as seen
+        # in snapshot. Requests carry up to 100 tracks, each with all its
+        # positions. They go from the end of the playlist backwards, so
+        # every request's positions are still where they were in snapshot.
+        # Returns the number of requests and the playlist's new snapshot
+        occurrences = sorted(occurrences, key=lambda o: o[1], reverse=True)
+        requests = 0
+        i = 0
+        while i < len(occurrences):
+            batch = {}
+            for trackID, position in occurrences[i:]:
+                if trackID not in batch and len(batch) >= 100:
+                    break
+                batch.setdefault(trackID, []).append(position)
+                i = i + 1
+
+            res = self.client.user_playlist_remove_specific_occurrences_of_tracks(
+                user=self.username, playlist_id=playlist_id,
+                tracks=[{"uri": trackID, "positions": positions}
+                        for trackID, positions in batch.items()],
+                snapshot_id=snapshot)
+            if "snapshot_id" not in res:
+                raise FailedToRemoveFromPlaylist(res)
+            snapshot = res["snapshot_id"]
+            requests = requests + 1
+
+        return requests, snapshot
 
     def tracksAdd(self, playlist_id, trackID):
         # Add track to playlist
@@ -399,26 +1003,208 @@ class SharpDarwin:
         self.addTrackToPlaylist(playlist_id, [trackID])
         return True
 
-    def addTrackToPlaylist(self, playlist_id, tracks):
-        # Add one (str) or more (list) tracks to a playlist
+    def addTrackToPlaylist(self, playlist_id, tracks, position=None):
+        # Add one (str) or more (list) tracks to a playlist, at position
+        # (default: the end). Returns the playlist's new snapshot ID
         res = self.client.user_playlist_add_tracks(
-            user=self.username, playlist_id=playlist_id, tracks=tracks)
+            user=self.username, playlist_id=playlist_id, tracks=tracks,
+            position=position)
         # Retun of a snapshot ID == Success
         if "snapshot_id" in res:
-            return True
+            return res["snapshot_id"]
         else:
             raise FailedToAddToPlaylist
 
-    def newReleases(self, country, limit=50, next=None):
-        data = []
-        res = self.client.new_releases(country=country, limit=limit)
-        data.append(res)
-        
-        while res["albums"]["next"]:
-            res = self.next(res["albums"])
-            data.append(res)
-        return data
-        
+    def markets(self):
+        # Country codes Spotify is available in. Kept in the cache for the
+        # day
+        today = date.today().isoformat()
+        stored = self.cache.getDocument("markets") if self.cache else None
+        if stored and stored["date"] == today:
+            return stored["markets"]
+
+        markets = self.fetchMarkets()
+        if self.cache:
+            self.cache.putDocument(
+                "markets", {"date": today, "markets": markets})
+        return markets
+
+    def fetchMarkets(self):
+        # spotipy only has a call for GET /markets from 2.19
+        # (available_markets). Older clients, down to the 2.10 setup.py
+        # allows, go through their private _get: this is the one place
+        # that does, to drop once spotipy>=2.19 is required
+        if hasattr(self.client, "available_markets"):
+            return self.client.available_markets()["markets"]
+        get = getattr(self.client, "_get", None)
+        if get is None:
+            raise MarketsUnavailable()
+        return get("markets")["markets"]
+
+    def iterNewReleases(self, countries, limit=50):
+        # Yield one record per album newly released in any of the countries
+        # (a code, or a list of them), each album once, as its page arrives
+        yield from uniqueAlbums(
+            albums for _, _, albums in self.newReleasePages(countries, limit))
+
+    def newReleasePages(self, countries, limit=50):
+        # Yield (country, offset, albums) for every page of new releases in
+        # the countries, in the order the pages complete. Every country's
+        # pages are fetched concurrently. A country's releases are kept in
+        # the cache for the day, and come back as a single page
+        if isinstance(countries, str):
+            countries = [countries]
+        today = date.today().isoformat()
+
+        fetching = []
+        for country in dict.fromkeys(countries):
+            stored = self.cache.getDocument(f"new-releases/{country}") \
+                if self.cache else None
+            if stored and stored["date"] == today:
+                yield country, 0, [Album(**album)
+                                   for album in stored["albums"]]
+            else:
+                fetching.append(country)
+
+        def fetch(country, offset):
+            return self.client.new_releases(
+                country=country, limit=limit, offset=offset)
+
+        # The first page of each country gives its total, then the rest of
+        # its pages are queued. Pages are handed back as they complete
+        pagesOf = {country: {} for country in fetching}
+        remaining = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {pool.submit(fetch, country, 0): (country, 0)
+                       for country in fetching}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    country, offset = pending.pop(future)
+                    paging = future.result()["albums"]
+                    albums = [parseAlbum(album) for album in paging["items"]]
+                    pagesOf[country][offset] = albums
+
+                    if offset == 0:
+                        offsets = range(paging["offset"] + paging["limit"],
+                                        paging["total"], paging["limit"]) \
+                            if paging["next"] else ()
+                        remaining[country] = len(offsets) + 1
+                        for later in offsets:
+                            pending[pool.submit(fetch, country, later)] = \
+                                (country, later)
+
+                    remaining[country] -= 1
+                    if not remaining[country] and self.cache:
+                        self.cache.putDocument(f"new-releases/{country}", {
+                            "date": today,
+                            "albums": [album for offset
+                                       in sorted(pagesOf[country])
+                                       for album in pagesOf[country][offset]]
+                        })
+                        del pagesOf[country]
+
+                    yield country, offset, albums
+
+    def newReleases(self, countries, limit=50):
+        # Unlike iterNewReleases, the albums are in a fixed order whatever
+        # order the pages complete in: by country as given, then by page
+        if isinstance(countries, str):
+            countries = [countries]
+        order = {country: n for n, country
+                 in enumerate(dict.fromkeys(countries))}
+        pages = sorted(self.newReleasePages(countries, limit=limit),
+                       key=lambda page: (order[page[0]], page[1]))
+        albums = list(uniqueAlbums(albums for _, _, albums in pages))
+        return {
+            "timestamp": self.timestamp(),
+            "countries": list(countries),
+            "count": len(albums),
+            "data": albums
+        }
+
     def next(self, url):
         return self.client.next(url)
 
+
+# Normalized records built from Spotify API objects
+
+
+# Artist fields genres can be weighted by
+GENRE_WEIGHTS = {"popularity": "popularity", "followers": "totalFollowers"}
+
+
+def syncedTracks(sourceTracks, targetTracks, removals, insertions):
+    # The target's track records after playlistSync wrote removals and
+    # insertions. Added tracks take their source record, added now
+    addedAt = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    byID = {track["trackID"]: track for track in sourceTracks}
+    tracks = list(targetTracks)
+    for position in sorted((position for _, position in removals),
+                           reverse=True):
+        del tracks[position]
+    for position, trackIDs in insertions:
+        added = [Track(**dict(byID[trackID], addedAt=addedAt))
+                 for trackID in trackIDs]
+        if position is None:
+            tracks.extend(added)
+        else:
+            tracks[position:position] = added
+    return tracks
+
+
+def uniqueAlbums(pages):
+    # The albums of pages of album records, each album once
+    seen = set()
+    for albums in pages:
+        for album in albums:
+            if album["id"] not in seen:
+                seen.add(album["id"])
+                yield album
+
+
+def countGenres(artists, weight=None):
+    # Number of artists in each genre, or with a weight field (eg:
+    # "popularity", "totalFollowers") the sum of it over those artists.
+    # defaultdict(int) provides a value of 0 for all new members
+    genres = defaultdict(int)
+    for artist in artists:
+        value = (artist[weight] or 0) if weight else 1
+        for genre in artist["genres"]:
+            genres[genre] += value
+    return genres
+
+
+def parsePlayback(res):
+    # The context name is looked up by the caller
+    context = None
+    if res["context"]:
+        context = {"type": res["context"]["type"],
+                   "id": res["context"]["uri"].split(":")[-1]}
+
+    album = res["item"]["album"]
+
+    return {
+        "context": context,
+        "device": res["device"],
+        "artists": [{"name": artist["name"], "id": artist["id"]}
+                    for artist in album["artists"]],
+        "album": {
+            "type": album["album_type"],
+            "id": album["id"],
+            "name": album["name"],
+            "release_date": album["release_date"],
+            "total_tracks": album["total_tracks"]
+        },
+        "track": {
+            "name": res["item"]["name"],
+            "id": res["item"]["id"],
+            "popularity": res["item"]["popularity"],
+        },
+        "state": {
+            "progress_ms": res["progress_ms"],
+            "repeat_state": res["repeat_state"],
+            "shuffle_state": res["shuffle_state"],
+            "timestamp": res["timestamp"]
+        }
+    }
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+from array import array
+
+# On disk store of audio analyses as flat float32 arrays, one directory per
+# track. Analyses are parsed as they download, a segment at a time, so the
+# multi MB json document is never held whole. The arrays are read back as
+# numpy memory maps, so many tracks can be sliced and compared without
+# loading them.
+
+# Columns of each array file. pitches and timbre are 12 wide
+COLUMNS = {
+    "segments": ("start", "duration", "confidence", "loudness_start",
+                 "loudness_max_time", "loudness_max"),
+    "pitches": 12,
+    "timbre": 12,
+    "beats": ("start", "duration", "confidence"),
+    "bars": ("start", "duration", "confidence"),
+    "tatums": ("start", "duration", "confidence"),
+    "sections": ("start", "duration", "confidence", "loudness", "tempo",
+                 "tempo_confidence", "key", "key_confidence", "mode",
+                 "mode_confidence", "time_signature",
+                 "time_signature_confidence"),
+}
+
+# Huge strings in the track object which nothing here uses
+DROPPED = {"codestring", "echoprintstring", "synchstring", "rhythmstring"}
+
+# Floats buffered per array before they're appended to its file
+FLUSH = 1 << 16
+
+
+def width(name):
+    columns = COLUMNS[name]
+    return columns if isinstance(columns, int) else len(columns)
+
+
+class StreamDecoder:
+    """ Decode json values one at a time from an iterable of text chunks """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text = ""
+        self.pos = 0
+        self.done = False
+
+    def more(self, size=1):
+        # Drop what's been consumed and read at least size more characters
+        parts = [self.text[self.pos:]]
+        read = 0
+        while read < size:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.done = True
+                break
+            parts.append(chunk)
+            read += len(chunk)
+        self.text = "".join(parts)
+        self.pos = 0
+
+    def peek(self):
+        """ The next non-whitespace character (None at the end) """
+        while True:
+            text = self.text
+            while self.pos < len(text) and text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(text):
+                return self.text[self.pos]
+            if self.done:
+                return None
+            self.more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """ The next whole json value """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+                # A value ending with the text may be cut short (eg: a
+                # number), unless there's no more text
+                if end < len(self.text) or self.done:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.done:
+                    raise
+            # At least double the text before decoding it again, so a long
+            # value (eg: the track's codestring) isn't decoded per chunk
+            self.more(len(self.text) - self.pos)
+
+    def items(self):
+        """ Yield the elements of the array which comes next """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+    def members(self):
+        """ Yield the keys of the object which comes next. The caller reads
+        each key's value (with value or items) before the next key """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+
+class AnalysisStore:
+    """ Audio analyses under root/<track ID>/: one <name>.f32 file of
+    float32 rows per COLUMNS entry, and track.json. root is created by the
+    first write """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, trackID):
+        return os.path.join(self.root, trackID)
+
+    def has(self, trackID):
+        return os.path.exists(os.path.join(self.path(trackID), "track.json"))
+
+    def write(self, trackID, chunks):
+        """ Parse an audio analysis document from an iterable of text chunks
+        into the store """
+        final = self.path(trackID)
+        tmp = f"{final}.{os.getpid()}.tmp"
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        os.makedirs(tmp, exist_ok=True)
+        files = {}
+        try:
+            for name in COLUMNS:
+                files[name] = open(os.path.join(tmp, f"{name}.f32"), "wb")
+            buffers = {name: array("f") for name in COLUMNS}
+
+            def add(name, values):
+                buffer = buffers[name]
+                buffer.extend(values)
+                if len(buffer) >= FLUSH:
+                    buffer.tofile(files[name])
+                    del buffer[:]
+
+            track = {}
+            decoder = StreamDecoder(chunks)
+            for key in decoder.members():
+                if key == "segments":
+                    columns = COLUMNS["segments"]
+                    for segment in decoder.items():
+                        add("segments", [segment.get(c) or 0.0
+                                         for c in columns])
+                        add("pitches", segment["pitches"])
+                        add("timbre", segment["timbre"])
+                elif key in COLUMNS:
+                    columns = COLUMNS[key]
+                    for item in decoder.items():
+                        add(key, [item.get(c) or 0.0 for c in columns])
+                elif key == "track":
+                    track = {k: v for k, v in decoder.value().items()
+                             if k not in DROPPED}
+                else:
+                    # meta and anything new
+                    decoder.value()
+
+            for name, f in files.items():
+                buffers[name].tofile(f)
+                f.close()
+            with open(os.path.join(tmp, "track.json"), "w") as f:
+                json.dump(track, f)
+
+            if os.path.exists(final):
+                shutil.rmtree(final)
+            os.replace(tmp, final)
+        except BaseException:
+            for f in files.values():
+                f.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def summary(self, trackID):
+        """ Row counts and the track level analysis, without numpy """
+        path = self.path(trackID)
+        with open(os.path.join(path, "track.json")) as f:
+            track = json.load(f)
+        rows = {name: os.path.getsize(os.path.join(path, f"{name}.f32"))
+                // (4 * width(name)) for name in COLUMNS}
+        return {"trackID": trackID, "path": path, "rows": rows,
+                "tempo": track.get("tempo"), "key": track.get("key"),
+                "duration": track.get("duration")}
+
+    def load(self, trackID):
+        """ {name: read only numpy memmap of rows x columns} and the track
+        level analysis under "track" """
+        import numpy as np
+
+        path = self.path(trackID)
+        with open(os.path.join(path, "track.json")) as f:
+            loaded = {"track": json.load(f)}
+        for name in COLUMNS:
+            filename = os.path.join(path, f"{name}.f32")
+            rows = os.path.getsize(filename) // (4 * width(name))
+            if rows:
+                loaded[name] = np.memmap(filename, dtype=np.float32,
+                                         mode="r", shape=(rows, width(name)))
+            else:
+                # mmap can't map an empty file
+                loaded[name] = np.zeros((0, width(name)), dtype=np.float32)
+        return loaded
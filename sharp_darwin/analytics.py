@@ -0,0 +1,117 @@
+import numpy as np
+
+# Audio feature analytics over whole playlists, vectorized with NumPy.
+# Requires numpy:
+#   pip install sharp_darwin[analytics]
+
+# Audio feature columns, in matrix order
+FEATURES = ("danceability", "energy", "key", "loudness", "mode",
+            "speechiness", "acousticness", "instrumentalness", "liveness",
+            "valence", "tempo", "duration_ms", "time_signature")
+
+# Features which describe how a track sounds, compared by similarTracks.
+# Key, mode, length and time signature make poor neighbours
+SIMILARITY = ("danceability", "energy", "loudness", "speechiness",
+              "acousticness", "instrumentalness", "liveness", "valence",
+              "tempo")
+
+# Standard deviations from its playlist's mean for a feature to stand out
+OUTLIER_Z = 3.0
+
+
+class FeatureMatrix:
+    """ Audio features of many tracks: one float32 row per track, one
+    column per FEATURES entry """
+
+    def __init__(self, trackIDs, matrix):
+        self.trackIDs = list(trackIDs)
+        self.matrix = matrix
+        self.rows = {trackID: row for row, trackID
+                     in enumerate(self.trackIDs)}
+        self.unit = None
+
+    @classmethod
+    def fromFeatures(cls, features):
+        """ From audio features documents. Unknown tracks (None) are left
+        out """
+        features = [f for f in features if f]
+        matrix = np.array(
+            [[f.get(column) or 0 for column in FEATURES] for f in features],
+            dtype=np.float32).reshape(len(features), len(FEATURES))
+        return cls([f["id"] for f in features], matrix)
+
+    def __len__(self):
+        return len(self.trackIDs)
+
+    def select(self, trackIDs):
+        """ Row numbers of the given tracks which have features """
+        return np.array([self.rows[trackID] for trackID in trackIDs
+                         if trackID in self.rows], dtype=np.intp)
+
+    def profile(self, rows=None):
+        """ Distribution of each feature over the rows (default: all), and
+        the rows with a feature more than OUTLIER_Z deviations out """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        ids = self.trackIDs if rows is None \
+            else [self.trackIDs[row] for row in rows]
+        if not len(matrix):
+            return {"count": 0, "outliers": []}
+
+        mean = matrix.mean(axis=0)
+        std = matrix.std(axis=0)
+        quartiles = np.percentile(matrix, [0, 25, 50, 75, 100], axis=0)
+
+        # Features which don't vary can't have outliers
+        spread = np.where(std > 0, std, np.inf)
+        z = (matrix - mean) / spread
+        outRows, outColumns = np.nonzero(np.abs(z) > OUTLIER_Z)
+
+        def byFeature(values):
+            return dict(zip(FEATURES, values.tolist()))
+
+        return {
+            "count": len(matrix),
+            "mean": byFeature(mean),
+            "std": byFeature(std),
+            "min": byFeature(quartiles[0]),
+            "p25": byFeature(quartiles[1]),
+            "median": byFeature(quartiles[2]),
+            "p75": byFeature(quartiles[3]),
+            "max": byFeature(quartiles[4]),
+            "outliers": [{
+                "trackID": ids[row],
+                "feature": FEATURES[column],
+                "value": float(matrix[row, column]),
+                "z": round(float(z[row, column]), 2)
+            } for row, column in zip(outRows.tolist(), outColumns.tolist())]
+        }
+
+    def similar(self, trackID, limit=10, rows=None):
+        """ [(trackID, cosine similarity)] of the limit tracks (among rows,
+        default: all) which sound most like trackID """
+        if self.unit is None:
+            # Standardize the compared features so none dominates (tempo is
+            # ~100, valence ~0.5), then scale rows to unit length: a dot
+            # product is then the cosine similarity
+            columns = [FEATURES.index(column) for column in SIMILARITY]
+            compared = self.matrix[:, columns]
+            std = compared.std(axis=0)
+            compared = (compared - compared.mean(axis=0)) / \
+                np.where(std > 0, std, 1)
+            norms = np.linalg.norm(compared, axis=1, keepdims=True)
+            self.unit = compared / np.where(norms > 0, norms, 1)
+
+        query = self.unit[self.rows[trackID]]
+        candidates = np.arange(len(self)) if rows is None else rows
+        # The track isn't its own neighbour
+        candidates = candidates[candidates != self.rows[trackID]]
+        scores = self.unit[candidates] @ query
+
+        limit = min(limit, len(candidates))
+        if not limit:
+            return []
+        # Only the top limit are sorted
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(self.trackIDs[candidates[i]], round(float(scores[i]), 4))
+                for i in top]
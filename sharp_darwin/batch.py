@@ -0,0 +1,214 @@
+import json
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sharp_darwin.completion import writeIndex
+from sharp_darwin.output import dumps
+
+# Run many CLI commands on one logged in SharpDarwin
+
+# Commands which change playlists. They run alone, in the order given, so
+# reads before and after them see a consistent library
+WRITES = {"playlist-consolidate", "playlist-copy", "playlist-create",
+          "playlist-delete", "playlist-sync", "dedupe", "sync",
+          "tracks-add"}
+
+TIME_RANGES = {"short": "short_term", "med": "medium_term",
+               "long": "long_term"}
+
+
+def execute(sharpDarwin, args):
+    """ Run one parsed command and return its result as json data """
+    if args.command == "artists-followed":
+        return sharpDarwin.artistsFollowed(
+            args.limit, weight=args.weight, refresh=args.refresh)
+
+    elif args.command == "audio-analysis":
+        if args.store:
+            return sharpDarwin.storeAnalyses(trackIDs(sharpDarwin, args))
+        if args.id and len(args.id) == 1:
+            return sharpDarwin.audioAnalysis(args.id[0])
+        return sharpDarwin.audioAnalyses(trackIDs(sharpDarwin, args))
+
+    elif args.command == "audio-features":
+        return sharpDarwin.audioFeatures(trackIDs(sharpDarwin, args))
+
+    elif args.command == "current-playback":
+        return sharpDarwin.currentPlayback()
+
+    elif args.command == "dedupe":
+        snapshots = {}
+        return sharpDarwin.dedupe(
+            playlistIDs(sharpDarwin, args, snapshots), across=args.across,
+            fuzzy=args.fuzzy, dryRun=args.dry_run, snapshots=snapshots)
+
+    elif args.command == "device-list":
+        return sharpDarwin.deviceList()
+
+    elif args.command == "me":
+        return sharpDarwin.me()
+
+    elif args.command == "playlist-consolidate":
+        return sharpDarwin.playlistConsolidate(
+            target=args.target[0], sources=args.source, pattern=args.pattern)
+
+    elif args.command == "playlist-copy":
+        return sharpDarwin.playlistCopy(
+            source=args.source[0], target=args.target[0])
+
+    elif args.command == "playlist-sync":
+        return sharpDarwin.playlistSync(
+            source=args.source[0], target=args.target[0],
+            mirror=args.mirror, dryRun=args.dry_run)
+
+    elif args.command == "playlist-create":
+        return sharpDarwin.playlistCreate(
+            playlistName=args.name[0], public=args.public,
+            descr=args.descr[0] if args.descr else "")
+
+    elif args.command == "playlist-delete":
+        return sharpDarwin.playlistDelete(args.id[0])
+
+    elif args.command == "playlist-list":
+        data = sharpDarwin.playlistList(mine=args.mine)
+        # Refresh the playlist ID completions as the CLI does
+        writeIndex(data["data"], merge=args.mine)
+        return data
+
+    elif args.command == "playlist-profile":
+        snapshots = {}
+        return sharpDarwin.playlistProfile(
+            playlistIDs(sharpDarwin, args, snapshots), snapshots=snapshots)
+
+    elif args.command == "similar-tracks":
+        snapshots = {}
+        return sharpDarwin.similarTracks(
+            args.track[0], playlistIDs(sharpDarwin, args, snapshots),
+            limit=args.limit, snapshots=snapshots)
+
+    elif args.command == "sync":
+        return sharpDarwin.sync()
+
+    elif args.command == "top-artists":
+        return sharpDarwin.topArtists(
+            limit=args.limit, time_range=TIME_RANGES[args.time])
+
+    elif args.command == "top-tracks":
+        return sharpDarwin.topTracks(
+            limit=args.limit, time_range=TIME_RANGES[args.time])
+
+    elif args.command == "tracks-list":
+        if args.id and len(args.id) == 1:
+            return sharpDarwin.trackList(args.id[0])
+        snapshots = {}
+        return sharpDarwin.trackLists(
+            playlistIDs(sharpDarwin, args, snapshots), snapshots=snapshots)
+
+    elif args.command == "tracks-add":
+        return sharpDarwin.tracksAdd(
+            args.playlist_id[0], True if args.now else args.id[0])
+
+    elif args.command == "where-is":
+        snapshots = {}
+        return sharpDarwin.whereIs(
+            args.track[0], playlistIDs(sharpDarwin, args, snapshots),
+            snapshots=snapshots)
+
+    elif args.command == "new-releases":
+        return sharpDarwin.newReleases(countries(sharpDarwin, args))
+
+    raise ValueError(f"Command can't be batched: {args.command}")
+
+
+def playlistIDs(sharpDarwin, args, snapshots=None):
+    """ The playlists a command's --id, --all or --mine picks (all by
+    default). snapshots is as for SharpDarwin.iterPlaylists """
+    if args.id:
+        return args.id
+    playlists = list(sharpDarwin.iterPlaylists(
+        mine=args.mine, snapshots=snapshots))
+    writeIndex(playlists, merge=args.mine)
+    return [playlist["id"] for playlist in playlists]
+
+
+def trackIDs(sharpDarwin, args):
+    """ The tracks a command's --id or --playlist picks """
+    if args.id:
+        return args.id
+    return sharpDarwin.playlistTrackIDs(args.playlist[0])
+
+
+def countries(sharpDarwin, args):
+    """ The countries a command's --country or --all-markets picks """
+    if args.all_markets:
+        return sharpDarwin.markets()
+    return args.country
+
+
+def parseLine(parser, line):
+    """ Parse one batch line into argparse args. A line is a json list of
+    arguments, a json object with an "argv" list, or a json string holding
+    a command line """
+    command = json.loads(line)
+    if isinstance(command, dict):
+        command = command["argv"]
+    if isinstance(command, str):
+        command = shlex.split(command)
+
+    try:
+        return parser.parse_args(command)
+    except SystemExit:
+        # argparse has already explained the problem on stderr
+        raise ValueError(f"Invalid arguments: {command}")
+
+
+def runBatch(sharpDarwin, parser, lines, out, concurrency=4):
+    """ Run each command in lines and write one json result per line to out
+    as it finishes. Read only commands run concurrently; writes run alone,
+    in order """
+    lock = threading.Lock()
+
+    def write(result):
+        with lock:
+            out.write(dumps(result).decode("utf-8") + "\n")
+            out.flush()
+
+    def run(number, args):
+        result = {"line": number, "command": args.command}
+        try:
+            result["result"] = execute(sharpDarwin, args)
+            result["success"] = True
+        except Exception as e:
+            result["success"] = False
+            result["error"] = repr(e)
+        write(result)
+        return result["success"]
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        running = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                args = parseLine(parser, line)
+                if args.command in (None, "batch"):
+                    raise ValueError(f"Not a batch command: {line.strip()}")
+            except Exception as e:
+                write({"line": number, "command": None, "success": False,
+                       "error": repr(e)})
+                ok = False
+                continue
+
+            if args.command in WRITES:
+                # Let the reads queued so far finish first
+                ok = all([future.result() for future in running]) and ok
+                running = []
+                ok = run(number, args) and ok
+            else:
+                running.append(pool.submit(run, number, args))
+
+        ok = all([future.result() for future in running]) and ok
+
+    return ok
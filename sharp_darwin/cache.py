@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from sharp_darwin.output import default
+from sharp_darwin.records import Playlist, Track
+
+# Local SQLite store of playlist metadata and track lists, keyed by the
+# playlist snapshot_id Spotify returns. A playlist's tracks are only
+# refetched once its snapshot changes. sync also keeps whole json documents
+# (followed artists, top lists) here for --offline.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    snapshot_id TEXT,
+    name TEXT,
+    owner TEXT,
+    total INTEGER,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS track_snapshots (
+    playlist_id TEXT PRIMARY KEY,
+    snapshot_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated TEXT
+);
+"""
+
+
+def connect(path, schema):
+    """ Open (creating it and its directory if need be) a SQLite database
+    shared by threads """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    with db:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(schema)
+    return db
+
+
+class MetadataCache:
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by the worker threads, serialized by a lock.
+        # It's opened on first use, so commands which never read the cache
+        # don't create it
+        self.lock = threading.Lock()
+        self.connection = None
+
+    @property
+    def db(self):
+        # Callers hold self.lock
+        if self.connection is None:
+            self.connection = connect(self.path, SCHEMA)
+        return self.connection
+
+    def timestamp(self):
+        return datetime.now().isoformat()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def putPlaylists(self, playlists):
+        """ Store playlist metadata: dicts of id, snapshot_id, name, owner
+        and total """
+        rows = [(p["id"], p["snapshot_id"], p["name"], p["owner"],
+                 p["total"], self.timestamp()) for p in playlists]
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+
+    def getPlaylist(self, playlist_id):
+        """ Stored metadata for a playlist, or None """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, snapshot_id, name, owner, total FROM playlists "
+                "WHERE id = ?", (playlist_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(
+            ("id", "snapshot_id", "name", "owner", "total"), row))
+
+    def listPlaylists(self):
+        """ Playlist records for every stored playlist, in the order they
+        were last listed """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT owner, id, total, name FROM playlists "
+                "ORDER BY rowid").fetchall()
+        return [Playlist(*row) for row in rows]
+
+    def playlistSnapshots(self):
+        """ {playlist ID: snapshot_id} of every stored playlist """
+        with self.lock:
+            return dict(self.db.execute(
+                "SELECT id, snapshot_id FROM playlists").fetchall())
+
+    def trackSnapshots(self):
+        """ {playlist ID: snapshot_id} of every playlist with stored
+        tracks """
+        with self.lock:
+            return dict(self.db.execute(
+                "SELECT playlist_id, snapshot_id FROM track_snapshots"
+            ).fetchall())
+
+    def removePlaylists(self, playlist_ids):
+        """ Forget the playlists and their tracks """
+        rows = [(playlist_id,) for playlist_id in playlist_ids]
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM playlists WHERE id = ?", rows)
+            self.db.executemany(
+                "DELETE FROM track_snapshots WHERE playlist_id = ?", rows)
+            self.db.executemany(
+                "DELETE FROM tracks WHERE playlist_id = ?", rows)
+
+    def getDocument(self, key):
+        """ A stored json document, or None """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data FROM documents WHERE key = ?",
+                (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def putDocument(self, key, data):
+        row = (key, json.dumps(data, default=default), self.timestamp())
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", row)
+
+    def getTracks(self, playlist_id, snapshot_id):
+        """ Stored track records for the playlist, or None if the stored
+        tracks are missing or belong to another snapshot """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT snapshot_id FROM track_snapshots "
+                "WHERE playlist_id = ?", (playlist_id,)).fetchone()
+            if row is None or row[0] != snapshot_id:
+                return None
+            rows = self.db.execute(
+                "SELECT data FROM tracks WHERE playlist_id = ? "
+                "ORDER BY position", (playlist_id,)).fetchall()
+        return [Track(**json.loads(data)) for data, in rows]
+
+    def putTracks(self, playlist_id, snapshot_id, tracks):
+        """ Replace the stored track records for the playlist """
+        rows = [(playlist_id, position, json.dumps(track, default=default))
+                for position, track in enumerate(tracks)]
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM tracks WHERE playlist_id = ?", (playlist_id,))
+            self.db.executemany(
+                "INSERT INTO tracks VALUES (?, ?, ?)", rows)
+            self.db.execute(
+                "INSERT OR REPLACE INTO track_snapshots VALUES (?, ?, ?, ?)",
+                (playlist_id, snapshot_id, len(rows), self.timestamp()))
+
+
+BLOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS blobs_used ON blobs (used);
+"""
+
+
+class BlobCache:
+    """ zlib compressed json documents (eg: audio features) keyed by kind
+    and ID. Once the stored size passes maxBytes, the least recently used
+    documents are dropped """
+
+    def __init__(self, path, maxBytes=256 << 20):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        # Opened on first use, like MetadataCache
+        self.connection = None
+        self.size = 0
+        self.clock = 0
+
+    @property
+    def db(self):
+        # Callers hold self.lock
+        if self.connection is None:
+            self.connection = connect(self.path, BLOB_SCHEMA)
+            self.size, self.clock = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) "
+                "FROM blobs").fetchone()
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def tick(self):
+        # Recency counter: cheaper and steadier than wall clock time
+        self.clock = self.clock + 1
+        return self.clock
+
+    def getMany(self, kind, ids):
+        """ {ID: document} of the stored documents among ids """
+        ids = list(ids)
+        found = {}
+        with self.lock, self.db:
+            # Stay under SQLite's limit on query parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self.db.execute(
+                    "SELECT id, data FROM blobs WHERE kind = ? AND id IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    [kind] + chunk).fetchall()
+                for blobID, data in rows:
+                    found[blobID] = json.loads(zlib.decompress(data))
+            if found:
+                used = self.tick()
+                self.db.executemany(
+                    "UPDATE blobs SET used = ? WHERE kind = ? AND id = ?",
+                    [(used, kind, blobID) for blobID in found])
+        return found
+
+    def putMany(self, kind, documents):
+        """ Store {ID: document} """
+        rows = []
+        for blobID, document in documents.items():
+            data = zlib.compress(
+                json.dumps(document, default=default).encode("utf-8"))
+            rows.append((blobID, data, len(data)))
+
+        with self.lock, self.db:
+            used = self.tick()
+            for blobID, data, size in rows:
+                old = self.db.execute(
+                    "SELECT size FROM blobs WHERE kind = ? AND id = ?",
+                    (kind, blobID)).fetchone()
+                if old:
+                    self.size = self.size - old[0]
+                self.db.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                    (kind, blobID, data, size, used))
+                self.size = self.size + size
+            if self.size > self.maxBytes:
+                self.evict()
+
+    def evict(self):
+        # Drop the least recently used documents until 90% full, so
+        # eviction doesn't run on every put
+        target = self.maxBytes * 9 // 10
+        rows = self.db.execute(
+            "SELECT kind, id, size FROM blobs ORDER BY used")
+        drop = []
+        for kind, blobID, size in rows:
+            if self.size <= target:
+                break
+            drop.append((kind, blobID))
+            self.size = self.size - size
+        self.db.executemany(
+            "DELETE FROM blobs WHERE kind = ? AND id = ?", drop)
+
+    def stats(self):
+        with self.lock:
+            count, = self.db.execute("SELECT COUNT(*) FROM blobs").fetchone()
+        return {"count": count, "bytes": self.size,
+                "maxBytes": self.maxBytes}
@@ -0,0 +1,88 @@
+import os
+import threading
+
+# Offline tab completion of playlist IDs. playlist-list saves every
+# playlist's ID and name to a small index file in the cache directory, and
+# the completers read it; completion never touches the network. Imported
+# by argParser, so keep it light.
+
+INDEX = "playlist-index.tsv"
+
+# IDs the last completer call matched by name rather than by ID prefix
+nameMatches = set()
+
+
+def loadCompletionEnv(line=None):
+    """ Completion runs before the command line is parsed or .env loaded.
+    Load the .env file the line names with --env (default: ./.env), so the
+    index is read from where playlist-list saved it """
+    from sharp_darwin.utils import loadEnv
+    words = (os.environ.get("COMP_LINE", "") if line is None else line).split()
+    path = "./.env"
+    for i, word in enumerate(words):
+        if word == "--env" and i + 1 < len(words):
+            path = words[i + 1]
+        elif word.startswith("--env="):
+            path = word[len("--env="):]
+    loadEnv(path)
+
+
+def indexPath():
+    from sharp_darwin.utils import cachePath
+    return cachePath(INDEX)
+
+
+def readIndex(path=None):
+    """ {playlist ID: name} from the completion index """
+    index = {}
+    try:
+        with open(path or indexPath(), encoding="utf-8") as f:
+            for line in f:
+                playlistID, _, name = line.rstrip("\n").partition("\t")
+                index[playlistID] = name
+    except OSError:
+        pass
+    return index
+
+
+def writeIndex(playlists, merge=False, path=None):
+    """ Save the ID and name of each playlist record for completion. With
+    merge, entries already in the index are kept """
+    path = path or indexPath()
+    index = readIndex(path) if merge else {}
+    for playlist in playlists:
+        # One line per playlist: tabs and newlines can't be in the name
+        index[playlist["id"]] = " ".join(playlist["playlistName"].split())
+
+    # Swap the file in whole so a completion never sees half of it
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    # Batch reads may write it from several threads at once
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("".join(f"{playlistID}\t{name}\n"
+                        for playlistID, name in index.items()))
+    os.replace(tmp, path)
+
+
+def playlistCompleter(prefix, **kwargs):
+    """ argcomplete completer: playlist IDs starting with prefix, or whose
+    name contains it (case-insensitive), described by their names """
+    needle = prefix.lower()
+    nameMatches.clear()
+
+    matches = {}
+    for playlistID, name in readIndex().items():
+        if playlistID.startswith(prefix):
+            matches[playlistID] = name
+        elif needle in name.lower():
+            matches[playlistID] = name
+            nameMatches.add(playlistID)
+    return matches
+
+
+def validator(completion, prefix):
+    """ argcomplete validator. argcomplete drops completions which don't
+    start with the word being completed; keep the playlists matched by
+    name too """
+    return completion.startswith(prefix) or completion in nameMatches
@@ -0,0 +1,155 @@
+import json
+import os
+import socket
+from sharp_darwin.exceptions import DaemonRunning, UnsafeSocket
+
+# A long running sharp-darwin which keeps a logged in SharpDarwin (with its
+# caches, connection pool and token) warm, and answers CLI commands over a
+# Unix socket. Only the client half is imported on every CLI run, so this
+# module must stay cheap to import.
+
+# Commands which the daemon never runs for a client
+LOCAL_ONLY = {None, "batch", "serve"}
+
+
+def socketPath():
+    """ Location of the daemon's Unix socket: SHARP_DARWIN_SOCKET, else in
+    XDG_RUNTIME_DIR, else in a directory of the temp dir only this user can
+    open """
+    if "SHARP_DARWIN_SOCKET" in os.environ:
+        return os.environ["SHARP_DARWIN_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "sharp-darwin.sock")
+    import tempfile
+    return os.path.join(
+        tempfile.gettempdir(), f"sharp-darwin-{os.getuid()}", "daemon.sock")
+
+
+def forwardable(parser, args):
+    """ Whether the daemon can run a command line. --no-cache and --env are
+    fixed when the daemon starts, so commands using them run in process """
+    return args.command not in LOCAL_ONLY and not args.no_cache \
+        and args.env == parser.get_default("env")
+
+
+def forward(argv, path=None):
+    """ Run a command line on the daemon. Returns the daemon's response
+    (stdout, stderr and exit status), or None if no daemon of this user is
+    listening """
+    return send({"argv": argv}, path)
+
+
+def send(request, path=None):
+    path = path or socketPath()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Only talk to a daemon run by this user: anyone could have made
+        # the socket
+        if os.stat(path).st_uid != os.getuid():
+            raise PermissionError(path)
+        sock.connect(path)
+        if peerUID(sock) not in (None, os.getuid()):
+            raise PermissionError(path)
+    except OSError:
+        sock.close()
+        return None
+
+    try:
+        with sock, sock.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+    except OSError:
+        line = None
+
+    if not line:
+        # The daemon went away mid request
+        return None
+    return json.loads(line)
+
+
+def peerUID(sock):
+    """ User ID of the process at the other end of a Unix socket, where the
+    platform tells (Linux), else None """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    import struct
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+def serve(sharpDarwin, parser, dispatch, path=None):
+    """ Answer requests on the socket until interrupted. Requests are run one
+    at a time with dispatch(sharpDarwin, parser, args), their output
+    captured and sent back """
+    import contextlib
+    import io
+    import socketserver
+    import traceback
+
+    if path is None and "SHARP_DARWIN_SOCKET" not in os.environ:
+        # The default directory must be this user's alone
+        path = socketPath()
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise UnsafeSocket(directory)
+    path = path or socketPath()
+
+    # Clear a socket left behind by a daemon which died
+    if os.path.exists(path):
+        if send({"ping": True}, path) is not None:
+            raise DaemonRunning(path)
+        os.unlink(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            if request.get("ping"):
+                return self.respond("", "", 0)
+
+            stdout = io.StringIO()
+            stderr = io.StringIO()
+            status = 0
+            with contextlib.redirect_stdout(stdout), \
+                    contextlib.redirect_stderr(stderr):
+                try:
+                    args = parser.parse_args(request["argv"])
+                    if not forwardable(parser, args):
+                        raise ValueError(
+                            "The daemon doesn't run this, run it with "
+                            f"--no-daemon: {request['argv']}")
+                    # Pick up a refreshed token from the credential cache
+                    sharpDarwin.login(refresh=True)
+                    sharpDarwin.args = args
+                    dispatch(sharpDarwin, parser, args)
+                except SystemExit as e:
+                    status = e.code if isinstance(e.code, int) else 1
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+
+            self.respond(stdout.getvalue(), stderr.getvalue(), status)
+
+        def respond(self, stdout, stderr, status):
+            self.wfile.write(json.dumps({
+                "stdout": stdout,
+                "stderr": stderr,
+                "status": status
+            }).encode() + b"\n")
+
+    server = socketserver.UnixStreamServer(path, Handler)
+    os.chmod(path, 0o600)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
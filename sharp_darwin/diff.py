@@ -0,0 +1,80 @@
+from collections import Counter
+
+# The writes which turn a target playlist into a copy of a source playlist
+# (playlist-sync), worked out from the two lists of track IDs with hash
+# lookups. Local files (no track ID) can't be added or removed by ID, so
+# they're left alone.
+
+
+def setDiff(source, target):
+    """ (removals, additions) leaving target with the tracks of source, in
+    any order. removals are the (trackID, position) of target tracks not in
+    source; additions the source tracks missing from target, once each, in
+    source order """
+    sourceIDs = set(source)
+    targetIDs = set(target)
+    removals = [(trackID, position) for position, trackID
+                in enumerate(target) if trackID and trackID not in sourceIDs]
+    additions = [trackID for trackID in dict.fromkeys(source)
+                 if trackID and trackID not in targetIDs]
+    return removals, additions
+
+
+def mirrorDiff(source, target):
+    """ (removals, insertions) leaving target the same as source, repeats
+    and order included. insertions are (position, [trackID]) runs, to be
+    inserted in the order given after the removals, or None if the tracks
+    target keeps aren't in source order (the playlist must be rewritten).
+    Local files stay where they are in target, and positions allow for
+    them """
+    source = [trackID for trackID in source if trackID]
+
+    # Each track is kept as many times as source has it; the rest go.
+    # localsBefore[n] counts the local files ahead of the nth kept track
+    wanted = Counter(source)
+    removals = []
+    kept = []
+    localsBefore = []
+    localFiles = 0
+    for position, trackID in enumerate(target):
+        if not trackID:
+            localFiles += 1
+        elif not wanted[trackID]:
+            removals.append((trackID, position))
+        else:
+            wanted[trackID] -= 1
+            kept.append(trackID)
+            localsBefore.append(localFiles)
+    localsBefore.append(localFiles)
+
+    # Match the kept tracks in order against source. Whatever they don't
+    # match is inserted ahead of the next kept track, runs of neighbours
+    # in one go
+    insertions = []
+    matched = 0
+    for position, trackID in enumerate(source):
+        if matched < len(kept) and kept[matched] == trackID:
+            matched += 1
+            continue
+        position += localsBefore[matched]
+        if insertions and \
+                insertions[-1][0] + len(insertions[-1][1]) == position:
+            insertions[-1][1].append(trackID)
+        else:
+            insertions.append((position, [trackID]))
+
+    if matched < len(kept):
+        return removals, None
+    return removals, insertions
+
+
+def batchCount(tracks, size=100):
+    """ Requests needed to write tracks, size per request """
+    return -(-tracks // size)
+
+
+def writeRequests(removals, insertions):
+    """ Requests a diff takes to write, at most: removals are counted as if
+    every track differed """
+    return batchCount(len(removals)) + sum(
+        batchCount(len(trackIDs)) for _, trackIDs in insertions)
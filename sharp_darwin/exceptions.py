@@ -32,3 +32,54 @@ class PlaylistNotFound(Exception):
 class FailedToAddToPlaylist(Exception):
     def __init__(self, results):
         Exception.__init__(self, results)
+
+
+class FailedToRemoveFromPlaylist(Exception):
+    def __init__(self, results):
+        Exception.__init__(self, results)
+
+
+class LocalFilesInPlaylist(Exception):
+    def __init__(self, playlist_id):
+        Exception.__init__(self, f"Playlist {playlist_id} has local files, which putting it in order would delete")
+
+
+class RequestFailed(Exception):
+    def __init__(self, status, results):
+        self.status = status
+        Exception.__init__(self, status, results)
+
+
+class DaemonRunning(Exception):
+    def __init__(self, path):
+        Exception.__init__(self, f"A daemon is already listening on {path}")
+
+
+class UnsafeSocket(Exception):
+    def __init__(self, path):
+        Exception.__init__(self, f"Not the daemon's to use, it's open to other users: {path}")
+
+
+class NotAvailableOffline(Exception):
+    def __init__(self, name):
+        Exception.__init__(self, f"Needs Spotify, not available --offline: {name}")
+
+
+class NotSynced(Exception):
+    def __init__(self, name):
+        Exception.__init__(self, f"Not in the local store, run sync: {name}")
+
+
+class NoCache(Exception):
+    def __init__(self, name):
+        Exception.__init__(self, f"Needs the local cache, drop --no-cache: {name}")
+
+
+class NoAudioFeatures(Exception):
+    def __init__(self, trackID):
+        Exception.__init__(self, f"No audio features for track {trackID}")
+
+
+class MarketsUnavailable(Exception):
+    def __init__(self):
+        Exception.__init__(self, "This spotipy can't list markets, upgrade it (spotipy>=2.19) or pass --country")
@@ -1,8 +1,22 @@
 import os
+import sys
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
 from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache, BlobCache
+from sharp_darwin.analysis import AnalysisStore
+from sharp_darwin.offline import OfflineSharpDarwin
+from sharp_darwin.ratelimit import RateLimiter
 from dotenv import load_dotenv
-from sharp_darwin.utils import jsonPrint
+from sharp_darwin.utils import jsonPrint, jsonStream, cachePath, argParser
+from sharp_darwin.batch import runBatch
+from sharp_darwin.completion import writeIndex
+from sharp_darwin.output import Writer
+from sharp_darwin.table import Table, Column
+
+# --stream tables size their columns to the first page of records
+STREAM_SAMPLE = 100
 
 
 def init(args):
@@ -35,8 +49,52 @@ def init(args):
     if "SHARP_DARWIN_CRED_CACHE" in os.environ:
         credCache = os.environ["SHARP_DARWIN_CRED_CACHE"]
 
+    # Number of concurrent requests used for pagination
+    concurrency = 4
+    if "SHARP_DARWIN_CONCURRENCY" in os.environ:
+        concurrency = int(os.environ["SHARP_DARWIN_CONCURRENCY"])
+
+    # HTTP connection pool size and request timeout (seconds)
+    poolSize = None
+    if "SHARP_DARWIN_POOL_SIZE" in os.environ:
+        poolSize = int(os.environ["SHARP_DARWIN_POOL_SIZE"])
+    timeout = None
+    if "SHARP_DARWIN_TIMEOUT" in os.environ:
+        timeout = float(os.environ["SHARP_DARWIN_TIMEOUT"])
+
+    # Requests per second to start at and never exceed
+    rateLimiter = RateLimiter(
+        rate=float(os.environ.get("SHARP_DARWIN_RATE", 10)),
+        maxRate=float(os.environ.get("SHARP_DARWIN_MAX_RATE", 50)))
+
+    # Local cache of playlist metadata and tracks, and of audio features
+    # and analyses (up to SHARP_DARWIN_AUDIO_CACHE_MB), and of analyses
+    # parsed into arrays (audio-analysis --store)
+    cache = None
+    blobs = None
+    analyses = None
+    if not args.no_cache:
+        cache = MetadataCache(cachePath("sharp-darwin.sqlite"))
+        blobs = BlobCache(
+            cachePath("sharp-darwin-audio.sqlite"),
+            maxBytes=int(float(os.environ.get(
+                "SHARP_DARWIN_AUDIO_CACHE_MB", 256)) * (1 << 20)))
+        analyses = AnalysisStore(cachePath("analysis"))
+
+    if args.offline:
+        if not cache:
+            print("--offline reads the local cache; drop --no-cache")
+            exit(1)
+        # Nothing to log in to
+        return OfflineSharpDarwin(
+            username=username, concurrency=concurrency, cache=cache,
+            blobs=blobs, analyses=analyses)
+
     # Used for calls out to spotify
-    sharpDarwin = SharpDarwin(username=username, credCache=credCache)
+    sharpDarwin = SharpDarwin(
+        username=username, credCache=credCache, concurrency=concurrency,
+        cache=cache, poolSize=poolSize, timeout=timeout,
+        rateLimiter=rateLimiter, blobs=blobs, analyses=analyses)
 
     # Log onto Spotify
     try:
@@ -47,14 +105,66 @@ def init(args):
     return sharpDarwin
 
 
+def stats(sharpDarwin):
+    """ --stats: request and cache counters, on stderr so they don't mix
+    with the command's output """
+    with Writer(sharpDarwin.args.output, stream=sys.stderr) as writer:
+        writer.document(sharpDarwin.stats())
+
+
 def artistsFollowed(sharpDarwin):
-    res = sharpDarwin.artistsFollowed(sharpDarwin.args.limit)
-    jsonPrint(res)
+    args = sharpDarwin.args
+    if args.output == "ndjson":
+        # Stream each artist as its page arrives
+        artists = sharpDarwin.iterArtistsFollowed(args.refresh)
+        if args.limit is not None:
+            artists = islice(artists, args.limit)
+        jsonStream(artists, "ndjson")
+        return
+
+    res = sharpDarwin.artistsFollowed(
+        args.limit, weight=args.weight, refresh=args.refresh)
+    jsonPrint(res, args.output)
 
 
 def audioAnalysis(sharpDarwin):
-    res = sharpDarwin.audioAnalysis(sharpDarwin.args.id[0])
-    jsonPrint(res)
+    if sharpDarwin.args.store:
+        res = sharpDarwin.storeAnalyses(selectedTracks(sharpDarwin))
+    elif sharpDarwin.args.id and len(sharpDarwin.args.id) == 1:
+        res = sharpDarwin.audioAnalysis(sharpDarwin.args.id[0])
+    else:
+        res = sharpDarwin.audioAnalyses(selectedTracks(sharpDarwin))
+    jsonPrint(res, sharpDarwin.args.output)
+
+
+def audioFeatures(sharpDarwin):
+    res = sharpDarwin.audioFeatures(selectedTracks(sharpDarwin))
+    if sharpDarwin.args.output == "ndjson":
+        jsonStream(res["data"], "ndjson")
+    else:
+        jsonPrint(res, sharpDarwin.args.output)
+
+
+def selectedTracks(sharpDarwin):
+    """ IDs of the tracks picked by --id or --playlist """
+    if sharpDarwin.args.id:
+        return sharpDarwin.args.id
+    return sharpDarwin.playlistTrackIDs(sharpDarwin.args.playlist[0])
+
+
+def batch(sharpDarwin):
+    """ Run a file (or stdin) of commands, one json result per line """
+    if sharpDarwin.args.file == "-":
+        lines = sys.stdin
+    else:
+        lines = open(sharpDarwin.args.file)
+
+    with lines:
+        ok = runBatch(
+            sharpDarwin, argParser(), lines, sys.stdout,
+            concurrency=sharpDarwin.concurrency)
+    if not ok:
+        exit(1)
 
 
 def currentPlayback(sharpDarwin):
@@ -64,12 +174,13 @@ def currentPlayback(sharpDarwin):
     if res is None:
         if sharpDarwin.args.json:
             jsonPrint({"success": False,
-                       "message": "nothing is currently playing"})
+                       "message": "nothing is currently playing"},
+                      sharpDarwin.args.output)
         else:
             print("Nothing currently playing")
     else:
         if sharpDarwin.args.json:
-            jsonPrint(res)
+            jsonPrint(res, sharpDarwin.args.output)
         else:
             track = [
                 {"Name": res["track"]["name"]},
@@ -152,16 +263,31 @@ def currentPlayback(sharpDarwin):
                     print(f"    {x:{labelWidth}s} : {y}")
 
 
+def dedupe(sharpDarwin):
+    """ Remove repeated tracks from playlists """
+    snapshots = {}
+    jsonPrint(
+        sharpDarwin.dedupe(
+            selectedPlaylists(sharpDarwin, snapshots),
+            across=sharpDarwin.args.across,
+            fuzzy=sharpDarwin.args.fuzzy,
+            dryRun=sharpDarwin.args.dry_run,
+            snapshots=snapshots
+        ),
+        sharpDarwin.args.output
+    )
+
+
 def deviceList(sharpDarwin):
     res = sharpDarwin.deviceList()
-    jsonPrint(res)
+    jsonPrint(res, sharpDarwin.args.output)
 
 
 def me(sharpDarwin):
     """ Show basic user data """
     ret = sharpDarwin.me()
     if sharpDarwin.args.json:
-        jsonPrint(ret)
+        jsonPrint(ret, sharpDarwin.args.output)
     else:
         displayName = ret["display_name"]
         followers = ret["followers"]["total"]
@@ -183,11 +309,37 @@ def playlistCopy(sharpDarwin):
     target = sharpDarwin.args.target[0]
 
     try:
-        jsonPrint(sharpDarwin.playlistCopy(source=source, target=target))
+        jsonPrint(sharpDarwin.playlistCopy(source=source, target=target),
+                  sharpDarwin.args.output)
     except BaseException:
         raise
 
 
+def playlistSync(sharpDarwin):
+    """ Make a playlist match another """
+    jsonPrint(
+        sharpDarwin.playlistSync(
+            source=sharpDarwin.args.source[0],
+            target=sharpDarwin.args.target[0],
+            mirror=sharpDarwin.args.mirror,
+            dryRun=sharpDarwin.args.dry_run
+        ),
+        sharpDarwin.args.output
+    )
+
+
+def playlistConsolidate(sharpDarwin):
+    """ Consolidate many playlists into one """
+    jsonPrint(
+        sharpDarwin.playlistConsolidate(
+            target=sharpDarwin.args.target[0],
+            sources=sharpDarwin.args.source,
+            pattern=sharpDarwin.args.pattern
+        ),
+        sharpDarwin.args.output
+    )
+
+
 def playlistCreate(sharpDarwin):
     """ Create a playlist """
     playlistName = sharpDarwin.args.name[0]
@@ -207,7 +359,8 @@ def playlistCreate(sharpDarwin):
                 playlistName=playlistName,
                 public=public,
                 descr=descr
-            )
+            ),
+            sharpDarwin.args.output
         )
     except BaseException:
         raise
@@ -218,7 +371,7 @@ def playlistDelete(sharpDarwin):
     try:
         sharpDarwin.playlistDelete(sharpDarwin.args.id[0])
         if sharpDarwin.args.json:
-            jsonPrint({"success": True})
+            jsonPrint({"success": True}, sharpDarwin.args.output)
         else:
             print("Playlist deleted")
     except BaseException:
@@ -227,26 +380,109 @@ def playlistDelete(sharpDarwin):
 
 def playlistList(sharpDarwin):
     """ Display playlists """
+    if sharpDarwin.args.output == "ndjson":
+        # Stream each playlist as its page arrives
+        playlists = []
+
+        def records():
+            for playlist in sharpDarwin.iterPlaylists(
+                    mine=sharpDarwin.args.mine):
+                playlists.append(playlist)
+                yield playlist
+
+        jsonStream(records(), "ndjson")
+        writeIndex(playlists, merge=sharpDarwin.args.mine)
+        return
+
+    if not sharpDarwin.args.json and sharpDarwin.args.stream:
+        # Print each playlist as its page arrives
+        playlists = []
+
+        def records():
+            for playlist in sharpDarwin.iterPlaylists(
+                    mine=sharpDarwin.args.mine):
+                playlists.append(playlist)
+                yield playlist
+
+        playlistTable(STREAM_SAMPLE).write(records())
+        writeIndex(playlists, merge=sharpDarwin.args.mine)
+        return
+
     data = sharpDarwin.playlistList(mine=sharpDarwin.args.mine)
 
+    # Refresh the offline playlist ID completions. --mine only lists some
+    # playlists, so keep the others
+    writeIndex(data["data"], merge=sharpDarwin.args.mine)
+
     if sharpDarwin.args.json:
-        jsonPrint(data)
+        jsonPrint(data, sharpDarwin.args.output)
     else:
-        # Get the longest char len
-        # to format the output correctly
-        longest = 0
-        for playlist in data["data"]:
-            charLength = len(playlist["owner"])
-            if charLength > longest:
-                longest = charLength
-
-        # Output header
-        print(f"{'id':^22s} | {'owner':^{longest}s} | {'total':^4s} | name")
-        # Display data
-        for playlist in data["data"]:
-            total = int(playlist["total"])
-            print(
-                f"{playlist['id']} | {playlist['owner']:{longest}s} | {total:>5d} | {playlist['playlistName']}")
+        playlistTable().write(data["data"])
+
+
+def playlistTable(sample=None):
+    return Table([
+        Column("id", itemgetter("id"), width=22),
+        Column("owner", itemgetter("owner")),
+        Column("total", lambda playlist: str(int(playlist["total"])),
+               width=5, align=">"),
+        Column("name", itemgetter("playlistName")),
+    ], sample=sample)
+
+
+def playlistProfile(sharpDarwin):
+    """ Audio feature distributions and outliers of playlists """
+    snapshots = {}
+    res = sharpDarwin.playlistProfile(
+        selectedPlaylists(sharpDarwin, snapshots), snapshots=snapshots)
+    if sharpDarwin.args.json:
+        jsonPrint(res, sharpDarwin.args.output)
+        return
+
+    def mean(feature, places=2):
+        def cell(profile):
+            if not profile["count"]:
+                return "-"
+            return f"{profile['mean'][feature]:.{places}f}"
+        return cell
+
+    Table([
+        Column("tracks", lambda profile: str(profile["tracks"]),
+               align=">"),
+        Column("tempo", mean("tempo", 1), align=">"),
+        Column("energy", mean("energy"), align=">"),
+        Column("dance", mean("danceability"), align=">"),
+        Column("valence", mean("valence"), align=">"),
+        Column("loudness", mean("loudness", 1), align=">"),
+        Column("outliers", lambda profile: str(len(profile["outliers"])),
+               align=">"),
+        Column("playlist", itemgetter("playlistName")),
+    ]).write(res["data"])
+
+
+def similarTracks(sharpDarwin):
+    """ Tracks in the user's playlists which sound like a track """
+    snapshots = {}
+    res = sharpDarwin.similarTracks(
+        sharpDarwin.args.track[0], selectedPlaylists(sharpDarwin, snapshots),
+        limit=sharpDarwin.args.limit, snapshots=snapshots)
+    if sharpDarwin.args.json:
+        jsonPrint(res, sharpDarwin.args.output)
+        return
+
+    Table([
+        Column("similarity", lambda track: f"{track['similarity']:.4f}",
+               width=10),
+        Column("track", itemgetter("trackName")),
+        Column("artists", lambda track: ", ".join(track["artists"])),
+        Column("track ID", itemgetter("trackID"), width=22),
+        Column("playlists", lambda track: ", ".join(track["playlists"])),
+    ]).write(res["data"])
+
+
+def sync(sharpDarwin):
+    """ Save the library for --offline """
+    jsonPrint(sharpDarwin.sync(), sharpDarwin.args.output)
 
 
 def topArtists(sharpDarwin):
@@ -262,40 +498,29 @@ def topArtists(sharpDarwin):
         limit=sharpDarwin.args.limit,
         time_range=time_range)
     if sharpDarwin.args.json:
-        jsonPrint(res)
+        jsonPrint(res, sharpDarwin.args.output)
     else:
-        count = res["count"]
-        time_range = res["time_range"]
         artists = res["data"]["artists"]
         genres = sorted(
             res["data"]["genres"],
             reverse=True,
             key=lambda x: x["count"])
 
-        longestArtist = 0
-        for artist in artists:
-            artistName = len(artist["name"])
-            if artistName > longestArtist:
-                longestArtist = artistName
-
-        itemCount = 0
-        print("\n===Artists===\n")
-        print(f"rank | {'artists':^{longestArtist}s} | genres")
-        for artist in artists:
-            itemCount = itemCount + 1
-            artistName = artist["name"]
-            artistGenres = artist["genres"]
-            print(
-                f"#{itemCount:3d} | {artistName:{longestArtist}s} | {', '.join(artistGenres)}")
-
-        print("\n===Genres===\n")
-        longestGenre = 0
-        for genre in genres:
-            if len(genre["genre"]) > longestGenre:
-                longestGenre = len(genre["genre"])
-        print(f"{'genre':^{longestGenre}s} | occurrences")
-        for genre in genres:
-            print(f"{genre['genre']:{longestGenre}s} | {genre['count']}")
+        writer = Writer()
+        artistTable = Table([
+            Column("rank", lambda ranked: f"#{ranked[0]:3d}", width=4),
+            Column("artists", lambda ranked: ranked[1]["name"]),
+            Column("genres", lambda ranked: ", ".join(ranked[1]["genres"])),
+        ], writer=writer)
+        artistTable.text("\n===Artists===\n")
+        artistTable.write(enumerate(artists, start=1))
+
+        genreTable = Table([
+            Column("genre", itemgetter("genre")),
+            Column("occurrences", lambda genre: str(genre["count"])),
+        ], writer=writer)
+        genreTable.text("\n===Genres===\n")
+        genreTable.write(genres)
 
 
 def topTracks(sharpDarwin):
@@ -312,64 +537,115 @@ def topTracks(sharpDarwin):
         time_range=time_range)
 
     if sharpDarwin.args.json:
-        jsonPrint(res)
+        jsonPrint(res, sharpDarwin.args.output)
     else:
-        longestTrack = 0
-        longestAlbum = 0
-        longestArtist = 0
-        for track in res["data"]["tracks"]:
-            trackName = len(track["trackName"])
-            albumName = len(track["albumName"])
-            artists = len(", ".join(track["artists"]))
-
-            if trackName > longestTrack:
-                longestTrack = trackName
-            if albumName > longestAlbum:
-                longestAlbum = albumName
-            if artists > longestArtist:
-                longestArtist = artists
-
-        print(f"{'track':^{longestTrack}s} | {'album':^{longestAlbum}s} | {'artists':^{longestArtist}s} | {'release date':^12s} | {'popularity':^10s} | {'track ID':^22s}")
-        for track in res["data"]["tracks"]:
-            releaseDate = "------------"
-            if track["releaseDate"]:
-                releaseDate = track["releaseDate"]
-            print(f"{track['trackName']:{longestTrack}s} | {track['albumName']:{longestAlbum}s} | {', '.join(track['artists']):{longestArtist}s} | {releaseDate:12s} | {track['popularity']:<10d} | {track['trackID']}")
+        Table([
+            Column("track", itemgetter("trackName")),
+            Column("album", itemgetter("albumName")),
+            Column("artists", lambda track: ", ".join(track["artists"])),
+            Column("release date",
+                   lambda track: track["releaseDate"] or "------------",
+                   width=12),
+            Column("popularity", lambda track: str(track["popularity"]),
+                   width=10),
+            Column("track ID", itemgetter("trackID"), width=22),
+        ]).write(res["data"]["tracks"])
 
 
 def tracksList(sharpDarwin):
+    """ List tracks in one or more playlists """
+    if sharpDarwin.args.id and len(sharpDarwin.args.id) == 1:
+        playlistTracks(sharpDarwin, sharpDarwin.args.id[0])
+        return
+
+    snapshots = {}
+    playlist_ids = selectedPlaylists(sharpDarwin, snapshots)
+
+    if sharpDarwin.args.json and sharpDarwin.args.output != "ndjson":
+        jsonPrint(sharpDarwin.trackLists(playlist_ids, snapshots=snapshots),
+                  sharpDarwin.args.output)
+        return
+
+    # Each playlist is printed as soon as it has been read, then the totals
+    results = []
+    with Writer(sharpDarwin.args.output) as writer:
+        for result in sharpDarwin.iterTrackLists(
+                playlist_ids, snapshots=snapshots):
+            if sharpDarwin.args.json:
+                writer.record(result)
+            elif "error" in result:
+                print(f"Failed to read playlist {result['playlist_id']}: "
+                      f"{result['error']}", file=sys.stderr)
+            else:
+                table = trackTable(writer=writer)
+                table.text(f"\n=== {result['playlistName']} "
+                           f"({result['playlist_id']}): "
+                           f"{result['count']} tracks ===\n")
+                table.write(result["tracks"])
+            writer.flush()
+
+            # Keep the totals, not the tracks
+            results.append({key: result[key] for key
+                            in ("playlist_id", "count", "error")
+                            if key in result})
+
+        summary = sharpDarwin.trackListSummary(results)
+        if sharpDarwin.args.json:
+            writer.record(summary)
+        else:
+            failed = f", {len(summary['failed'])} failed" \
+                if summary["failed"] else ""
+            writer.write(f"\n{summary['count']} playlists, "
+                         f"{summary['tracks']} tracks{failed}\n"
+                         .encode("utf-8"))
+
+
+def selectedPlaylists(sharpDarwin, snapshots=None):
+    """ IDs of the playlists picked by --id, --all or --mine. snapshots
+    collects the (name, snapshot ID) of listed playlists, as for
+    SharpDarwin.iterPlaylists """
+    if sharpDarwin.args.id:
+        return sharpDarwin.args.id
+
+    playlists = list(sharpDarwin.iterPlaylists(
+        mine=sharpDarwin.args.mine, snapshots=snapshots))
+    # Listing every playlist is a chance to refresh the completions
+    writeIndex(playlists, merge=sharpDarwin.args.mine)
+    return [playlist["id"] for playlist in playlists]
+
+
+def playlistTracks(sharpDarwin, playlist_id):
     """ List tracks in a playlist """
-    playlist_id = sharpDarwin.args.id[0]
-    res = sharpDarwin.trackList(playlist_id)
 
-    if sharpDarwin.args.json:
-        jsonPrint(res)
-    else:
+    if sharpDarwin.args.output == "ndjson":
+        # Stream each track as its page arrives (or from the cache)
+        jsonStream(sharpDarwin.iterSnapshotTracks(playlist_id), "ndjson")
+        return
 
-        # Get max field widths
-        longestArtist = 0
-        longestAlbum = 0
-        longestAddedAtDate = 0
-        longestTrackName = 0
-        for track in res["tracks"]:
-            artists = len(", ".join(track["artists"]))
-            album = len(track["albumName"])
-            trackName = len(track["trackName"])
+    if not sharpDarwin.args.json and sharpDarwin.args.stream:
+        # Print each track as its page arrives (or from the cache)
+        trackTable(STREAM_SAMPLE).write(
+            sharpDarwin.iterSnapshotTracks(playlist_id))
+        return
 
-            if artists > longestArtist:
-                longestArtist = artists
-            if album > longestAlbum:
-                longestAlbum = album
-            if trackName > longestTrackName:
-                longestTrackName = trackName
+    res = sharpDarwin.trackList(playlist_id)
+    if sharpDarwin.args.json:
+        jsonPrint(res, sharpDarwin.args.output)
+    else:
+        trackTable().write(res["tracks"])
 
-        print(f"{'artists':^{longestArtist}s} | {'album':^{longestAlbum}s} | {'track name':^{longestTrackName}s} | {'date added':^20s} | {'popularity':^10s} | {'track ID':^22s}")
-        for track in res["tracks"]:
-            addedAt = "------------"
-            if track["addedAt"]:
-                addedAt = track["addedAt"]
 
-            print(f"{', '.join(track['artists']):{longestArtist}s} | {track['albumName']:{longestAlbum}s} | {track['trackName']:{longestTrackName}s} | {addedAt:20s} | {track['popularity']:<10d} | {track['trackID']}")
+def trackTable(sample=None, writer=None):
+    return Table([
+        Column("artists", lambda track: ", ".join(track["artists"])),
+        Column("album", itemgetter("albumName")),
+        Column("track name", itemgetter("trackName")),
+        Column("date added", lambda track: track["addedAt"] or "------------",
+               width=20),
+        Column("popularity", lambda track: str(track["popularity"]),
+               width=10),
+        Column("track ID", itemgetter("trackID"), width=22),
+    ], writer=writer, sample=sample)
 
 
 def tracksAdd(sharpDarwin):
@@ -377,24 +653,50 @@ def tracksAdd(sharpDarwin):
         tid = True
     else:
         tid = sharpDarwin.args.id[0]
-    jsonPrint(sharpDarwin.tracksAdd(sharpDarwin.args.playlist_id[0], tid))
+    jsonPrint(sharpDarwin.tracksAdd(sharpDarwin.args.playlist_id[0], tid),
+              sharpDarwin.args.output)
+
+
+def whereIs(sharpDarwin):
+    """ Find the playlists a track appears in """
+    snapshots = {}
+    res = sharpDarwin.whereIs(
+        sharpDarwin.args.track[0], selectedPlaylists(sharpDarwin, snapshots),
+        snapshots=snapshots)
+    if sharpDarwin.args.json:
+        jsonPrint(res, sharpDarwin.args.output)
+    elif not res["data"]:
+        print(f"Not found in any playlist: {res['query']}")
+    else:
+        Table([
+            Column("playlist ID", itemgetter("playlist_id"), width=22),
+            Column("position", lambda item: str(item["position"]),
+                   width=8, align=">"),
+            Column("track", itemgetter("trackName")),
+            Column("artists", lambda item: ", ".join(item["artists"])),
+            Column("playlist", itemgetter("playlistName")),
+        ]).write(res["data"])
 
 
 def newReleases(sharpDarwin):
-    data = sharpDarwin.newReleases(country=sharpDarwin.args.country)
+    countries = sharpDarwin.args.country
+    if sharpDarwin.args.all_markets:
+        countries = sharpDarwin.markets()
+
+    if sharpDarwin.args.output == "ndjson":
+        # Stream each album as its page arrives
+        jsonStream(sharpDarwin.iterNewReleases(countries), "ndjson")
+        return
+
+    data = sharpDarwin.newReleases(countries)
     if sharpDarwin.args.json:
-        jsonPrint(data)
+        jsonPrint(data, sharpDarwin.args.output)
     else:
-        for s in data:
-            for item in s["albums"]["items"]:
-                artists = [artist["name"] for artist in item["artists"]]                
-                print(item["name"])
-                print(f"  Artists:      {', '.join(artists)}")
-                print(f"  Type:         {item['album_type']}")
-                print(f"  Release Date: {item['release_date']}")
-                print(f"  Total Tracks: {item['total_tracks']}")
-                print(f"  Spotify ID:   {item['id']}")
-                print()
-            
-        
-    
+        for item in data["data"]:
+            print(item["name"])
+            print(f"  Artists:      {', '.join(item['artists'])}")
+            print(f"  Type:         {item['type']}")
+            print(f"  Release Date: {item['release_date']}")
+            print(f"  Total Tracks: {item['total_tracks']}")
+            print(f"  Spotify ID:   {item['id']}")
+            print()
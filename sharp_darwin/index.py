@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+# Inverted index of tracks across playlists: track ID, or normalized
+# artist + title, to every (playlist, position) the track appears at.
+# Built in memory from trackList records.
+
+# Spotify IDs are 22 base62 characters, alone or in a URI or URL
+TRACK_ID = re.compile(r"(?:^|track[:/])([0-9A-Za-z]{22})(?:$|\?)")
+
+# Version details which don't make a different song: "(Remastered 2011)",
+# "[Live]", " - Radio Edit"
+VERSION = re.compile(r"\s*[(\[].*?[)\]]|\s+-\s+.*$")
+
+
+def normalize(artist, title):
+    """ Match key for a track: its first artist and its title without
+    version details, case, accents or punctuation """
+    text = unicodedata.normalize("NFKD", f"{artist} {VERSION.sub('', title)}")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", text.casefold()).split())
+
+
+def trackKey(track):
+    return normalize(track["artists"][0] if track["artists"] else "",
+                     track["trackName"])
+
+
+class TrackIndex:
+    """ Where every track appears. Playlists are kept in the order they
+    were added; "first" occurrences follow that order, then position """
+
+    def __init__(self):
+        self.names = {}
+        self.byID = defaultdict(list)
+        self.byKey = defaultdict(list)
+        # trackID: (trackName, artists)
+        self.tracks = {}
+
+    def add(self, playlist_id, playlistName, tracks):
+        self.names[playlist_id] = playlistName
+        for position, track in enumerate(tracks):
+            trackID = track["trackID"]
+            if not trackID:
+                # Local files and unavailable tracks
+                continue
+            occurrence = (playlist_id, position, trackID)
+            self.byID[trackID].append(occurrence)
+            self.byKey[trackKey(track)].append(occurrence)
+            self.tracks[trackID] = (track["trackName"], track["artists"])
+
+    def where(self, query):
+        """ Occurrences of a track ID (or URI/URL), else of an
+        "artist - title" """
+        match = TRACK_ID.search(query.strip())
+        if match:
+            occurrences = self.byID.get(match.group(1), [])
+        else:
+            artist, _, title = query.partition(" - ")
+            if not title:
+                artist, title = "", artist
+            occurrences = self.byKey.get(normalize(artist, title), [])
+        return [self.record(occurrence) for occurrence in occurrences]
+
+    def record(self, occurrence):
+        playlist_id, position, trackID = occurrence
+        trackName, artists = self.tracks[trackID]
+        return {
+            "playlist_id": playlist_id,
+            "playlistName": self.names[playlist_id],
+            "position": position,
+            "trackID": trackID,
+            "trackName": trackName,
+            "artists": artists
+        }
+
+    def duplicates(self, across=False, fuzzy=False):
+        """ {playlist ID: [(trackID, position)]} of the occurrences to
+        remove so each track is left once per playlist, or with across
+        only in the first playlist it appears in. fuzzy matches tracks by
+        artist and title rather than ID """
+        index = self.byKey if fuzzy else self.byID
+        order = {playlist_id: n for n, playlist_id in enumerate(self.names)}
+        remove = defaultdict(list)
+        for occurrences in index.values():
+            if len(occurrences) < 2:
+                continue
+            occurrences = sorted(
+                occurrences, key=lambda o: (order[o[0]], o[1]))
+            kept = set()
+            for playlist_id, position, trackID in occurrences:
+                scope = None if across else playlist_id
+                if scope in kept:
+                    remove[playlist_id].append((trackID, position))
+                else:
+                    kept.add(scope)
+        return dict(remove)
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Small in-memory cache for lookups by ID (playlist names and the like)
+
+
+class _Call:
+    # A load in progress. Threads asking for the same key wait on it
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class LRUCache:
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        # Seconds an entry stays fresh
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (expires, value), least recently used first
+        self.entries = OrderedDict()
+        # key -> _Call for loads in flight
+        self.calls = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, loader):
+        """ Return the cached value for key, calling loader() on a miss.
+        Concurrent misses for the same key share a single loader call """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            call = self.calls.get(key)
+            if call:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                call = self.calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            self.put(key, call.value)
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.value
+
+    def put(self, key, value):
+        """ Store value for key, evicting the least recently used entries """
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced
+            }
@@ -0,0 +1,87 @@
+from sharp_darwin.SharpDarwin import SharpDarwin, countGenres
+from sharp_darwin.records import FollowedArtist
+from sharp_darwin.exceptions import (
+    NoCache, NotAvailableOffline, NotSynced, PlaylistNotFound)
+
+# SharpDarwin answering from the library mirrored by sync, without logging
+# in or touching the network (--offline). Anything that would need Spotify
+# raises NotAvailableOffline.
+
+
+class OfflineClient:
+    """ Stands in for the spotipy client """
+
+    def __getattr__(self, name):
+        raise NotAvailableOffline(name)
+
+
+class OfflineSharpDarwin(SharpDarwin):
+    def __init__(self, username=None, cache=None, **kwargs):
+        if not cache:
+            raise NoCache("--offline")
+        SharpDarwin.__init__(self, username=username, cache=cache, **kwargs)
+        self.client = OfflineClient()
+
+    def login(self, refresh=False):
+        pass
+
+    def document(self, key):
+        data = self.cache.getDocument(key)
+        if data is None:
+            raise NotSynced(key)
+        return data
+
+    def iterArtistsFollowed(self, refresh=False):
+        for artist in self.document("artists-followed")["artists"]:
+            yield FollowedArtist(**artist)
+
+    def getPlaylistName(self, playlist_id):
+        return self.getPlaylistSnapshot(playlist_id)[0]
+
+    def getPlaylistSnapshot(self, playlist_id):
+        playlist = self.cache.getPlaylist(playlist_id)
+        if playlist is None:
+            raise PlaylistNotFound(playlist_id)
+        return playlist["name"], playlist["snapshot_id"]
+
+    def snapshotTracks(self, playlist_id, concurrency=None, known=None):
+        playlistName, snapshot = known or \
+            self.getPlaylistSnapshot(playlist_id)
+        tracks = self.cache.getTracks(playlist_id, snapshot)
+        if tracks is None:
+            raise NotSynced(playlist_id)
+        return playlistName, tracks
+
+    def iterPlaylists(self, mine=False, snapshots=None):
+        # Snapshots are local reads offline; there's nothing to collect
+        for playlist in self.cache.listPlaylists():
+            if mine and playlist["owner"] != self.username:
+                continue
+            yield playlist
+
+    def iterPlaylistTracks(self, playlist_id, concurrency=None):
+        return iter(self.snapshotTracks(playlist_id)[1])
+
+    def iterTrackIDs(self, playlist_id, concurrency=None):
+        for track in self.iterPlaylistTracks(playlist_id):
+            if track["trackID"]:
+                yield track["trackID"]
+
+    def topArtists(self, limit, time_range):
+        res = self.document(f"top-artists/{time_range}")
+        artists = res["data"]["artists"][:limit]
+        genres = countGenres(artists)
+        return dict(res, count=len(artists), data={
+            "artists": artists,
+            "genres": [{"genre": x, "count": genres[x]} for x in genres]})
+
+    def topTracks(self, limit, time_range):
+        res = self.document(f"top-tracks/{time_range}")
+        tracks = res["data"]["tracks"][:limit]
+        return dict(res, count=len(tracks), data={"tracks": tracks})
+
+    def streamAnalysis(self, trackID):
+        raise NotAvailableOffline(f"audio-analysis {trackID}")
+
+    def sync(self):
+        raise NotAvailableOffline("sync")
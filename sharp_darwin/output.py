@@ -0,0 +1,111 @@
+import io
+import json
+import sys
+
+# json output: pretty documents, compact documents, or ndjson streams of
+# records, written through one buffer. orjson is used for the compact forms
+# when it's installed:
+#   pip install sharp_darwin[fast]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MODES = ("json", "compact", "ndjson")
+
+
+def default(obj):
+    # Types json can't serialize on its own: records serialize as the dicts
+    # they stand in for
+    from sharp_darwin.records import Record, TrackColumns
+    if isinstance(obj, Record):
+        return obj.asDict()
+    if isinstance(obj, TrackColumns):
+        return obj.asList()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON "
+                    "serializable")
+
+
+def dumps(data, pretty=False):
+    """ data as json bytes. Pretty output keeps the layout jsonPrint has
+    always used: sorted keys, 4 space indents """
+    if pretty:
+        return json.dumps(
+            data, sort_keys=True, indent=4, separators=(',', ': '),
+            default=default).encode("utf-8")
+    if orjson:
+        return orjson.dumps(data, default=default)
+    return json.dumps(
+        data, separators=(',', ':'), ensure_ascii=False,
+        default=default).encode("utf-8")
+
+
+class Writer:
+    """ Buffered json writer. Output collects in memory and goes out to the
+    stream in chunks of about bufferSize bytes """
+
+    def __init__(self, mode=None, stream=None, bufferSize=1 << 16):
+        self.mode = mode or "json"
+        stream = stream or sys.stdout
+        # Bytes go straight to binary streams and to the buffer under
+        # sys.stdout. Other text streams (eg: a redirected stdout) get str
+        if isinstance(stream, io.TextIOBase):
+            self.binary = getattr(stream, "buffer", None)
+        else:
+            self.binary = stream
+        self.stream = stream
+        self.bufferSize = bufferSize
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.binary:
+            if self.binary is not self.stream:
+                # Anything already printed must come out first
+                self.stream.flush()
+            self.binary.write(self.buffer)
+            self.binary.flush()
+        else:
+            self.stream.write(self.buffer.decode("utf-8"))
+            self.stream.flush()
+        self.buffer.clear()
+
+    def document(self, data):
+        """ One whole json document """
+        self.write(dumps(data, pretty=self.mode == "json") + b"\n")
+
+    def record(self, data):
+        """ One ndjson line """
+        self.write(dumps(data) + b"\n")
+
+    def records(self, records):
+        """ Stream an iterable of records: one per line for ndjson, else as
+        a json array written element by element """
+        if self.mode == "ndjson":
+            for record in records:
+                self.record(record)
+            return
+
+        pretty = self.mode == "json"
+        self.write(b"[")
+        separator = b"\n    " if pretty else b""
+        for record in records:
+            self.write(separator)
+            data = dumps(record, pretty=pretty)
+            if pretty:
+                data = data.replace(b"\n", b"\n    ")
+            self.write(data)
+            separator = b",\n    " if pretty else b","
+        self.write(b"\n]\n" if pretty and separator != b"\n    " else b"]\n")
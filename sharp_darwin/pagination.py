@@ -0,0 +1,58 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Offset based pagination of Spotify paging objects
+
+
+def pages(fetch, key=None, concurrency=1):
+    """ Yield every page of a Spotify paging object, in order
+
+    fetch(offset) must return the page starting at offset. The first page
+    reports the total, so the remaining offsets are requested up front by a
+    pool of (at most) concurrency workers. key(page) returns the paging
+    object when it is wrapped, eg: new_releases() -> {"albums": {...}}
+    """
+    first = fetch(0)
+    yield first
+
+    paging = key(first) if key else first
+    if not paging["next"]:
+        return
+
+    step = paging["limit"]
+    offsets = range(paging["offset"] + step, paging["total"], step)
+
+    if concurrency <= 1:
+        for offset in offsets:
+            yield fetch(offset)
+        return
+
+    # Keep no more than concurrency requests in flight and hand the pages
+    # back in offset order
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        for offset in offsets:
+            pending.append(pool.submit(fetch, offset))
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def cursorPages(fetch, key=None):
+    """ Yield every page of a Spotify cursor paging object, in order
+
+    fetch(after) must return the page following the cursor after (None for
+    the first page). Each page only names the next one's cursor, so pages
+    can't be fetched ahead: they're requested one at a time. key is as for
+    pages, eg: current_user_followed_artists() -> {"artists": {...}}
+    """
+    after = None
+    while True:
+        page = fetch(after)
+        yield page
+
+        paging = key(page) if key else page
+        after = (paging.get("cursors") or {}).get("after")
+        if not paging["next"] or not after:
+            return
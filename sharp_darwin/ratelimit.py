@@ -0,0 +1,92 @@
+import threading
+import time
+
+# Rate limiting shared by every request sent to the Spotify API
+
+
+class RateLimiter:
+    """ Token bucket shared by all worker threads
+
+    The target rate backs off by half on every 429 and creeps back up
+    while requests succeed (AIMD). A Retry-After pauses every worker.
+    """
+
+    def __init__(self, rate=10.0, maxRate=50.0, minRate=0.5, burst=None,
+                 increase=1.0, clock=time.monotonic, sleep=time.sleep):
+        # Requests per second
+        self.rate = float(rate)
+        self.maxRate = float(maxRate)
+        self.minRate = float(minRate)
+        # Largest number of requests sent back to back
+        self.maxBurst = self.burst = float(burst or rate)
+        # Requests per second regained for every second's worth of
+        # successful requests
+        self.increase = increase
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = clock()
+        # No requests are sent before this time (Retry-After)
+        self.pausedUntil = 0.0
+        # Metrics
+        self.requests = 0
+        self.throttles = 0
+        self.waited = 0.0
+
+    def reserve(self):
+        """ Claim a token and return the seconds to wait before using it """
+        with self.lock:
+            now = self.clock()
+            # The bucket doesn't refill during a Retry-After pause
+            if now > self.updated:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+            # The bucket may go negative: later callers queue up behind
+            # the tokens already promised, spaced out after any pause
+            self.tokens -= 1
+            wait = max(0.0, self.pausedUntil - now) + \
+                max(0.0, -self.tokens / self.rate)
+            self.requests += 1
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.maxRate, self.rate + self.increase / self.rate)
+            self.burst = min(self.maxBurst, max(self.burst, self.rate))
+
+    def throttled(self, retryAfter=None):
+        """ A request got a 429; back off and honour Retry-After """
+        with self.lock:
+            now = self.clock()
+            self.throttles += 1
+            self.rate = max(self.minRate, self.rate / 2)
+            self.burst = max(1.0, min(self.burst, self.rate))
+            if retryAfter:
+                self.pausedUntil = max(self.pausedUntil, now + retryAfter)
+            # Drop any saved up burst, and refill from the end of the pause
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(now, self.pausedUntil)
+
+    def stats(self):
+        with self.lock:
+            now = self.clock()
+            tokens = min(self.burst, self.tokens +
+                         max(0.0, now - self.updated) * self.rate)
+            return {
+                "rate": self.rate,
+                "maxRate": self.maxRate,
+                # Seconds a request made now would wait
+                "wait": max(0.0, self.pausedUntil - now) +
+                max(0.0, (1 - tokens) / self.rate),
+                "waited": self.waited,
+                "requests": self.requests,
+                "throttled": self.throttles
+            }
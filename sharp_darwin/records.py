@@ -0,0 +1,270 @@
+from array import array
+from collections.abc import Mapping
+
+# Compact record types for the normalized tracks, playlists, albums and
+# artists SharpDarwin returns. Each record keeps its fields in __slots__
+# rather than a dict of repeated keys, but reads like the dict it replaces:
+# record["trackID"], record.get(...), dict(record). output.default and
+# asDict turn a record back into exactly that dict, keys in the same order.
+
+
+class Record(Mapping):
+    """ Base of the record types. Subclasses are made by recordType """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.asDict()!r})"
+
+    def asDict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def recordType(name, fields):
+    """ A Record subclass with the given fields, in their dict order """
+    fields = tuple(fields)
+    namespace = {}
+    exec(f"def __init__(self, {', '.join(fields)}):\n" +
+         "".join(f"    self.{field} = {field}\n" for field in fields),
+         namespace)
+    return type(name, (Record,), {
+        "__slots__": fields,
+        "FIELDS": fields,
+        "__init__": namespace["__init__"],
+    })
+
+
+def path(spec, source="obj"):
+    """ Python source reading spec out of source. spec is a dotted path of
+    keys where "key[]" maps the rest of the path over a list, eg:
+    "track.artists[].name" """
+    key, _, rest = spec.partition(".")
+    if key.endswith("[]"):
+        return (f"[{path(rest, 'x')} for x in {source}[{key[:-2]!r}]]"
+                if rest else f"list({source}[{key[:-2]!r}])")
+    source = f"{source}[{key!r}]"
+    return path(rest, source) if rest else source
+
+
+def extractor(cls, specs):
+    """ Compile a function making a cls record from an API object. specs
+    gives each field's path (see path), or a (convert, path) pair """
+    namespace = {"cls": cls}
+    args = []
+    for number, field in enumerate(cls.FIELDS):
+        spec = specs[field]
+        if isinstance(spec, tuple):
+            namespace[f"convert{number}"], spec = spec
+            args.append(f"convert{number}({path(spec)})")
+        else:
+            args.append(path(spec))
+    exec(f"def extract(obj):\n    return cls({', '.join(args)})\n",
+         namespace)
+    extract = namespace["extract"]
+    # The paths read, for building a fields expression
+    extract.paths = [spec[1] if isinstance(spec, tuple) else spec
+                     for spec in specs.values()]
+    return extract
+
+
+def projection(paths):
+    """ A Spotify fields expression selecting just the given paths (see
+    path), eg: ["track.id", "track.artists[].name"] -> "track(artists(name),
+    id)" """
+    tree = {}
+    for spec in paths:
+        node = tree
+        for key in spec.split("."):
+            if key.endswith("[]"):
+                key = key[:-2]
+            node = node.setdefault(key, {})
+
+    def render(node):
+        return ",".join(f"{key}({render(node[key])})" if node[key] else key
+                        for key in sorted(node))
+    return render(tree)
+
+
+# Paging object fields pagination.pages reads
+PAGING = "limit,next,offset,total"
+
+
+def pageFields(paths):
+    """ fields expression for a page of items with the given paths """
+    return f"items({projection(paths)}),{PAGING}"
+
+
+Playlist = recordType(
+    "Playlist", ["owner", "id", "total", "playlistName"])
+Track = recordType(
+    "Track", ["artists", "albumName", "trackName", "popularity", "trackID",
+              "addedAt", "href"])
+Album = recordType(
+    "Album", ["type", "id", "name", "release_date", "total_tracks",
+              "artists"])
+FollowedArtist = recordType(
+    "FollowedArtist", ["name", "totalFollowers", "id", "genres",
+                       "popularity"])
+TopArtist = recordType(
+    "TopArtist", ["name", "genres", "popularity", "url"])
+TopTrack = recordType(
+    "TopTrack", ["uri", "url", "trackName", "popularity", "artists",
+                 "trackID", "releaseDate", "albumName"])
+
+parsePlaylist = extractor(Playlist, {
+    "owner": "owner.id",
+    "id": "id",
+    # Get the total numer of tracks
+    "total": (int, "tracks.total"),
+    "playlistName": "name",
+})
+
+parsePlaylistTrack = extractor(Track, {
+    "artists": "track.artists[].name",
+    "albumName": "track.name",
+    "trackName": "track.name",
+    "popularity": "track.popularity",
+    "trackID": "track.id",
+    "addedAt": "added_at",
+    "href": "track.href",
+})
+
+
+def parsePlaylistItem(item):
+    """ Track record of a playlist item. An item whose track is gone (null)
+    keeps its place, as a record with no track ID like a local file """
+    if item["track"]:
+        return parsePlaylistTrack(item)
+    return Track(artists=[], albumName=None, trackName=None, popularity=None,
+                 trackID=None, addedAt=item.get("added_at"), href=None)
+
+
+parseAlbum = extractor(Album, {
+    "type": "album_type",
+    "id": "id",
+    "name": "name",
+    "release_date": "release_date",
+    "total_tracks": "total_tracks",
+    "artists": "artists[].name",
+})
+
+parseFollowedArtist = extractor(FollowedArtist, {
+    "name": "name",
+    "totalFollowers": "followers.total",
+    "id": "id",
+    "genres": "genres",
+    "popularity": "popularity",
+})
+
+parseTopArtist = extractor(TopArtist, {
+    "name": "name",
+    "genres": "genres",
+    "popularity": "popularity",
+    "url": "external_urls.spotify",
+})
+
+parseTopTrack = extractor(TopTrack, {
+    "uri": "uri",
+    "url": "external_urls.spotify",
+    "trackName": "name",
+    "popularity": "popularity",
+    "artists": "artists[].name",
+    "trackID": "id",
+    "releaseDate": "album.release_date",
+    "albumName": "album.name",
+})
+
+# fields for playlist track pages: whole Track records, or just IDs
+PLAYLIST_TRACK_FIELDS = pageFields(parsePlaylistTrack.paths)
+TRACK_ID_FIELDS = pageFields(["track.id"])
+
+
+class TrackColumns:
+    """ Tracks stored column by column. Track IDs are packed into one byte
+    array and popularities into an array of bytes; the other fields are
+    lists. Indexing and iterating give Track records """
+
+    # Spotify IDs are 22 base62 characters
+    ID_SIZE = 22
+
+    def __init__(self, tracks=()):
+        self.ids = bytearray()
+        # IDs which don't pack (eg: local files have none), by position
+        self.oddIDs = {}
+        self.popularity = array("b")
+        self.artists = []
+        self.albumNames = []
+        self.trackNames = []
+        self.addedAt = []
+        self.hrefs = []
+        self.extend(tracks)
+
+    def __len__(self):
+        return len(self.popularity)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return Track(list(self.artists[i]), self.albumNames[i],
+                     self.trackNames[i], self.popularityAt(i),
+                     self.trackID(i), self.addedAt[i], self.hrefs[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, track):
+        trackID = track["trackID"]
+        packed = b"" if trackID is None else trackID.encode("utf-8")
+        if len(packed) == self.ID_SIZE == len(trackID):
+            self.ids += packed
+        else:
+            self.oddIDs[len(self)] = trackID
+            self.ids += bytes(self.ID_SIZE)
+        popularity = track["popularity"]
+        self.popularity.append(-1 if popularity is None else popularity)
+        self.artists.append(tuple(track["artists"]))
+        self.albumNames.append(track["albumName"])
+        self.trackNames.append(track["trackName"])
+        self.addedAt.append(track["addedAt"])
+        self.hrefs.append(track["href"])
+
+    def extend(self, tracks):
+        for track in tracks:
+            self.append(track)
+
+    def trackID(self, i):
+        if i in self.oddIDs:
+            return self.oddIDs[i]
+        start = i * self.ID_SIZE
+        return self.ids[start:start + self.ID_SIZE].decode("ascii")
+
+    def trackIDs(self):
+        return [self.trackID(i) for i in range(len(self))]
+
+    def popularityAt(self, i):
+        popularity = self.popularity[i]
+        return None if popularity < 0 else popularity
+
+    def asList(self):
+        return [track.asDict() for track in self]
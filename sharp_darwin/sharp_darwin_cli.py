@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
+# Keep the imports here light: tab completion, --help and argument errors
+# finish before the frontend (spotipy, requests, dotenv...) is imported.
+# See benchmarks/startup.py
+import os
+import sys
 from sys import exit
-from sharp_darwin.frontend import *
-from sharp_darwin.utils import argParser
-import argcomplete
+from sharp_darwin.utils import argParser, loadEnv
+from sharp_darwin.daemon import forward, forwardable
 
 def main():
     ###########################
@@ -12,75 +16,144 @@ def main():
     # Load up the cli args
     parser = argParser()
 
-    argcomplete.autocomplete(parser)
+    # Only a completion request (set by the shell hook) needs argcomplete
+    if "_ARGCOMPLETE" in os.environ:
+        import argcomplete
+        from sharp_darwin.completion import validator, loadCompletionEnv
+        loadCompletionEnv()
+        argcomplete.autocomplete(parser, validator=validator)
     args = parser.parse_args()
-    
-    sharpDarwin = init(args)
+
+    # Let a running daemon answer, if there is one. --offline never needs
+    # the daemon's warm connection. .env may name the daemon's socket
+    if not args.no_daemon and not args.offline \
+            and forwardable(parser, args):
+        loadEnv(args.env)
+        res = forward(sys.argv[1:])
+        if res is not None:
+            sys.stdout.write(res["stdout"])
+            sys.stderr.write(res["stderr"])
+            exit(res["status"])
+
+    # A command is actually running; load the frontend
+    from sharp_darwin import frontend
+
+    sharpDarwin = frontend.init(args)
     sharpDarwin.args = args
 
+    dispatch(sharpDarwin, parser, args)
+
+
+def dispatch(sharpDarwin, parser, args):
+    from sharp_darwin import frontend
+    from sharp_darwin.daemon import serve
+
     ###########################
     # Commands                #
     ###########################
     if args.command == "artists-followed":
         # Listing of artists followed
-        artistsFollowed(sharpDarwin)
+        frontend.artistsFollowed(sharpDarwin)
 
     elif args.command == "audio-analysis":
         # Audio analysis for a specified track
-        audioAnalysis(sharpDarwin)
+        frontend.audioAnalysis(sharpDarwin)
+
+    elif args.command == "audio-features":
+        # Audio features for tracks
+        frontend.audioFeatures(sharpDarwin)
+
+    elif args.command == "batch":
+        # Run many commands in one process
+        frontend.batch(sharpDarwin)
+
+    elif args.command == "serve":
+        # Keep a warm client running for other invocations
+        serve(sharpDarwin, parser, dispatch)
+
+    elif args.command == "playlist-profile":
+        # Audio feature profile of playlists
+        frontend.playlistProfile(sharpDarwin)
+
+    elif args.command == "similar-tracks":
+        # More like this
+        frontend.similarTracks(sharpDarwin)
+
+    elif args.command == "sync":
+        # Save the library for --offline
+        frontend.sync(sharpDarwin)
 
     elif args.command == "current-playback":
         # Current playback
-        currentPlayback(sharpDarwin)
+        frontend.currentPlayback(sharpDarwin)
+
+    elif args.command == "dedupe":
+        # Remove repeated tracks
+        frontend.dedupe(sharpDarwin)
 
     elif args.command == "device-list":
-        deviceList(sharpDarwin)
+        frontend.deviceList(sharpDarwin)
 
     elif args.command == "me":
         # Return Spotify account info
-        me(sharpDarwin)
+        frontend.me(sharpDarwin)
 
     elif args.command == "playlist-copy":
         # Copy a playlist to another
-        playlistCopy(sharpDarwin)
+        frontend.playlistCopy(sharpDarwin)
+
+    elif args.command == "playlist-sync":
+        # Make a playlist match another
+        frontend.playlistSync(sharpDarwin)
+
+    elif args.command == "playlist-consolidate":
+        # Consolidate many playlists into one
+        frontend.playlistConsolidate(sharpDarwin)
 
     elif args.command == "playlist-create":
         # Create a playlist
-        playlistCreate(sharpDarwin)
+        frontend.playlistCreate(sharpDarwin)
 
     elif args.command == "playlist-delete":
         # Delete a playlist
-        playlistDelete(sharpDarwin)
+        frontend.playlistDelete(sharpDarwin)
 
     elif args.command == "playlist-list":
         # Get a curated listing of playlists
-        playlistList(sharpDarwin)
+        frontend.playlistList(sharpDarwin)
 
     elif args.command == "top-artists":
         # Get user's top artists
-        topArtists(sharpDarwin)
+        frontend.topArtists(sharpDarwin)
 
     elif args.command == "top-tracks":
         # Get user's top tracks
-        topTracks(sharpDarwin)
+        frontend.topTracks(sharpDarwin)
 
     elif args.command == "tracks-list":
         # List tracks in a playlist
-        tracksList(sharpDarwin)
+        frontend.tracksList(sharpDarwin)
 
     elif args.command == "tracks-add":
         # Add track to playlist
-        tracksAdd(sharpDarwin)
+        frontend.tracksAdd(sharpDarwin)
+
+    elif args.command == "where-is":
+        # Find a track across playlists
+        frontend.whereIs(sharpDarwin)
 
     elif args.command == "new-releases":
         # List new releases
-        newReleases(sharpDarwin)
+        frontend.newReleases(sharpDarwin)
 
     else:
         # This should never happen... unless I made a mistake.
         parser.print_help()
         print("\nUnexpected command? Given: ", args.command)
 
+    if args.stats:
+        frontend.stats(sharpDarwin)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+from itertools import islice
+from sharp_darwin.output import Writer
+
+# Human readable tables. Each cell is turned into a string once, column
+# widths are found while the cells are built, and rows go out in large
+# chunks through an output.Writer rather than a print per row.
+
+# Rows formatted per write to the Writer
+CHUNK = 1024
+
+
+class Column:
+    """ One table column. cell(record) gives the cell's value, printed as a
+    string. width fixes the column's width; otherwise it fits the widest
+    cell """
+
+    __slots__ = ("header", "cell", "width", "align")
+
+    def __init__(self, header, cell, width=None, align="<"):
+        self.header = header
+        self.cell = cell
+        self.width = width
+        self.align = align
+
+
+class Table:
+    """ Render records under a header row. With sample, the column widths
+    come from the first sample records only, and rows are written as the
+    records arrive: later cells wider than their column spill over """
+
+    def __init__(self, columns, writer=None, sample=None, separator=" | "):
+        self.columns = columns
+        self.writer = writer or Writer()
+        self.sample = sample
+        self.separator = separator
+
+    def cells(self, records, widths):
+        """ The cells of records, column by column, widening widths to fit
+        them """
+        records = list(records)
+        columns = []
+        for i, column in enumerate(self.columns):
+            # Values which aren't strings (eg: the None track ID of a
+            # local file) print as str() would show them
+            cells = [cell if isinstance(cell, str) else str(cell)
+                     for cell in map(column.cell, records)]
+            widths[i] = max(widths[i], max(map(len, cells), default=0))
+            columns.append(cells)
+        return columns
+
+    def write(self, records):
+        records = iter(records)
+        # Columns are at least as wide as their header
+        widths = [column.width or len(column.header)
+                  for column in self.columns]
+        if self.sample is None:
+            columns = self.cells(records, widths)
+        else:
+            columns = self.cells(islice(records, self.sample), widths)
+        # Fixed widths never grow
+        widths = [column.width or width
+                  for column, width in zip(self.columns, widths)]
+
+        # The last column isn't padded, unless its width is fixed
+        last = len(self.columns) - 1
+        self.line(f"{column.header:^{width}s}" if i < last or column.width
+                  else column.header
+                  for i, (column, width) in enumerate(
+                      zip(self.columns, widths)))
+
+        row = self.separator.join(
+            f"{{{i}:{column.align}{widths[i]}s}}" if i < last else f"{{{i}}}"
+            for i, column in enumerate(self.columns)) + "\n"
+
+        self.rows(row, columns)
+        if self.sample is not None:
+            while True:
+                columns = self.cells(islice(records, CHUNK), list(widths))
+                if not columns[0]:
+                    break
+                self.rows(row, columns)
+                # Let each chunk out as soon as it's formatted
+                self.writer.flush()
+        self.writer.flush()
+
+    def rows(self, row, columns):
+        for start in range(0, len(columns[0]), CHUNK):
+            self.writer.write("".join(map(
+                row.format,
+                *[cells[start:start + CHUNK] for cells in columns]
+            )).encode("utf-8"))
+
+    def line(self, cells):
+        self.writer.write((self.separator.join(cells) + "\n").encode("utf-8"))
+
+    def text(self, text):
+        """ A line of text outside the table, eg: a title """
+        self.writer.write((text + "\n").encode("utf-8"))
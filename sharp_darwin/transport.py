@@ -0,0 +1,74 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+# HTTP transport shared by every call to the Spotify API
+
+
+class RateLimitedSession(requests.Session):
+    """ Session which sends every request through a shared RateLimiter and
+    retries 429 responses after their Retry-After """
+
+    def __init__(self, limiter, retries=5):
+        requests.Session.__init__(self)
+        self.limiter = limiter
+        self.retries = retries
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            res = requests.Session.request(self, method, url, *args, **kwargs)
+            if res.status_code != 429:
+                self.limiter.succeeded()
+                return res
+
+            self.limiter.throttled(retryAfter(res))
+            if attempt < self.retries:
+                res.close()
+
+        # Out of retries; let the caller see the 429
+        return res
+
+
+def retryAfter(res):
+    # Seconds from a Retry-After header, default 1
+    try:
+        return float(res.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+def buildSession(poolSize=10, limiter=None):
+    """ Keep-alive requests session with a connection pool of poolSize,
+    rate limited by limiter if given """
+    if limiter:
+        session = RateLimitedSession(limiter)
+    else:
+        session = requests.Session()
+    session.headers["Connection"] = "keep-alive"
+
+    # Block rather than open throwaway connections when every pooled
+    # connection is busy, so concurrent workers reuse the same TLS sessions
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=poolSize, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def poolStats(session):
+    """ Connection pool counters for a session built by buildSession """
+    stats = {"pools": 0, "connections": 0, "requests": 0, "idle": 0}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats["pools"] += 1
+            # Connections opened vs requests sent over them
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+            # Free slots in the pool hold None until a connection is made
+            if pool.pool:
+                stats["idle"] += sum(1 for conn in list(pool.pool.queue)
+                                     if conn)
+    stats["reused"] = stats["requests"] - stats["connections"]
+    return stats
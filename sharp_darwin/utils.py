@@ -1,37 +1,117 @@
-import json
+import os
 from os.path import abspath
 import argparse
+from collections.abc import Mapping
+from sharp_darwin.completion import playlistCompleter
 
 # Various random things which are useful
 
 
-def jsonPrint(data):
-    """ Pretty print json data """
-    print(
-        json.dumps(
-            data,
-            sort_keys=True,
-            indent=4,
-            separators=(',', ': ')
-        )
-    )
+def jsonPrint(data, output=None):
+    """ Print json data: pretty (default), compact or ndjson """
+    from sharp_darwin.output import Writer
+    with Writer(output) as writer:
+        writer.document(data)
+
+
+def jsonStream(records, output=None):
+    """ Print records as they are produced: one per line for ndjson, else
+    as a json array """
+    from sharp_darwin.output import Writer
+    with Writer(output) as writer:
+        writer.records(records)
 
 
-def writeJSONFile(filename, data, pretty=False):
-    """ Write json data to file """
+def writeJSONFile(filename, data, pretty=False, ndjson=False):
+    """ Write json data to file. An iterator of records is streamed to the
+    file as a json array, or as ndjson """
+    from sharp_darwin.output import Writer
     fqpn = abspath(filename)
-    with open(fqpn, "w") as f:
-        if pretty:
-            json.dump(
-                data,
-                f,
-                sort_keys=True,
-                indent=4,
-                separators=(
-                    ',',
-                    ': '))
+    mode = "ndjson" if ndjson else "json" if pretty else "compact"
+    with open(fqpn, "wb") as f, Writer(mode, f) as writer:
+        if isinstance(data, Mapping) or \
+                (isinstance(data, list) and not ndjson):
+            writer.document(data)
         else:
-            json.dump(data, f)
+            writer.records(data)
+
+
+class OutputAction(argparse.Action):
+    # Choosing an output format implies --json
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        namespace.json = True
+
+
+def loadEnv(path):
+    """ Set the variables of a .env file which aren't set already. A light
+    stand in for python-dotenv for code which runs before the frontend is
+    imported (completion, the daemon client): KEY=VALUE lines, optionally
+    quoted or after "export", and # comments """
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return
+    for line in lines:
+        line = line.strip()
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        key, sep, value = line.partition("=")
+        if not sep or key.startswith("#"):
+            continue
+        value = value.strip()
+        if len(value) > 1 and value[0] in "\"'" and value[-1] == value[0]:
+            value = value[1:-1]
+        else:
+            value = value.split(" #", 1)[0].rstrip()
+        os.environ.setdefault(key.strip(), value)
+
+
+def cachePath(filename):
+    """ Path of a file in the sharp-darwin cache directory. The directory is
+    created by whatever first writes there """
+    # SHARP_DARWIN_CACHE_DIR, else next to the OAuth credential cache, else
+    # the per-user cache directory (never the current working directory)
+    cacheDir = os.environ.get("SHARP_DARWIN_CACHE_DIR")
+    if not cacheDir:
+        cacheDir = os.path.dirname(
+            os.environ.get("SHARP_DARWIN_CRED_CACHE", ""))
+    if not cacheDir:
+        cacheDir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or
+            os.path.join(os.path.expanduser("~"), ".cache"), "sharp-darwin")
+    return os.path.join(cacheDir, filename)
+
+
+def playlistArgs(parser, required):
+    """ --id, --all and --mine to pick the playlists a command reads """
+    mutex = parser.add_mutually_exclusive_group(required=required)
+    mutex.add_argument(
+        "--id",
+        type=str,
+        nargs="+",
+        help="Playlist ID(s)"
+    ).completer = playlistCompleter
+    mutex.add_argument(
+        "--all",
+        action="store_true",
+        help="Every playlist" + ("" if required else " (default)"))
+    mutex.add_argument(
+        "--mine",
+        action="store_true",
+        help="Every playlist created by the user")
+
+
+def trackArgs(parser):
+    """ --id or --playlist to pick the tracks a command reads """
+    mutex = parser.add_mutually_exclusive_group(required=True)
+    mutex.add_argument(
+        "--id", type=str, nargs="+", help="Track ID(s)")
+    mutex.add_argument(
+        "--playlist", type=str, nargs=1,
+        help="Every track in a playlist"
+    ).completer = playlistCompleter
 
 
 def argParser():
@@ -49,12 +129,47 @@ def argParser():
         action="store_true",
         help="Display output as json")
 
+    parser.add_argument(
+        "--output",
+        choices=["json", "compact", "ndjson"],
+        action=OutputAction,
+        help="json output format: pretty printed json (default), compact "
+        "single line json, or ndjson streamed one record per line. "
+        "Implies --json")
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print playlist-list and tracks-list tables as each page "
+        "arrives. Column widths fit the first page")
+
     parser.add_argument(
         "--env",
         type=str,
         default="./.env",
         help="Location of dot env file (default: ./.env)")
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use the local playlist cache")
+
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Answer from the library saved by sync, without Spotify")
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="After the command, print rate limiter, connection pool and "
+        "cache counters to stderr")
+
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Run here even if a sharp-darwin serve daemon is running")
+
     ################
     # Sub-commands #
     ################
@@ -63,18 +178,57 @@ def argParser():
     sp_cmd_artists_followed = subparsers.add_parser(
         "artists-followed", help="Listing of artists followed")
     sp_cmd_artists_followed.add_argument(
-        "--limit", type=int, default=20, help="List limit (default: 20)")
+        "--limit", type=int, help="List limit (default: all)")
+    sp_cmd_artists_followed.add_argument(
+        "--weight", choices=["popularity", "followers"],
+        help="Weight genre counts by artist popularity or followers")
+    sp_cmd_artists_followed.add_argument(
+        "--refresh", action="store_true",
+        help="Fetch every page rather than revalidating the cached list")
 
     """" audio analysis """
     sp_cmd_audio_analysis = subparsers.add_parser(
-        "audio-analysis", help="Audio analysis for a track")
+        "audio-analysis", help="Audio analysis for tracks")
+    trackArgs(sp_cmd_audio_analysis)
     sp_cmd_audio_analysis.add_argument(
-        "--id", type=str, nargs=1, required=True, help="Track ID")
+        "--store", action="store_true",
+        help="Parse into memory-mapped arrays in the cache, print a summary")
+
+    """ audio features """
+    sp_cmd_audio_features = subparsers.add_parser(
+        "audio-features", help="Audio features for tracks")
+    trackArgs(sp_cmd_audio_features)
+
+    """ batch """
+    sp_cmd_batch = subparsers.add_parser(
+        "batch", help="Run many commands, one json result per line")
+    sp_cmd_batch.add_argument(
+        "--file", type=str, default="-",
+        help="File of commands, one json argument list per line "
+        "(default: stdin)")
 
     """ current playback """
     sp_cmd_current_playback = subparsers.add_parser(
         "current-playback", help="Show the current playback")
 
+    """ dedupe """
+    sp_cmd_dedupe = subparsers.add_parser(
+        "dedupe", help="Remove repeated tracks from playlists")
+    playlistArgs(sp_cmd_dedupe, required=True)
+    sp_cmd_dedupe.add_argument(
+        "--across",
+        action="store_true",
+        help="Keep each track only in the first playlist (in the order "
+        "given) which has it")
+    sp_cmd_dedupe.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="Match tracks by artist and title, not just by ID")
+    sp_cmd_dedupe.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be removed")
+
     """ device List """
     sp_cmd_device_list = subparsers.add_parser(
         "device-list", help="List devices")
@@ -88,11 +242,56 @@ def argParser():
     sp_cmd_playlist_copy.add_argument(
         "--source", type=str,
         nargs=1, required=True,
-        help="Source playlist ID from which to copy tracks")
+        help="Source playlist ID from which to copy tracks"
+    ).completer = playlistCompleter
     sp_cmd_playlist_copy.add_argument(
         "--target", type=str,
         nargs=1, required=True,
-        help="Target playlist ID to copy tracks to")
+        help="Target playlist ID to copy tracks to"
+    ).completer = playlistCompleter
+
+    """ playlist-sync """
+    sp_cmd_playlist_sync = subparsers.add_parser(
+        "playlist-sync",
+        help="Add and remove tracks so target matches source")
+    sp_cmd_playlist_sync.add_argument(
+        "--source", type=str,
+        nargs=1, required=True,
+        help="Source playlist ID to match"
+    ).completer = playlistCompleter
+    sp_cmd_playlist_sync.add_argument(
+        "--target", type=str,
+        nargs=1, required=True,
+        help="Target playlist ID to change"
+    ).completer = playlistCompleter
+    sp_cmd_playlist_sync.add_argument(
+        "--mirror",
+        action="store_true",
+        help="Also match repeats and the order of source")
+    sp_cmd_playlist_sync.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would change")
+
+    """ playlist-consolidate """
+    sp_cmd_playlist_consolidate = subparsers.add_parser(
+        "playlist-consolidate",
+        help="Copy the unique tracks of many playlists to a target")
+    sp_cmd_playlist_consolidate.add_argument(
+        "--target", type=str,
+        nargs=1, required=True,
+        help="Target playlist ID to copy tracks to"
+    ).completer = playlistCompleter
+    mutex = sp_cmd_playlist_consolidate.add_mutually_exclusive_group(
+        required=True)
+    mutex.add_argument(
+        "--source", type=str,
+        nargs="+",
+        help="Source playlist IDs from which to copy tracks"
+    ).completer = playlistCompleter
+    mutex.add_argument(
+        "--pattern", type=str,
+        help="Copy from all playlists with a matching name (eg: '2019-*')")
 
     """ playlist-create """
     sp_cmd_playlist_create = subparsers.add_parser(
@@ -118,7 +317,8 @@ def argParser():
         type=str,
         nargs=1,
         required=True,
-        help="ID of playlist")
+        help="ID of playlist"
+    ).completer = playlistCompleter
     sp_cmd_playlist_delete.add_argument(
         "--confirm",
         action="store_true",
@@ -134,6 +334,37 @@ def argParser():
         default=False,
         help="Shows only my playlists")
 
+    """ playlist-profile """
+    sp_cmd_playlist_profile = subparsers.add_parser(
+        "playlist-profile",
+        help="Audio feature distributions and outliers of playlists")
+    playlistArgs(sp_cmd_playlist_profile, required=False)
+
+    """ serve """
+    subparsers.add_parser(
+        "serve", help="Keep a logged in client running to answer commands")
+
+    """ similar-tracks """
+    sp_cmd_similar_tracks = subparsers.add_parser(
+        "similar-tracks",
+        help="Tracks in your playlists which sound like a track")
+    sp_cmd_similar_tracks.add_argument(
+        "--track",
+        type=str,
+        nargs=1,
+        required=True,
+        help="Track ID, URI or URL")
+    sp_cmd_similar_tracks.add_argument(
+        "--limit", type=int,
+        default=10,
+        help="Number of results to return (default: 10)")
+    playlistArgs(sp_cmd_similar_tracks, required=False)
+
+    """ sync """
+    subparsers.add_parser(
+        "sync", help="Save the library locally for --offline. Only "
+        "playlists changed since the last sync are fetched")
+
     """ top-artists """
     sp_cmd_top_artists = subparsers.add_parser(
         "top-artists", help="Show user's top artists")
@@ -160,13 +391,8 @@ def argParser():
 
     """ tracks-list """
     sp_cmd_tracks_list = subparsers.add_parser(
-        "tracks-list", help="List tracks in a playlist")
-    sp_cmd_tracks_list.add_argument(
-        "--id",
-        type=str,
-        nargs=1,
-        required=True,
-        help="Playlist ID")
+        "tracks-list", help="List tracks in one or more playlists")
+    playlistArgs(sp_cmd_tracks_list, required=True)
 
     """ tracks-add """
     sp_cmd_tracks_list = subparsers.add_parser(
@@ -175,7 +401,8 @@ def argParser():
         "--playlist-id",
         required=True,
         type=str, nargs=1,
-        help="Playlist ID")
+        help="Playlist ID"
+    ).completer = playlistCompleter
     mutex = sp_cmd_tracks_list.add_mutually_exclusive_group(required=True)
     mutex.add_argument(
         "--id",
@@ -187,13 +414,28 @@ def argParser():
         action="store_true",
         help="Add the current song")
 
+    """ where-is """
+    sp_cmd_where_is = subparsers.add_parser(
+        "where-is", help="Find the playlists a track appears in")
+    sp_cmd_where_is.add_argument(
+        "--track",
+        type=str,
+        nargs=1,
+        required=True,
+        help="Track ID, URI or URL, or \"artist - title\"")
+    playlistArgs(sp_cmd_where_is, required=False)
+
     """ new-releases """
     sp_cmd_new_releases = subparsers.add_parser(
         "new-releases", help="Lists new releases"
     )
     sp_cmd_new_releases.add_argument(
-        "-c", "--country", default="US", type=str,
-        help="An ISO 3166-1 alpha-2 country code"
+        "-c", "--country", default=["US"], type=str, nargs="+",
+        help="ISO 3166-1 alpha-2 country code(s) (default: US)"
+    )
+    sp_cmd_new_releases.add_argument(
+        "--all-markets", action="store_true",
+        help="Every country Spotify is available in"
     )
 
     return parser
@@ -0,0 +1,105 @@
+from collections import Counter
+
+# In-memory stand-in for the spotipy client, for the playlist calls
+# SharpDarwin makes. Playlists are lists of track IDs; None is a local
+# file and False an unavailable item (no track). Every call is counted
+# in calls. Reads of a playlist in failures raise its exception
+
+
+def trackID(n):
+    """ A 22 character track ID """
+    return f"{n:022d}"
+
+
+class FakeSpotify:
+    def __init__(self, playlists=None):
+        self.playlists = {playlist_id: list(tracks) for playlist_id, tracks
+                          in (playlists or {}).items()}
+        self.snapshots = Counter()
+        self.calls = Counter()
+        self.failures = {}
+
+    def write(self, playlist_id):
+        self.snapshots[playlist_id] += 1
+        return {"snapshot_id": str(self.snapshots[playlist_id])}
+
+    def item(self, trackID):
+        if trackID is False:
+            return {"added_at": "2020-01-01T00:00:00Z", "track": None}
+        return {
+            "added_at": "2020-01-01T00:00:00Z",
+            "track": {"artists": [{"name": "artist"}], "href": "href",
+                      "id": trackID, "name": f"track {trackID}",
+                      "popularity": 50, "is_local": trackID is None}
+        }
+
+    def read(self, playlist_id):
+        if playlist_id in self.failures:
+            raise self.failures[playlist_id]
+
+    def user_playlists(self, user, limit=50, offset=0):
+        self.calls["user_playlists"] += 1
+        ids = list(self.playlists)
+        return {
+            "items": [{"id": playlist_id, "name": playlist_id,
+                       "snapshot_id": str(self.snapshots[playlist_id]),
+                       "owner": {"id": user},
+                       "tracks": {"total": len(self.playlists[playlist_id])}}
+                      for playlist_id in ids[offset:offset + limit]],
+            "limit": limit,
+            "offset": offset,
+            "total": len(ids),
+            "next": "next" if offset + limit < len(ids) else None
+        }
+
+    def user_playlist(self, user, playlist_id, fields=None):
+        self.calls["user_playlist"] += 1
+        self.read(playlist_id)
+        return {"name": playlist_id,
+                "snapshot_id": str(self.snapshots[playlist_id])}
+
+    def user_playlist_tracks(self, user, playlist_id, fields=None, limit=100,
+                             offset=0):
+        self.calls["user_playlist_tracks"] += 1
+        self.read(playlist_id)
+        tracks = self.playlists[playlist_id]
+        return {
+            "items": [self.item(trackID)
+                      for trackID in tracks[offset:offset + limit]],
+            "limit": limit,
+            "offset": offset,
+            "total": len(tracks),
+            "next": "next" if offset + limit < len(tracks) else None
+        }
+
+    def user_playlist_add_tracks(self, user, playlist_id, tracks,
+                                 position=None):
+        self.calls["user_playlist_add_tracks"] += 1
+        assert 0 < len(tracks) <= 100
+        assert all(tracks), "None track ID sent"
+        if position is None:
+            self.playlists[playlist_id].extend(tracks)
+        else:
+            self.playlists[playlist_id][position:position] = tracks
+        return self.write(playlist_id)
+
+    def user_playlist_replace_tracks(self, user, playlist_id, tracks):
+        self.calls["user_playlist_replace_tracks"] += 1
+        assert len(tracks) <= 100
+        self.playlists[playlist_id] = list(tracks)
+        return self.write(playlist_id)
+
+    def user_playlist_remove_specific_occurrences_of_tracks(
+            self, user, playlist_id, tracks, snapshot_id=None):
+        self.calls["user_playlist_remove_specific_occurrences_of_tracks"] += 1
+        assert snapshot_id == str(self.snapshots[playlist_id])
+        assert len(tracks) <= 100
+        playlist = self.playlists[playlist_id]
+        positions = []
+        for track in tracks:
+            for position in track["positions"]:
+                assert playlist[position] == track["uri"]
+                positions.append(position)
+        for position in sorted(positions, reverse=True):
+            del playlist[position]
+        return self.write(playlist_id)
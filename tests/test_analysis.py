@@ -0,0 +1,37 @@
+import json
+import os
+
+from sharp_darwin.analysis import AnalysisStore
+
+
+def chunks(text, size=7):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_store_is_created_by_first_write(tmp_path):
+    root = tmp_path / "analysis"
+    store = AnalysisStore(str(root))
+    assert not os.path.exists(root)
+    assert not store.has("track")
+
+    document = json.dumps({
+        "meta": {"status_code": 0},
+        "track": {"tempo": 120.5, "key": 5, "duration": 3.0,
+                  "codestring": "x" * 1000},
+        "bars": [{"start": 0.0, "duration": 2.0, "confidence": 0.5}],
+        "segments": [{"start": 0.0, "duration": 1.0, "confidence": 1.0,
+                      "loudness_start": -20, "loudness_max_time": 0.1,
+                      "loudness_max": -5, "pitches": [0.5] * 12,
+                      "timbre": [1.0] * 12}] * 3,
+    })
+    store.write("track", chunks(document))
+
+    assert store.has("track")
+    summary = store.summary("track")
+    assert summary["tempo"] == 120.5
+    assert summary["rows"]["segments"] == 3
+    assert summary["rows"]["pitches"] == 3
+    assert summary["rows"]["bars"] == 1
+    assert summary["rows"]["beats"] == 0
+    with open(root / "track" / "track.json") as f:
+        assert "codestring" not in json.load(f)
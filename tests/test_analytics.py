@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.analytics import FEATURES, FeatureMatrix
+from fakes import FakeSpotify, trackID
+
+
+def features(n, **values):
+    document = {"id": trackID(n), "tempo": 100.0, "energy": 0.5,
+                "valence": 0.5, "danceability": 0.5}
+    document.update(values)
+    return document
+
+
+def test_from_features():
+    matrix = FeatureMatrix.fromFeatures(
+        [features(0), None, features(1, tempo=120.0, key=None)])
+    # Unknown tracks are left out, missing features are 0
+    assert matrix.trackIDs == [trackID(0), trackID(1)]
+    assert matrix.matrix.dtype == np.float32
+    assert matrix.matrix.shape == (2, len(FEATURES))
+    assert matrix.matrix[1, FEATURES.index("tempo")] == 120
+    assert matrix.matrix[1, FEATURES.index("key")] == 0
+    assert matrix.select([trackID(1), "unknown", trackID(0)]).tolist() == \
+        [1, 0]
+
+    assert len(FeatureMatrix.fromFeatures([])) == 0
+
+
+def test_profile_and_outliers():
+    # One tempo far out among 20 (z = sqrt(19))
+    matrix = FeatureMatrix.fromFeatures(
+        [features(n) for n in range(19)] + [features(19, tempo=300.0)])
+    profile = matrix.profile()
+    assert profile["count"] == 20
+    assert profile["mean"]["tempo"] == pytest.approx(110)
+    assert profile["median"]["tempo"] == 100
+    assert profile["max"]["tempo"] == 300
+    # Features which don't vary have no outliers
+    assert profile["outliers"] == [{"trackID": trackID(19),
+                                    "feature": "tempo", "value": 300.0,
+                                    "z": round(19 ** 0.5, 2)}]
+
+    # Among some rows only
+    assert matrix.profile(matrix.select([trackID(0), trackID(1)]))[
+        "outliers"] == []
+    assert matrix.profile(matrix.select([])) == {"count": 0, "outliers": []}
+
+
+def test_similar():
+    matrix = FeatureMatrix.fromFeatures([
+        features(0, energy=0.9, valence=0.9),
+        features(1, energy=0.8, valence=0.9),
+        features(2, energy=0.1, valence=0.2),
+        features(3, energy=0.9, valence=0.8),
+    ])
+    similar = matrix.similar(trackID(0), limit=2)
+    # Not itself, most similar first
+    assert {track for track, _ in similar} == {trackID(1), trackID(3)}
+    assert similar[0][1] >= similar[1][1]
+    assert matrix.similar(trackID(0), limit=10)[-1][0] == trackID(2)
+
+    rows = matrix.select([trackID(0), trackID(2)])
+    assert [track for track, _ in matrix.similar(trackID(0), rows=rows)] == \
+        [trackID(2)]
+    assert matrix.similar(trackID(0), rows=matrix.select([trackID(0)])) == []
+
+
+class FakeFeatures(FakeSpotify):
+    def audio_features(self, tracks):
+        self.calls["audio_features"] += 1
+        return [features(int(track), tempo=float(int(track)))
+                for track in tracks]
+
+
+def test_playlist_profile():
+    client = FakeFeatures({"a": [trackID(0), None, trackID(1)],
+                           "b": [trackID(1), trackID(2)]})
+    sd = SharpDarwin(username="me")
+    sd.client = client
+    snapshots = {}
+    ids = [p["id"] for p in sd.iterPlaylists(snapshots=snapshots)]
+    res = sd.playlistProfile(ids, snapshots=snapshots)
+
+    assert [(p["playlist_id"], p["tracks"], p["count"])
+            for p in res["data"]] == [("a", 3, 2), ("b", 2, 2)]
+    assert res["data"][1]["mean"]["tempo"] == 1.5
+    # The listing's snapshots are reused, and shared tracks asked for once
+    assert client.calls["user_playlist"] == 0
+    assert client.calls["audio_features"] == 1
+
+    # A failed read comes through as it is
+    client.failures["b"] = ConnectionError("reset")
+    with pytest.raises(ConnectionError):
+        sd.playlistProfile(ids, snapshots=snapshots)
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from sharp_darwin import SharpDarwin as module
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+
+
+class FollowingClient:
+    def __init__(self, artists):
+        self.artists = artists
+        self.calls = 0
+
+    def current_user_followed_artists(self, limit=20, after=None):
+        self.calls += 1
+        start = self.artists.index(after) + 1 if after else 0
+        items = self.artists[start:start + limit]
+        last = start + limit >= len(self.artists)
+        return {"artists": {
+            "items": [{"name": artist, "id": artist, "genres": ["pop"],
+                       "popularity": 1, "followers": {"total": 1}}
+                      for artist in items],
+            "total": len(self.artists),
+            "next": None if last else "next",
+            "cursors": {"after": None if last else items[-1]}
+        }}
+
+
+def test_stored_list_expires(tmp_path):
+    artists = [f"artist{n}" for n in range(120)]
+    client = FollowingClient(list(artists))
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite")))
+    sd.client = client
+    assert [a["id"] for a in sd.iterArtistsFollowed()] == artists
+    assert client.calls == 3
+
+    # Follow one artist and unfollow another past the first page: the
+    # first page and total match, so the stored list is reused
+    client.artists[100] = "new"
+    client.calls = 0
+    assert [a["id"] for a in sd.iterArtistsFollowed()] == artists
+    assert client.calls == 1
+
+    # Once it's older than the TTL every page is fetched again
+    stored = sd.cache.getDocument("artists-followed")
+    stored["timestamp"] = (datetime.now() - timedelta(
+        seconds=module.ARTISTS_FOLLOWED_TTL + 1)).isoformat()
+    sd.cache.putDocument("artists-followed", stored)
+    client.calls = 0
+    assert [a["id"] for a in sd.iterArtistsFollowed()] == client.artists
+    assert client.calls == 3
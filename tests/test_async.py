@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from sharp_darwin.AsyncSharpDarwin import AsyncSharpDarwin
+from sharp_darwin.ratelimit import RateLimiter
+from fakes import trackID
+
+
+def webAPI(playlists, throttle):
+    """ Stub of the Web API playlist track endpoints. The first request for
+    each path in throttle gets a 429 """
+    requests = []
+    added = {}
+
+    async def tracks(request):
+        requests.append(request.path_qs)
+        if request.path in throttle:
+            throttle.discard(request.path)
+            return web.Response(status=429, headers={"Retry-After": "0.01"})
+        assert request.headers["Authorization"] == "Bearer token"
+
+        playlist = request.match_info["playlist"]
+        if request.method == "POST":
+            uris = (await request.json())["uris"]
+            added.setdefault(playlist, []).extend(uris)
+            return web.json_response({"snapshot_id": "1"}, status=201)
+
+        items = playlists[playlist]
+        offset = int(request.query["offset"])
+        limit = int(request.query["limit"])
+        return web.json_response({
+            "items": [{"track": None if track is False else {"id": track}}
+                      for track in items[offset:offset + limit]],
+            "offset": offset,
+            "limit": limit,
+            "total": len(items),
+            "next": "next" if offset + limit < len(items) else None
+        })
+
+    app = web.Application()
+    app.router.add_route("*", "/v1/playlists/{playlist}/tracks", tracks)
+    return app, requests, added
+
+
+def run(playlists, throttle, test):
+    async def main():
+        app, requests, added = webAPI(playlists, throttle)
+        async with TestServer(app) as server:
+            async with AsyncSharpDarwin(
+                    token="token", rateLimiter=RateLimiter(rate=1000),
+                    prefix=str(server.make_url("/v1/"))) as sd:
+                return await test(sd), requests, added
+    return asyncio.run(main())
+
+
+def test_pages_in_order_with_429_retry():
+    ids = [trackID(n) for n in range(450)]
+
+    async def test(sd):
+        return [trackID async for trackID in sd.iterTrackIDs("source")]
+
+    res, requests, _ = run(
+        {"source": ids}, {"/v1/playlists/source/tracks"}, test)
+    assert res == ids
+    # The throttled first page is asked for again, then the other 4
+    assert len(requests) == 6
+
+
+def test_playlist_copy_skips_tracks_without_id():
+    ids = [trackID(n) for n in range(150)]
+    # None: local file, False: unavailable item (no track)
+    source = ids[:50] + [None, False] + ids[50:]
+
+    async def test(sd):
+        return await sd.playlistCopy("source", "target")
+
+    res, _, added = run(
+        {"source": source}, {"/v1/playlists/target/tracks"}, test)
+    assert res["count"] == 150
+    assert added["target"] == [f"spotify:track:{track}" for track in ids]
@@ -0,0 +1,92 @@
+import io
+import json
+import threading
+
+from sharp_darwin.batch import runBatch
+from sharp_darwin.completion import readIndex
+from sharp_darwin.utils import argParser
+
+
+class FakeSharpDarwin:
+    """ Records the order commands start in. me waits until device-list has
+    run, so the two only finish if they run concurrently """
+
+    def __init__(self):
+        self.started = []
+        self.released = threading.Event()
+
+    def me(self):
+        self.started.append("me")
+        assert self.released.wait(5)
+        return {"id": "me"}
+
+    def deviceList(self):
+        self.started.append("device-list")
+        self.released.set()
+        return {"devices": []}
+
+    def playlistCreate(self, playlistName, public, descr):
+        self.started.append("playlist-create")
+        if playlistName == "fail":
+            raise RuntimeError("create failed")
+        return {"id": playlistName}
+
+    def playlistList(self, mine=False):
+        return {"count": 1, "data": [
+            {"id": "37i9dQZF1DXcBWIGoYBM5M", "playlistName": "2019-01",
+             "owner": "me", "total": 1}]}
+
+
+def run(lines, sharpDarwin=None):
+    out = io.StringIO()
+    ok = runBatch(sharpDarwin or FakeSharpDarwin(), argParser(), lines, out)
+    return ok, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_reads_run_concurrently_and_writes_alone():
+    lines = ['["me"]\n', '["device-list"]\n',
+             '["playlist-create", "--name", "new"]\n', '"me"\n']
+    ok, results = run(lines)
+    assert ok
+    # me finishes after device-list, which it waited for. The write waits
+    # for both, and the read after it starts once it's done
+    assert [result["line"] for result in results] == [2, 1, 3, 4]
+    assert [result["command"] for result in results] == \
+        ["device-list", "me", "playlist-create", "me"]
+    assert results[2]["result"] == {"id": "new"}
+    assert all(result["success"] for result in results)
+
+
+def test_invalid_and_failing_lines_are_error_records():
+    lines = ['not json\n', '["nope"]\n', '["playlist-create"]\n', '[]\n',
+             '{"argv": ["playlist-create", "--name", "fail"]}\n',
+             '["device-list"]\n']
+    ok, results = run(lines)
+    assert not ok
+    results.sort(key=lambda result: result["line"])
+    assert [result["line"] for result in results] == [1, 2, 3, 4, 5, 6]
+    assert [result["success"] for result in results] == \
+        [False, False, False, False, False, True]
+    assert all(result["command"] is None for result in results[:4])
+    assert "JSONDecodeError" in results[0]["error"]
+    assert "Invalid arguments" in results[1]["error"]
+    assert "Not a batch command" in results[3]["error"]
+    assert results[4]["command"] == "playlist-create"
+    assert results[4]["error"] == "RuntimeError('create failed')"
+
+
+def test_blank_lines_and_last_line_without_newline():
+    ok, results = run(['\n', '   \n', '["device-list"]\n', '\n',
+                       '["device-list"]'])
+    assert ok
+    assert [result["line"] for result in results] == [3, 5]
+
+    assert run([]) == (True, [])
+
+
+def test_playlist_list_refreshes_completions(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_DARWIN_CACHE_DIR", str(tmp_path))
+    ok, results = run(['["playlist-list"]\n'])
+    assert ok
+    assert results[0]["result"]["count"] == 1
+    assert readIndex() == {"37i9dQZF1DXcBWIGoYBM5M": "2019-01"}
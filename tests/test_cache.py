@@ -0,0 +1,92 @@
+import json
+import os
+import zlib
+
+from sharp_darwin.cache import BlobCache, MetadataCache
+from sharp_darwin.records import parsePlaylistTrack
+from sharp_darwin.utils import cachePath
+from fakes import FakeSpotify, trackID
+
+
+def test_cache_path_defaults_to_user_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHARP_DARWIN_CACHE_DIR", raising=False)
+    monkeypatch.delenv("SHARP_DARWIN_CRED_CACHE", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cachePath("sharp-darwin.sqlite") == str(
+        tmp_path / "sharp-darwin" / "sharp-darwin.sqlite")
+
+    monkeypatch.setenv("SHARP_DARWIN_CRED_CACHE", str(tmp_path / "creds"))
+    assert cachePath("x") == str(tmp_path / "x")
+    monkeypatch.setenv("SHARP_DARWIN_CACHE_DIR", str(tmp_path / "cache"))
+    assert cachePath("x") == str(tmp_path / "cache" / "x")
+
+
+def test_metadata_cache_opens_on_first_use(tmp_path):
+    path = tmp_path / "cache" / "sharp-darwin.sqlite"
+    cache = MetadataCache(str(path))
+    assert not os.path.exists(path.parent)
+
+    cache.putDocument("key", {"a": 1})
+    assert cache.getDocument("key") == {"a": 1}
+    assert os.stat(path.parent).st_mode & 0o777 == 0o700
+    cache.close()
+
+
+def test_blob_cache_opens_on_first_use(tmp_path):
+    path = tmp_path / "sharp-darwin-audio.sqlite"
+    blobs = BlobCache(str(path))
+    assert not os.path.exists(path)
+
+    blobs.putMany("features", {"a": {"tempo": 120}})
+    blobs.close()
+
+    # Reopened, it picks up the stored size
+    blobs = BlobCache(str(path))
+    assert blobs.getMany("features", ["a", "b"]) == {"a": {"tempo": 120}}
+    assert blobs.stats()["bytes"] > 0
+    blobs.close()
+
+
+def test_tracks_keyed_by_snapshot(tmp_path):
+    cache = MetadataCache(str(tmp_path / "sharp-darwin.sqlite"))
+    client = FakeSpotify()
+    tracks = [dict(parsePlaylistTrack(client.item(trackID(n))))
+              for n in range(3)]
+    assert cache.getTracks("playlist", "1") is None
+
+    cache.putTracks("playlist", "1", tracks)
+    assert [dict(track) for track in cache.getTracks("playlist", "1")] == \
+        tracks
+    # Another snapshot is a miss
+    assert cache.getTracks("playlist", "2") is None
+    assert cache.trackSnapshots() == {"playlist": "1"}
+
+    cache.putPlaylists([{"id": "playlist", "snapshot_id": "1",
+                         "name": "name", "owner": "me", "total": 3}])
+    assert cache.playlistSnapshots() == {"playlist": "1"}
+    assert [p["id"] for p in cache.listPlaylists()] == ["playlist"]
+
+    cache.removePlaylists(["playlist"])
+    assert cache.getTracks("playlist", "1") is None
+    assert cache.listPlaylists() == []
+    cache.close()
+
+
+def test_blob_cache_drops_least_recently_used(tmp_path):
+    # Random hex compresses to much the same size whatever the digits: room
+    # for 4 documents
+    documents = {str(n): os.urandom(500).hex() for n in range(6)}
+    size = len(zlib.compress(json.dumps(documents["0"]).encode()))
+    blobs = BlobCache(str(tmp_path / "audio.sqlite"), maxBytes=4 * size + 20)
+    for n in range(3):
+        blobs.putMany("features", {str(n): documents[str(n)]})
+    # Reading 0 makes 1 the least recently used
+    assert blobs.getMany("features", ["0"]) == {"0": documents["0"]}
+
+    for n in range(3, 6):
+        blobs.putMany("features", {str(n): documents[str(n)]})
+    # Adding 4 went over: the least recently used went until 90% full
+    kept = blobs.getMany("features", list(documents))
+    assert sorted(kept) == ["0", "3", "4", "5"]
+    assert blobs.stats()["bytes"] <= blobs.maxBytes
+    blobs.close()
@@ -0,0 +1,38 @@
+import os
+
+from sharp_darwin.completion import (
+    loadCompletionEnv, playlistCompleter, writeIndex)
+from sharp_darwin.utils import loadEnv
+
+
+def test_load_env(tmp_path, monkeypatch):
+    env = tmp_path / ".env"
+    env.write_text("# settings\n"
+                   "export SD_TEST_A='quoted # not a comment'\n"
+                   "SD_TEST_B=plain # comment\n"
+                   "SD_TEST_C=kept\n")
+    monkeypatch.delenv("SD_TEST_A", raising=False)
+    monkeypatch.delenv("SD_TEST_B", raising=False)
+    monkeypatch.setenv("SD_TEST_C", "set")
+    loadEnv(str(env))
+
+    assert os.environ["SD_TEST_A"] == "quoted # not a comment"
+    assert os.environ["SD_TEST_B"] == "plain"
+    # Like python-dotenv, the environment wins
+    assert os.environ["SD_TEST_C"] == "set"
+
+
+def test_completion_reads_index_named_by_env_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_DARWIN_CACHE_DIR", str(tmp_path))
+    writeIndex([{"id": "37i9dQZF1DXcBWIGoYBM5M",
+                 "playlistName": "2019-01"}])
+
+    # Completion starts without the cache directory in the environment
+    monkeypatch.delenv("SHARP_DARWIN_CACHE_DIR")
+    monkeypatch.delenv("SHARP_DARWIN_CRED_CACHE", raising=False)
+    env = tmp_path / "settings.env"
+    env.write_text(f"SHARP_DARWIN_CACHE_DIR={tmp_path}\n")
+    loadCompletionEnv(f"sharp-darwin --env {env} tracks-list --id 2019")
+
+    assert playlistCompleter("2019") == {
+        "37i9dQZF1DXcBWIGoYBM5M": "2019-01"}
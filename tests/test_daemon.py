@@ -0,0 +1,94 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from sharp_darwin import daemon
+from sharp_darwin.utils import argParser
+
+
+class FakeSharpDarwin:
+    def __init__(self):
+        self.logins = 0
+
+    def login(self, refresh=False):
+        self.logins += 1
+
+
+def dispatch(sharpDarwin, parser, args):
+    print(args.command)
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    thread = threading.Thread(
+        target=daemon.serve, daemon=True,
+        args=(FakeSharpDarwin(), argParser(), dispatch, path))
+    thread.start()
+    for _ in range(100):
+        if daemon.forward(["me"], path) is not None:
+            break
+        time.sleep(0.01)
+    return path
+
+
+def test_forward(served):
+    assert os.stat(served).st_mode & 0o777 == 0o600
+    res = daemon.forward(["me"], served)
+    assert res == {"stdout": "me\n", "stderr": "", "status": 0}
+
+
+def test_rejects_no_cache_and_env(served):
+    for argv in (["--no-cache", "me"], ["--env", "other.env", "me"]):
+        res = daemon.forward(argv, served)
+        assert res["status"] == 1
+        assert "--no-daemon" in res["stderr"]
+
+
+def test_forwardable():
+    parser = argParser()
+    assert daemon.forwardable(parser, parser.parse_args(["me"]))
+    assert not daemon.forwardable(
+        parser, parser.parse_args(["--no-cache", "me"]))
+    assert not daemon.forwardable(
+        parser, parser.parse_args(["--env", "other.env", "me"]))
+
+
+def test_socket_of_another_user(served, monkeypatch):
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(served).st_uid + 1)
+    assert daemon.forward(["me"], served) is None
+
+
+def test_unreachable_socket(tmp_path, monkeypatch):
+    assert daemon.forward(["me"], str(tmp_path / "none.sock")) is None
+
+    def refuse(self, path):
+        raise PermissionError(path)
+    path = tmp_path / "daemon.sock"
+    path.touch()
+    monkeypatch.setattr(socket.socket, "connect", refuse)
+    assert daemon.forward(["me"], str(path)) is None
+
+
+def test_default_socket_path(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHARP_DARWIN_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert daemon.socketPath() == str(tmp_path / "sharp-darwin.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr("tempfile.gettempdir", lambda: str(tmp_path))
+    assert daemon.socketPath() == str(
+        tmp_path / f"sharp-darwin-{os.getuid()}" / "daemon.sock")
+
+
+def test_serve_refuses_open_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHARP_DARWIN_SOCKET", raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr("tempfile.gettempdir", lambda: str(tmp_path))
+    directory = tmp_path / f"sharp-darwin-{os.getuid()}"
+    directory.mkdir(mode=0o777)
+    directory.chmod(0o777)
+    with pytest.raises(daemon.UnsafeSocket):
+        daemon.serve(FakeSharpDarwin(), argParser(), dispatch)
@@ -0,0 +1,118 @@
+import pytest
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from sharp_darwin.index import TrackIndex
+from sharp_darwin.records import parsePlaylistTrack
+from fakes import FakeSpotify, trackID
+
+
+def records(trackIDs, names=None):
+    client = FakeSpotify()
+    tracks = [dict(parsePlaylistTrack(client.item(t))) for t in trackIDs]
+    for track, name in zip(tracks, names or []):
+        track["trackName"] = name
+    return tracks
+
+
+def sharpDarwin(client, tmp_path=None):
+    sd = SharpDarwin(username="me", cache=MetadataCache(
+        str(tmp_path / "cache.sqlite")) if tmp_path else None)
+    sd.client = client
+    return sd
+
+
+def test_duplicates_within_and_across_playlists():
+    a, b, c = trackID(1), trackID(2), trackID(3)
+    index = TrackIndex()
+    index.add("p1", "one", records([a, b, a, None, a]))
+    index.add("p2", "two", records([b, c, c]))
+
+    assert index.duplicates() == {
+        "p1": [(a, 2), (a, 4)],
+        "p2": [(c, 2)]}
+    # Across, a track is only kept in the first playlist which has it
+    assert index.duplicates(across=True) == {
+        "p1": [(a, 2), (a, 4)],
+        "p2": [(b, 0), (c, 2)]}
+
+
+def test_fuzzy_duplicates_match_versions():
+    a, b = trackID(1), trackID(2)
+    index = TrackIndex()
+    index.add("p1", "one", records(
+        [a, b], ["Song", "Song (Remastered 2011)"]))
+    assert index.duplicates() == {}
+    assert index.duplicates(fuzzy=True) == {"p1": [(b, 1)]}
+
+
+def test_removals_batched_backwards():
+    # 250 distinct tracks, each twice: 250 removals over 3 requests
+    ids = [trackID(n) for n in range(250)]
+    client = FakeSpotify({"p": ids + [None] + ids})
+    sd = sharpDarwin(client)
+
+    res = sd.dedupe(["p"])
+    assert res["removed"] == 250
+    assert res["requests"] == 3
+    # Each request's positions were checked against the snapshot it was
+    # sent with
+    assert client.playlists["p"] == ids + [None]
+    assert client.calls["user_playlist_remove_specific_occurrences_of_tracks"] == 3
+
+
+def test_repeats_of_one_track_share_a_request():
+    ids = [trackID(n) for n in range(100)]
+    client = FakeSpotify({"p": ids + ids + ids})
+    sd = sharpDarwin(client)
+
+    requests, snapshot = sd.removeOccurrences(
+        "p", "0", [(trackID, 100 + n) for n, trackID in enumerate(ids)] +
+        [(trackID, 200 + n) for n, trackID in enumerate(ids)])
+    # 100 tracks, each with both its positions
+    assert requests == 1 and snapshot == "1"
+    assert client.playlists["p"] == ids
+
+
+def test_dry_run_writes_nothing():
+    a = trackID(1)
+    client = FakeSpotify({"p": [a, a, a]})
+    sd = sharpDarwin(client)
+
+    res = sd.dedupe(["p"], dryRun=True)
+    assert res["dryRun"] and res["removed"] == 2 and res["requests"] == 0
+    assert res["data"][0]["tracks"] == [{"trackID": a, "position": 1},
+                                        {"trackID": a, "position": 2}]
+    assert client.playlists["p"] == [a, a, a]
+    assert "user_playlist_remove_specific_occurrences_of_tracks" \
+        not in client.calls
+
+
+def test_where_is_after_listing(tmp_path):
+    a = trackID(1)
+    client = FakeSpotify({"p1": [a], "p2": [trackID(2), a]})
+    sd = sharpDarwin(client, tmp_path)
+
+    snapshots = {}
+    playlist_ids = [p["id"] for p in sd.iterPlaylists(snapshots=snapshots)]
+    res = sd.whereIs(a, playlist_ids, snapshots=snapshots)
+    assert [(r["playlist_id"], r["position"]) for r in res["data"]] == \
+        [("p1", 0), ("p2", 1)]
+    assert client.calls == {"user_playlists": 1, "user_playlist_tracks": 2}
+
+    # Unchanged playlists are looked up in the cache: the listing only
+    client.calls.clear()
+    snapshots = {}
+    playlist_ids = [p["id"] for p in sd.iterPlaylists(snapshots=snapshots)]
+    sd.whereIs(a, playlist_ids, snapshots=snapshots)
+    assert client.calls == {"user_playlists": 1}
+
+
+def test_read_errors_pass_through():
+    client = FakeSpotify({"p1": [trackID(1)], "p2": [trackID(1)]})
+    client.failures["p2"] = ConnectionError("reset")
+    sd = sharpDarwin(client)
+    with pytest.raises(ConnectionError):
+        sd.whereIs(trackID(1), ["p1", "p2"])
+    with pytest.raises(ConnectionError):
+        sd.dedupe(["p1", "p2"], across=True)
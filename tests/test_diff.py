@@ -0,0 +1,75 @@
+import random
+
+from sharp_darwin.diff import setDiff, mirrorDiff, writeRequests
+from fakes import trackID
+
+
+def apply(target, removals, insertions):
+    target = list(target)
+    for _, position in sorted(removals, key=lambda r: r[1], reverse=True):
+        del target[position]
+    for position, trackIDs in insertions:
+        if position is None:
+            target.extend(trackIDs)
+        else:
+            target[position:position] = trackIDs
+    return target
+
+
+def test_set_diff():
+    a, b, c, d = map(trackID, range(4))
+    removals, additions = setDiff([a, b, c, c], [d, a, None, d])
+    assert removals == [(d, 0), (d, 3)]
+    assert additions == [b, c]
+
+
+def test_set_diff_of_equal_sets_is_empty():
+    a, b = map(trackID, range(2))
+    assert setDiff([a, b, a], [b, a]) == ([], [])
+
+
+def test_mirror_diff_inserts_in_order():
+    ids = [trackID(n) for n in range(10)]
+    gone = trackID(99)
+    target = [ids[1], gone, ids[4], ids[5], ids[8]]
+    removals, insertions = mirrorDiff(ids, target)
+    assert removals == [(gone, 1)]
+    assert apply(target, removals, insertions) == ids
+
+
+def test_mirror_diff_out_of_order_needs_rewrite():
+    a, b = map(trackID, range(2))
+    assert mirrorDiff([a, b], [b, a])[1] is None
+
+
+def test_mirror_diff_matches_repeats():
+    a, b = map(trackID, range(2))
+    target = [a, a, a, b]
+    removals, insertions = mirrorDiff([a, b, b], target)
+    assert apply(target, removals, insertions) == [a, b, b]
+
+
+def test_mirror_diff_keeps_local_files():
+    a, b, c, d = map(trackID, range(4))
+    target = [None, b, None, d, None]
+    removals, insertions = mirrorDiff([a, b, c], target)
+    # Local files are neither kept for matching nor removed. Insertions go
+    # just ahead of the next kept track, or at the end
+    assert removals == [(d, 3)]
+    assert apply(target, removals, insertions) == \
+        [None, a, b, None, None, c]
+
+
+def test_mirror_diff_random():
+    rng = random.Random(7)
+    for _ in range(500):
+        source = [trackID(rng.randrange(30)) for _ in range(rng.randrange(40))]
+        target = [None if rng.random() < 0.1 else trackID(rng.randrange(30))
+                  for _ in range(rng.randrange(40))]
+        removals, insertions = mirrorDiff(source, target)
+        if insertions is None:
+            continue
+        result = apply(target, removals, insertions)
+        assert [t for t in result if t] == source
+        assert result.count(None) == target.count(None)
+        assert writeRequests(removals, insertions) >= len(insertions)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from sharp_darwin.memo import LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def value(v):
+    return lambda: v
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=3)
+    for key in "abc":
+        cache.put(key, key)
+    # Reading a makes b the least recently used
+    assert cache.get("a", value(None)) == "a"
+    cache.put("d", "d")
+    assert list(cache.entries) == ["c", "a", "d"]
+
+    # A miss stores its load as the most recent entry
+    assert cache.get("e", value("e")) == "e"
+    assert list(cache.entries) == ["a", "d", "e"]
+    assert cache.stats()["size"] == 3
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = LRUCache(ttl=10, clock=clock)
+    assert cache.get("a", value(1)) == 1
+    clock.now = 9.9
+    assert cache.get("a", value(2)) == 1
+    clock.now = 10
+    assert cache.get("a", value(2)) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+    cache.invalidate("a")
+    assert cache.get("a", value(3)) == 3
+
+
+def waitFor(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def concurrentGets(cache, loader, callers=5):
+    """ Start callers threads getting "key" while the first one's load is
+    held, then let the load finish. Returns each caller's value or error """
+    release = threading.Event()
+    results = [None] * callers
+
+    def held():
+        assert release.wait(5)
+        return loader()
+
+    def get(i):
+        try:
+            results[i] = cache.get("key", held)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=get, args=(i,))
+               for i in range(callers)]
+    threads[0].start()
+    waitFor(lambda: cache.calls)
+    for thread in threads[1:]:
+        thread.start()
+    waitFor(lambda: cache.stats()["coalesced"] == callers - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_misses_share_one_load():
+    cache = LRUCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    results = concurrentGets(cache, loader)
+    assert len(loads) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.get("key", loader) is results[0]
+    assert len(loads) == 1
+
+
+def test_failed_load_is_not_cached():
+    cache = LRUCache()
+    error = RuntimeError("load failed")
+
+    def fail():
+        raise error
+
+    # Every caller waiting on the load gets its error
+    assert concurrentGets(cache, fail) == [error] * 5
+    assert cache.stats()["size"] == 0
+    assert not cache.calls
+
+    # The next get loads again
+    with pytest.raises(RuntimeError):
+        cache.get("key", fail)
+    assert cache.get("key", value(1)) == 1
+    assert cache.stats()["misses"] == 3
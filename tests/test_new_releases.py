@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from sharp_darwin.exceptions import MarketsUnavailable
+
+
+class NewReleasesClient:
+    """ Later pages, and later countries, answer first """
+
+    def __init__(self, albums):
+        self.albums = albums
+        self.calls = 0
+
+    def new_releases(self, country, limit=50, offset=0):
+        self.calls += 1
+        albums = self.albums[country]
+        time.sleep(0.001 * (len(self.albums) * 20 - offset // limit -
+                            list(self.albums).index(country) * 10))
+        return {"albums": {
+            "items": [{"album_type": "album", "id": album, "name": album,
+                       "release_date": "2020-01-01", "total_tracks": 1,
+                       "artists": [{"name": "artist"}]}
+                      for album in albums[offset:offset + limit]],
+            "offset": offset,
+            "limit": limit,
+            "total": len(albums),
+            "next": "next" if offset + limit < len(albums) else None
+        }}
+
+
+def test_new_releases_in_fixed_order(tmp_path):
+    albums = {"US": [f"us{n}" for n in range(120)],
+              "GB": [f"gb{n}" for n in range(60)] + ["us0", "us119"]}
+    client = NewReleasesClient(albums)
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite")),
+                     concurrency=8)
+    sd.client = client
+
+    expected = albums["US"] + albums["GB"][:60]
+    res = sd.newReleases(["US", "GB"], limit=20)
+    assert [album["id"] for album in res["data"]] == expected
+
+    # The same from the cache
+    calls = client.calls
+    res = sd.newReleases(["US", "GB"], limit=20)
+    assert client.calls == calls
+    assert [album["id"] for album in res["data"]] == expected
+
+    # Streamed, each album still comes once
+    streamed = [album["id"] for album in sd.iterNewReleases(["GB", "US"])]
+    assert sorted(streamed) == sorted(expected)
+
+
+class MarketsClient:
+    def __init__(self):
+        self.calls = 0
+
+    def available_markets(self):
+        self.calls += 1
+        return {"markets": ["GB", "US"]}
+
+
+class OldMarketsClient:
+    # spotipy before 2.19: no available_markets
+    def _get(self, url):
+        assert url == "markets"
+        return {"markets": ["US"]}
+
+
+def test_markets(tmp_path):
+    client = MarketsClient()
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite")))
+    sd.client = client
+    assert sd.markets() == ["GB", "US"]
+    # Kept for the day
+    assert sd.markets() == ["GB", "US"]
+    assert client.calls == 1
+
+    sd = SharpDarwin()
+    sd.client = OldMarketsClient()
+    assert sd.markets() == ["US"]
+
+    sd.client = object()
+    with pytest.raises(MarketsUnavailable):
+        sd.markets()
@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from sharp_darwin import output
+from sharp_darwin.output import Writer
+from sharp_darwin.records import parsePlaylistTrack
+from fakes import FakeSpotify, trackID
+
+
+def sample():
+    client = FakeSpotify()
+    tracks = [parsePlaylistTrack(client.item(trackID(n))) for n in range(5)]
+    return tracks + [{"name": "Sigur Rós", "tempo": 120.5,
+                      "nested": {"list": [1, None, True], "empty": {}}}]
+
+
+def plain(data):
+    # What the records are as plain json data
+    return json.loads(json.dumps(data, default=output.default))
+
+
+def streamed(mode, records, stream=None):
+    stream = stream or io.BytesIO()
+    # A tiny buffer flushes on most writes
+    with Writer(mode, stream, bufferSize=16) as writer:
+        writer.records(iter(records))
+    value = stream.getvalue()
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(output, "orjson", None)
+    elif output.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("records", [sample(), []])
+def test_pretty_array_matches_json_dumps(records):
+    expected = json.dumps(plain(records), sort_keys=True, indent=4,
+                          separators=(',', ': ')) + "\n"
+    assert streamed("json", records).decode("utf-8") == expected
+    # Text streams get the same
+    assert streamed("json", records, io.StringIO()).decode("utf-8") == \
+        expected
+
+
+@pytest.mark.parametrize("records", [sample(), []])
+def test_compact_array(encoder, records):
+    res = streamed("compact", records)
+    assert res.endswith(b"\n") and res.count(b"\n") == 1
+    assert json.loads(res) == plain(records)
+
+    # Streamed element by element, it's the document written whole
+    stream = io.BytesIO()
+    with Writer("compact", stream) as writer:
+        writer.document(list(records))
+    assert res == stream.getvalue()
+
+
+@pytest.mark.parametrize("records", [sample(), []])
+def test_ndjson(encoder, records):
+    res = streamed("ndjson", records).decode("utf-8")
+    assert [json.loads(line) for line in res.splitlines()] == plain(records)
+    assert res == "".join(f"{line}\n" for line in res.splitlines())
+
+
+def test_orjson_and_json_fallback_agree(monkeypatch):
+    if output.orjson is None:
+        pytest.skip("orjson not installed")
+    fast = streamed("compact", sample())
+    monkeypatch.setattr(output, "orjson", None)
+    assert streamed("compact", sample()) == fast
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from sharp_darwin.pagination import pages, cursorPages
+
+
+def pagedFetch(total, limit=10, key=None, delay=0.0):
+    """ fetch(offset) over total numbered items. Later pages answer first
+    when delay is set. Every offset asked for is logged """
+    asked = []
+    lock = threading.Lock()
+
+    def fetch(offset):
+        with lock:
+            asked.append(offset)
+        if delay:
+            time.sleep(delay * (total - offset) / total)
+        page = {
+            "items": list(range(offset, min(offset + limit, total))),
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next": "next" if offset + limit < total else None
+        }
+        return {key: page} if key else page
+    return fetch, asked
+
+
+def items(pageList, key=None):
+    return [item for page in pageList
+            for item in (page[key] if key else page)["items"]]
+
+
+def test_pages_in_order():
+    for concurrency in (1, 4):
+        fetch, asked = pagedFetch(95, delay=0.01)
+        assert items(pages(fetch, concurrency=concurrency)) == \
+            list(range(95))
+        assert sorted(asked) == list(range(0, 95, 10))
+
+
+def test_single_page():
+    fetch, asked = pagedFetch(5)
+    assert items(pages(fetch, concurrency=4)) == list(range(5))
+    assert asked == [0]
+
+
+def test_wrapped_paging_object():
+    fetch, _ = pagedFetch(25, key="albums")
+    assert items(pages(fetch, key=lambda page: page["albums"],
+                       concurrency=2), "albums") == list(range(25))
+
+
+def test_abandoned_pages_stop_fetching():
+    fetch, asked = pagedFetch(1000)
+    for n, page in enumerate(pages(fetch, concurrency=4)):
+        if n == 2:
+            break
+    # The first page, and no more than concurrency ahead of the last read
+    assert len(asked) <= 1 + 2 + 4
+
+
+def test_cursor_pages():
+    asked = []
+
+    def fetch(after):
+        asked.append(after)
+        start = 0 if after is None else after + 1
+        items = list(range(start, min(start + 10, 25)))
+        last = start + 10 >= 25
+        return {"items": items, "next": None if last else "next",
+                "cursors": {"after": None if last else items[-1]}}
+
+    assert items(cursorPages(fetch)) == list(range(25))
+    assert asked == [None, 9, 19]
@@ -0,0 +1,36 @@
+import pytest
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from fakes import FakeSpotify, trackID
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_copy_skips_local_files(tmp_path, cached):
+    ids = [trackID(n) for n in range(150)]
+    client = FakeSpotify({"source": ids[:99] + [None] + ids[99:],
+                          "target": []})
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite"))
+                     if cached else None)
+    sd.client = client
+
+    res = sd.playlistCopy("source", "target")
+    assert res["count"] == 150
+    assert client.playlists["target"] == ids
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_consolidate_skips_local_files(tmp_path, cached):
+    ids = [trackID(n) for n in range(250)]
+    client = FakeSpotify({"a": ids[:150] + [None],
+                          "b": [None] + ids[100:],
+                          "target": []})
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite"))
+                     if cached else None)
+    sd.client = client
+
+    res = sd.playlistConsolidate("target", sources=["a", "b"])
+    assert res["count"] == 250
+    assert res["duplicates"] == 50
+    assert res["requests"] == 3
+    assert client.playlists["target"] == ids
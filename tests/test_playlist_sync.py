@@ -0,0 +1,67 @@
+import pytest
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from sharp_darwin.exceptions import LocalFilesInPlaylist
+from fakes import FakeSpotify, trackID
+
+
+def sharpDarwin(client, tmp_path):
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite")))
+    sd.client = client
+    return sd
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_second_sync_reads_no_tracks(tmp_path, mirror):
+    ids = [trackID(n) for n in range(250)]
+    client = FakeSpotify({"source": ids, "target": ids[:120] + ids[200:]})
+    sd = sharpDarwin(client, tmp_path)
+
+    res = sd.playlistSync("source", "target", mirror=mirror)
+    assert res["added"] == 80 and res["requests"] > 0
+    if mirror:
+        assert client.playlists["target"] == ids
+    else:
+        assert set(client.playlists["target"]) == set(ids)
+
+    # The target is cached under the snapshot the writes returned
+    client.calls.clear()
+    res = sd.playlistSync("source", "target", mirror=mirror)
+    assert res["requests"] == 0
+    assert client.calls == {"user_playlist": 2}
+
+
+def test_cached_target_matches_playlist(tmp_path):
+    ids = [trackID(n) for n in range(30)]
+    client = FakeSpotify({"source": ids, "target": ids[::-1] + [None]})
+    sd = sharpDarwin(client, tmp_path)
+    client.playlists["target"].pop()
+
+    sd.playlistSync("source", "target", mirror=True)
+    _, tracks = sd.snapshotTracks("target")
+    assert [track["trackID"] for track in tracks] == \
+        client.playlists["target"] == ids
+
+
+def test_mirror_keeps_local_files(tmp_path):
+    ids = [trackID(n) for n in range(6)]
+    target = [None, ids[0], ids[3], None, ids[5]]
+    client = FakeSpotify({"source": ids, "target": target})
+    sd = sharpDarwin(client, tmp_path)
+
+    sd.playlistSync("source", "target", mirror=True)
+    assert client.calls["user_playlist_replace_tracks"] == 0
+    assert client.playlists["target"] == \
+        [None, ids[0], ids[1], ids[2], ids[3], None, ids[4], ids[5]]
+
+
+def test_mirror_refuses_to_rewrite_local_files(tmp_path):
+    ids = [trackID(n) for n in range(3)]
+    target = [ids[2], None, ids[1], ids[0]]
+    client = FakeSpotify({"source": ids, "target": target})
+    sd = sharpDarwin(client, tmp_path)
+
+    with pytest.raises(LocalFilesInPlaylist):
+        sd.playlistSync("source", "target", mirror=True)
+    assert client.playlists["target"] == target
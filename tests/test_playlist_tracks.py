@@ -0,0 +1,28 @@
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from fakes import FakeSpotify, trackID
+
+
+def test_stream_fills_cache(tmp_path):
+    ids = [trackID(n) for n in range(250)]
+    client = FakeSpotify({"playlist": ids})
+    sd = SharpDarwin(cache=MetadataCache(str(tmp_path / "cache.sqlite")))
+    sd.client = client
+
+    # Records are yielded before the rest of the playlist has been read
+    tracks = sd.iterSnapshotTracks("playlist", concurrency=1)
+    assert next(tracks)["trackID"] == ids[0]
+    assert client.calls["user_playlist_tracks"] == 1
+    assert [track["trackID"] for track in tracks] == ids[1:]
+
+    # Read whole, the playlist comes from the cache
+    client.calls.clear()
+    streamed = list(sd.iterSnapshotTracks("playlist"))
+    assert [track["trackID"] for track in streamed] == ids
+    assert client.calls == {"user_playlist": 1}
+
+    # A stream abandoned part way caches nothing
+    client.playlists["playlist"].append(trackID(999))
+    client.write("playlist")
+    next(sd.iterSnapshotTracks("playlist"))
+    assert sd.cache.getTracks("playlist", "1") is None
@@ -0,0 +1,54 @@
+import pytest
+
+from sharp_darwin.ratelimit import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(**kwargs):
+    clock = Clock()
+    return RateLimiter(clock=clock, sleep=None, **kwargs), clock
+
+
+def test_burst_then_spaced():
+    rl, clock = limiter(rate=10, burst=3)
+    waits = [rl.reserve() for _ in range(6)]
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3:] == pytest.approx([0.1, 0.2, 0.3])
+
+
+def test_waits_spread_out_after_retry_after():
+    rl, clock = limiter(rate=10)
+    rl.throttled(retryAfter=5)
+    # Halved to 5 requests a second
+    waits = [rl.reserve() for _ in range(12)]
+    assert waits == pytest.approx([5 + (n + 1) * 0.2 for n in range(12)])
+
+
+def test_no_refill_during_pause():
+    rl, clock = limiter(rate=10)
+    rl.throttled(retryAfter=5)
+    clock.now += 5
+    # Nothing saved up while paused: no burst when the pause ends
+    waits = [rl.reserve() for _ in range(3)]
+    assert waits == pytest.approx([0.2, 0.4, 0.6])
+
+
+def test_aimd():
+    rl, clock = limiter(rate=8, maxRate=10, minRate=1, increase=1)
+    rl.throttled()
+    assert rl.rate == 4
+    rl.throttled()
+    rl.throttled()
+    rl.throttled()
+    assert rl.rate == 1
+    for _ in range(1000):
+        rl.succeeded()
+    assert rl.rate == 10
+    assert rl.stats()["throttled"] == 4
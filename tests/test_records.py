@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from sharp_darwin import output
+from sharp_darwin.output import dumps
+from sharp_darwin.records import (
+    TrackColumns, parsePlaylist, parsePlaylistTrack)
+from fakes import FakeSpotify, trackID
+
+
+# The dicts the parse helpers returned before records replaced them
+
+def oldPlaylistTrack(item):
+    track = item["track"]
+    return {
+        "artists": [a["name"] for a in track["artists"]],
+        "albumName": track["name"],
+        "trackName": track["name"],
+        "popularity": track["popularity"],
+        "trackID": track["id"],
+        "addedAt": item["added_at"],
+        "href": track["href"]
+    }
+
+
+def oldPlaylist(playlist):
+    return {
+        "owner": playlist["owner"]["id"],
+        "id": playlist["id"],
+        "total": int(playlist["tracks"]["total"]),
+        "playlistName": playlist["name"]
+    }
+
+
+def items():
+    client = FakeSpotify()
+    items = [client.item(trackID(n)) for n in range(3)]
+    # A local file, an odd ID and a name json escapes
+    items.append(client.item(None))
+    items.append(client.item("short"))
+    items[0]["track"]["name"] = "Sigur Rós \"Hoppípolla\""
+    return items
+
+
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize("pretty", [True, False])
+def test_records_dump_as_the_old_dicts(monkeypatch, fast, pretty):
+    if not fast:
+        monkeypatch.setattr(output, "orjson", None)
+    elif output.orjson is None:
+        pytest.skip("orjson not installed")
+
+    old = [oldPlaylistTrack(item) for item in items()]
+    new = [parsePlaylistTrack(item) for item in items()]
+    assert dumps(new, pretty=pretty) == dumps(old, pretty=pretty)
+    assert dumps({"tracks": TrackColumns(new)}, pretty=pretty) == \
+        dumps({"tracks": old}, pretty=pretty)
+
+    playlist = FakeSpotify({"a": [None]}).user_playlists("me")["items"][0]
+    assert dumps(parsePlaylist(playlist), pretty=pretty) == \
+        dumps(oldPlaylist(playlist), pretty=pretty)
+
+
+def test_track_columns_round_trip():
+    old = [oldPlaylistTrack(item) for item in items()]
+    columns = TrackColumns(parsePlaylistTrack(item) for item in items())
+    assert len(columns) == len(old)
+    assert columns.asList() == old
+    assert dict(columns[-2]) == old[-2]
+    assert json.loads(dumps(columns)) == old
@@ -0,0 +1,22 @@
+import json
+
+from sharp_darwin import frontend
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import BlobCache
+from sharp_darwin.utils import argParser
+
+
+def test_stats_on_stderr(tmp_path, capsys):
+    sd = SharpDarwin(blobs=BlobCache(str(tmp_path / "audio.sqlite")))
+    sd.args = argParser().parse_args(["--stats", "me"])
+    sd.lookups.get("key", lambda: "value")
+    sd.lookups.get("key", lambda: "value")
+
+    frontend.stats(sd)
+    out, err = capsys.readouterr()
+    assert out == ""
+    stats = json.loads(err)
+    assert stats["lookups"]["hits"] == 1 and stats["lookups"]["misses"] == 1
+    assert stats["rate"]["requests"] == 0
+    # Nothing was sent, or read from the audio cache
+    assert stats["pool"] is None and stats["audioCache"] is None
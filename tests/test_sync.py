@@ -0,0 +1,76 @@
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from sharp_darwin.offline import OfflineSharpDarwin
+from fakes import FakeSpotify, trackID
+
+
+class FakeLibrary(FakeSpotify):
+    """ FakeSpotify with the followed and top artist calls sync makes """
+
+    def current_user_followed_artists(self, limit=20, after=None):
+        self.calls["current_user_followed_artists"] += 1
+        return {"artists": {
+            "items": [{"name": "artist", "followers": {"total": 1},
+                       "id": "artist", "genres": ["rock", "pop"],
+                       "popularity": 50}],
+            "total": 1, "next": None, "cursors": {"after": None}}}
+
+    def current_user_top_artists(self, limit=20, time_range="medium_term"):
+        self.calls["current_user_top_artists"] += 1
+        return {"items": [{"name": "artist", "genres": ["rock"],
+                           "popularity": 50,
+                           "external_urls": {"spotify": "url"}}]}
+
+    def current_user_top_tracks(self, limit=20, time_range="medium_term"):
+        self.calls["current_user_top_tracks"] += 1
+        return {"items": []}
+
+
+def synced(tmp_path, playlists):
+    cache = MetadataCache(str(tmp_path / "sharp-darwin.sqlite"))
+    sd = SharpDarwin(username="me", cache=cache)
+    sd.client = FakeLibrary(playlists)
+    return sd, cache
+
+
+def test_sync_then_offline_read(tmp_path):
+    # An unavailable item (False) is kept in its place without a track ID
+    sd, cache = synced(tmp_path, {
+        "a": [trackID(0), False, None, trackID(1)], "b": [trackID(2)]})
+    res = sd.sync()
+    assert sorted(res["fetched"]) == ["a", "b"]
+    assert res["tracks"] == 5
+
+    offline = OfflineSharpDarwin(username="me", cache=cache)
+    assert [p["id"] for p in offline.playlistList()["data"]] == ["a", "b"]
+    tracks = offline.trackList("a")
+    assert tracks["playlistName"] == "a"
+    assert [track["trackID"] for track in tracks["tracks"]] == \
+        [trackID(0), None, None, trackID(1)]
+    assert list(offline.iterTrackIDs("a")) == [trackID(0), trackID(1)]
+    assert offline.topArtists(50, "short_term")["count"] == 1
+    assert [a["id"] for a in offline.iterArtistsFollowed()] == ["artist"]
+    cache.close()
+
+
+def test_sync_is_idempotent(tmp_path):
+    sd, cache = synced(tmp_path, {"a": [trackID(0)], "b": [trackID(1)]})
+    sd.sync()
+    before = sd.client.calls["user_playlist_tracks"]
+
+    # Nothing changed: nothing is fetched again
+    res = sd.sync()
+    assert res["fetched"] == []
+    assert res["unchanged"] == 2
+    assert sd.client.calls["user_playlist_tracks"] == before
+
+    # A changed playlist and a deleted one
+    sd.client.user_playlist_add_tracks("me", "a", [trackID(3)])
+    del sd.client.playlists["b"]
+    res = sd.sync()
+    assert res["fetched"] == ["a"]
+    assert res["removed"] == ["b"]
+    offline = OfflineSharpDarwin(username="me", cache=cache)
+    assert list(offline.iterTrackIDs("a")) == [trackID(0), trackID(3)]
+    assert [p["id"] for p in offline.playlistList()["data"]] == ["a"]
+    cache.close()
@@ -0,0 +1,34 @@
+import io
+from operator import itemgetter
+
+from sharp_darwin.output import Writer
+from sharp_darwin.table import Table, Column
+
+
+def render(records, sample=None):
+    stream = io.BytesIO()
+    Table([
+        Column("name", itemgetter("name")),
+        Column("track ID", itemgetter("trackID"), width=22),
+        Column("popularity", itemgetter("popularity")),
+    ], writer=Writer(stream=stream), sample=sample).write(records)
+    return stream.getvalue().decode("utf-8").splitlines()
+
+
+def test_cells_which_are_not_strings():
+    # A local file has no track ID
+    records = [{"name": "local", "trackID": None, "popularity": 0},
+               {"name": "a longer name", "trackID": "0" * 22,
+                "popularity": 50}]
+    for sample in (None, 1):
+        lines = render(records, sample)
+        assert lines[1].split(" | ") == ["local".ljust(13 if sample is None
+                                                       else 5),
+                                         "None".ljust(22), "0"]
+        assert lines[2].split(" | ")[1:] == ["0" * 22, "50"]
+
+
+def test_widths_fit_cells_and_header():
+    lines = render([{"name": "x", "trackID": "1", "popularity": 5}])
+    assert lines == ["name | " + "track ID".center(22) + " | popularity",
+                     "x    | " + "1".ljust(22) + " | 5"]
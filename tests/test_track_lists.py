@@ -0,0 +1,82 @@
+import pytest
+
+from sharp_darwin.SharpDarwin import SharpDarwin
+from sharp_darwin.cache import MetadataCache
+from fakes import FakeSpotify, trackID
+
+
+def sharpDarwin(client, tmp_path=None):
+    sd = SharpDarwin(username="me", cache=MetadataCache(
+        str(tmp_path / "cache.sqlite")) if tmp_path else None)
+    sd.client = client
+    return sd
+
+
+def library():
+    return FakeSpotify({
+        "a": [trackID(n) for n in range(150)],
+        "b": [trackID(n) for n in range(5)],
+        "c": [None, trackID(1)],
+    })
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_listing_snapshots_save_a_request_per_playlist(tmp_path, cached):
+    client = library()
+    sd = sharpDarwin(client, tmp_path if cached else None)
+
+    snapshots = {}
+    playlist_ids = [playlist["id"] for playlist
+                    in sd.iterPlaylists(snapshots=snapshots)]
+    assert snapshots == {"a": ("a", "0"), "b": ("b", "0"), "c": ("c", "0")}
+
+    res = sd.trackLists(playlist_ids, snapshots=snapshots)
+    assert [result["playlistName"] for result in res["playlists"]] == \
+        ["a", "b", "c"]
+    # The listing, then only the track pages
+    assert client.calls == {"user_playlists": 1, "user_playlist_tracks": 4}
+
+    if cached:
+        # Unchanged, the tracks come from the cache
+        client.calls.clear()
+        res = sd.trackLists(playlist_ids, snapshots=snapshots)
+        assert res["tracks"] == 157
+        assert client.calls == {}
+
+
+def test_track_lists_in_order_given_with_errors():
+    client = library()
+    client.failures["b"] = RuntimeError("rate limited")
+    sd = sharpDarwin(client)
+
+    res = sd.trackLists(["c", "b", "a"])
+    assert [result["playlist_id"] for result in res["playlists"]] == \
+        ["c", "b", "a"]
+    assert "error" in res["playlists"][1]
+    assert "tracks" not in res["playlists"][1]
+    assert [track["trackID"] for track in res["playlists"][0]["tracks"]] == \
+        [None, trackID(1)]
+    assert res["count"] == 3
+    assert res["tracks"] == 152
+    assert res["failed"] == ["b"]
+
+
+def test_iter_track_lists_yields_each_playlist_once():
+    sd = sharpDarwin(library())
+    results = list(sd.iterTrackLists(["a", "b", "c"]))
+    assert sorted(result["playlist_id"] for result in results) == \
+        ["a", "b", "c"]
+    assert {result["playlist_id"]: result["count"]
+            for result in results} == {"a": 150, "b": 5, "c": 2}
+
+
+def test_track_list_summary():
+    sd = sharpDarwin(library())
+    summary = sd.trackListSummary([
+        {"playlist_id": "a", "count": 3},
+        {"playlist_id": "b", "error": "RuntimeError()"},
+        {"playlist_id": "c", "count": 0},
+    ])
+    assert summary["count"] == 3
+    assert summary["tracks"] == 3
+    assert summary["failed"] == ["b"]